@@ -1,86 +1,45 @@
-import sqlite3
-from datetime import datetime
-import os
+import threading
+
+from history_store import SQLiteWriter
+
+DB_PATH = "dream_log.db"
+
+DRAWS_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS draws (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT DEFAULT (datetime('now', 'localtime')),
+        keyword TEXT,
+        dream_text TEXT,
+        emotion TEXT,
+        title TEXT,
+        message TEXT
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_draws_timestamp ON draws (timestamp)",
+)
+
+DRAWS_INSERT_SQL = '''
+    INSERT INTO draws (keyword, dream_text, emotion, title, message)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+_writer = None
+_writer_lock = threading.Lock()
 
 def init_db():
     """
-    初始化資料庫與資料表
+    初始化資料庫與資料表（只在第一次呼叫時建立長駐寫入連線）
     """
-    db_path = "dream_log.db"
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS draws (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT DEFAULT (datetime('now', 'localtime')),
-            keyword TEXT,
-            dream_text TEXT,
-            emotion TEXT,
-            title TEXT,
-            message TEXT
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = SQLiteWriter(DB_PATH, DRAWS_SCHEMA, DRAWS_INSERT_SQL, name="draws-writer")
+    return _writer
 
 def save_result(keyword, dream_text, emotion, card):
     """
-    儲存一筆抽卡結果到 SQLite 資料庫
-    """
-    db_path = "dream_log.db"
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    c.execute('''
-        INSERT INTO draws (keyword, dream_text, emotion, title, message)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (keyword, dream_text, emotion, card["title"], card["message"]))
-
-    conn.commit()
-    conn.close()
-
-#Hi
-import sqlite3
-from datetime import datetime
-import os
-
-def init_db():
-    """
-    初始化資料庫與資料表
+    儲存一筆抽卡結果到 SQLite 資料庫（背景批次寫入）
     """
-    db_path = "dream_log.db"
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS draws (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT DEFAULT (datetime('now', 'localtime')),
-            keyword TEXT,
-            dream_text TEXT,
-            emotion TEXT,
-            title TEXT,
-            message TEXT
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-def save_result(keyword, dream_text, emotion, card):
-    """
-    儲存一筆抽卡結果到 SQLite 資料庫
-    """
-    db_path = "dream_log.db"
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    c.execute('''
-        INSERT INTO draws (keyword, dream_text, emotion, title, message)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (keyword, dream_text, emotion, card["title"], card["message"]))
-
-    conn.commit()
-    conn.close()
+    init_db().submit((keyword, dream_text, emotion, card["title"], card["message"]))
@@ -1,8 +1,14 @@
 # add_dream_link.py
 import json
 import os
+from dream_snapshot import DreamSnapshot
+
+SNAPSHOT_PATH = os.getenv("DREAM_LINKS_SNAPSHOT", "dream_links.snap")
 
 def load_links(path="dream_links.json"):
+    # 有快照時直接回傳（新增項目以增量紀錄追加，不重寫整個檔案）
+    if os.path.exists(SNAPSHOT_PATH):
+        return DreamSnapshot(SNAPSHOT_PATH)
     if os.path.exists(path):
         with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
@@ -25,11 +31,17 @@ def main():
             print("⚠️ 網址格式錯誤，請重新輸入")
             continue
 
-        links[keyword] = url
+        if isinstance(links, DreamSnapshot):
+            links.set(keyword, url)
+        else:
+            links[keyword] = url
         print(f"✅ 已新增：{keyword} -> {url}")
 
-    save_links(links)
-    print("💾 已儲存到 dream_links.json")
+    if isinstance(links, DreamSnapshot):
+        print(f"💾 已寫入 {links.log_path}（python dream_snapshot.py compact {SNAPSHOT_PATH} 可整併）")
+    else:
+        save_links(links)
+        print("💾 已儲存到 dream_links.json")
 
 if __name__ == "__main__":
     main()
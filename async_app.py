@@ -0,0 +1,242 @@
+# async_app.py
+# ✅ Dream Oracle 的 ASGI 版本：整條解夢流程都在事件迴圈上以 asyncio 執行
+#   - Gemini：LLMClient.agenerate（generate_content_async）
+#   - 情緒判定 / 抽卡 / 缺字通知：asyncio.to_thread
+#   - 結果寫入：背景輸出管線（publish_result 只是排入佇列，不阻塞）
+#   - LINE 回覆：AsyncMessagingApi（aiohttp）
+#   一個 worker 可同時處理數百個對話，不受執行緒數限制。
+#
+# 啟動：uvicorn async_app:app --port 5001
+#   或：gunicorn async_app:app -k uvicorn.workers.UvicornWorker
+#
+#   ASYNC_MAX_CONVERSATIONS：同時處理中的對話上限，超過時回 503 讓 LINE 稍後重送
+#   ASYNC_WEBHOOK_WAIT=1    ：處理完（含回覆 LINE）才回應 webhook（壓測時與同步版比較用），
+#                             預設 0＝驗簽後立即回 200，在背景處理
+import asyncio
+import json
+import os
+import time
+import traceback
+from pathlib import Path
+
+from dotenv import load_dotenv
+from linebot.v3 import WebhookParser
+from linebot.v3.exceptions import InvalidSignatureError
+from linebot.v3.messaging import AsyncApiClient, AsyncMessagingApi, Configuration, ReplyMessageRequest
+from linebot.v3.webhooks import MessageEvent, TextMessageContent
+
+from dream_core import (
+    process_dream_async, process_dreams_batch, split_keywords,
+    interpretation_cache, semantic_cache, async_interpretation_flight
+)
+from result_sinks import publish_result, get_pipeline
+from llm_client import get_llm_client
+from line_replies import (
+    LINE_API_HOST, QUIT_COMMANDS, LINE_MAX_REPLY_MESSAGES, goodbye_messages,
+    dream_reply_messages, multi_dream_reply_messages
+)
+from metrics import Histogram
+from warmup import start_background_warmup
+
+load_dotenv(dotenv_path=Path(".env"))
+
+LINE_CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
+LINE_CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET")
+
+if not all([LINE_CHANNEL_ACCESS_TOKEN, LINE_CHANNEL_SECRET]):
+    raise EnvironmentError("❌ 請確認 .env 中設定了必要的變數")
+
+ASYNC_MAX_CONVERSATIONS = int(os.getenv("ASYNC_MAX_CONVERSATIONS", "500"))
+ASYNC_WEBHOOK_WAIT = os.getenv("ASYNC_WEBHOOK_WAIT", "0") == "1"
+MULTI_KEYWORD_REPLY = os.getenv("MULTI_KEYWORD_REPLY", "0") == "1"
+
+configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN, host=LINE_API_HOST)
+parser = WebhookParser(LINE_CHANNEL_SECRET)
+
+_line_client = None
+_tasks = set()  # 背景處理中的對話（保留參照，避免被回收）
+conversation_time = Histogram()
+counters = {"events": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+
+def line_api():
+    """整個行程共用一個 AsyncApiClient（連線池），必須在事件迴圈中第一次呼叫"""
+    global _line_client
+    if _line_client is None:
+        _line_client = AsyncApiClient(configuration)
+    return AsyncMessagingApi(_line_client)
+
+
+# === ✅ 處理使用者文字訊息 ===
+async def handle_message(event):
+    user_input = event.message.text.strip()
+    user_id = event.source.user_id
+    started = time.monotonic()
+
+    try:
+        keywords = split_keywords(user_input) if MULTI_KEYWORD_REPLY else []
+        results = []
+        if user_input.lower() in QUIT_COMMANDS:
+            messages = goodbye_messages()
+        elif len(keywords) > 1:
+            keywords = keywords[:LINE_MAX_REPLY_MESSAGES]
+            results = await asyncio.to_thread(process_dreams_batch, keywords, user_id, False)
+            messages = multi_dream_reply_messages(keywords, results)
+        else:
+            keywords = [user_input]
+            results = [await process_dream_async(user_input, user_id=user_id, persist=False)]
+            messages = dream_reply_messages(user_input, results[0])
+
+        # 先排入背景輸出再回覆，回覆失敗也會留下紀錄
+        for keyword, result in zip(keywords, results):
+            publish_result(keyword, result["dream_text"], result["emotion"], result, user_id)
+
+        await line_api().reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=messages))
+        counters["completed"] += 1
+
+    except Exception as e:
+        counters["failed"] += 1
+        traceback.print_exc()
+        print(f"[ERROR] 回傳訊息失敗：{str(e)}")
+    finally:
+        conversation_time.observe(time.monotonic() - started)
+
+
+def _active():
+    return len(_tasks)
+
+
+# === ✅ 路由 ===
+async def callback(scope, body):
+    signature = dict(scope["headers"]).get(b"x-line-signature", b"").decode()
+    try:
+        events = parser.parse(body.decode("utf-8"), signature)
+    except InvalidSignatureError:
+        print("⚠️ Invalid signature.")
+        return 400, "Bad Request"
+
+    events = [e for e in events if isinstance(e, MessageEvent) and isinstance(e.message, TextMessageContent)]
+    if _active() + len(events) > ASYNC_MAX_CONVERSATIONS:
+        counters["rejected"] += len(events)
+        print("⚠️ 處理中的對話已達上限，請 LINE 稍後重送")
+        return 503, "Service Unavailable"
+
+    counters["events"] += len(events)
+    tasks = [asyncio.create_task(handle_message(e)) for e in events]
+    for task in tasks:
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    if ASYNC_WEBHOOK_WAIT and tasks:
+        await asyncio.gather(*tasks)
+    return 200, "OK"
+
+
+async def index(scope, body):
+    return 200, "🌙 Dream Oracle LINE BOT（asyncio）正在運行中！"
+
+
+async def async_stats(scope, body):
+    return 200, {
+        "active": _active(),
+        "max_conversations": ASYNC_MAX_CONVERSATIONS,
+        **counters,
+        "conversation_time": conversation_time.snapshot(),
+    }
+
+
+async def llm_stats(scope, body):
+    return 200, get_llm_client().stats()
+
+
+async def cache_stats(scope, body):
+    if interpretation_cache is None:
+        return 200, {"enabled": False}
+    return 200, {"enabled": True, **interpretation_cache.stats()}
+
+
+async def semantic_cache_stats(scope, body):
+    if semantic_cache is None:
+        return 200, {"enabled": False}
+    return 200, {"enabled": True, **semantic_cache.stats()}
+
+
+async def single_flight_stats(scope, body):
+    return 200, {**async_interpretation_flight.stats(), "waiting": async_interpretation_flight.waiting()}
+
+
+async def sink_stats(scope, body):
+    return 200, get_pipeline().stats()
+
+
+ROUTES = {
+    ("GET", "/"): index,
+    ("POST", "/callback"): callback,
+    ("GET", "/stats/async"): async_stats,
+    ("GET", "/stats/llm"): llm_stats,
+    ("GET", "/stats/cache"): cache_stats,
+    ("GET", "/stats/semantic-cache"): semantic_cache_stats,
+    ("GET", "/stats/single-flight"): single_flight_stats,
+    ("GET", "/stats/sinks"): sink_stats,
+}
+
+
+# === ✅ ASGI 進入點 ===
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _respond(send, status, payload):
+    if isinstance(payload, (dict, list)):
+        body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), b"application/json"
+    else:
+        body, content_type = str(payload).encode("utf-8"), b"text/plain; charset=utf-8"
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_background_warmup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _tasks:
+                await asyncio.wait(list(_tasks), timeout=10)
+            if _line_client is not None:
+                await _line_client.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    route = ROUTES.get((scope["method"], scope["path"]))
+    if route is None:
+        return await _respond(send, 404, "Not Found")
+
+    body = await _read_body(receive)
+    try:
+        status, payload = await route(scope, body)
+    except Exception as e:
+        traceback.print_exc()
+        status, payload = 500, f"🔥 其他錯誤：{e}"
+    await _respond(send, status, payload)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, port=5001)
@@ -0,0 +1,62 @@
+# bench_batch_interpretation.py
+# 比較逐一呼叫 Gemini 與批次解夢（多個關鍵字合併成一次請求）的吞吐量
+# 使用本機假模型：每次請求固定延遲 + 每個關鍵字的生成時間，不會呼叫 Gemini
+import random
+import re
+import time
+
+import dream_core
+import llm_client
+from card_deck import DECK
+from llm_client import FakeModel, LLMClient
+
+KEYWORDS = ["蛇", "掉牙", "飛翔", "考試", "下雨", "迷路", "結婚", "火災", "貓", "海邊",
+            "搬家", "電梯", "老師", "懷孕", "追殺", "鬼", "錢", "鏡子", "墜落", "嬰兒"]
+REQUEST_LATENCY = 0.3   # 每次請求的固定延遲（連線、排隊、首字）
+PER_ITEM_LATENCY = 0.05  # 每個關鍵字的生成時間
+DROP_RATE = 0.1          # 批次回覆中故意漏掉的比例，用來測試個別補查
+
+_ITEM = re.compile(r"^\d+\.\s*(.+)$", re.M)
+
+
+def make_responder(rng):
+    def respond(prompt):
+        items = _ITEM.findall(prompt) if "關鍵字：xxx" in prompt else [None]
+        time.sleep(REQUEST_LATENCY + PER_ITEM_LATENCY * len(items))
+        if items == [None]:
+            return "這個夢代表你正在面對生活中的改變，試著放慢腳步，溫柔地接住自己。"
+        blocks = []
+        for i, keyword in enumerate(items, 1):
+            if rng.random() < DROP_RATE:
+                continue
+            blocks.append(
+                f"{i}. 關鍵字：{keyword}\n"
+                f"說明：夢見「{keyword}」象徵你內心正在整理近期的感受，\n給自己一點時間就好。\n"
+                f"情緒：{rng.choice(DECK.emotions)}"
+            )
+        return "\n\n".join(blocks)
+    return respond
+
+
+def run(name, fn, keywords):
+    model = FakeModel(responder=make_responder(random.Random(7)))
+    llm_client._client = LLMClient(model=model)
+    dream_core.interpretation_cache = None  # 關閉快取，只比較 Gemini 呼叫本身
+    started = time.perf_counter()
+    results = fn(keywords)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<16}{elapsed:8.2f} 秒  {len(keywords) / elapsed:6.1f} 個/秒  Gemini 請求 {model.calls} 次")
+    return elapsed, results
+
+
+def main():
+    print(f"🔮 {len(KEYWORDS)} 個關鍵字，每批最多 {dream_core.BATCH_MAX_KEYWORDS} 個，漏回比例 {DROP_RATE:.0%}\n")
+    single_time, _ = run("逐一呼叫", lambda kws: [dream_core.process_dream(k, persist=False) for k in kws], KEYWORDS)
+    batch_time, results = run("批次", lambda kws: dream_core.process_dreams_batch(kws, persist=False), KEYWORDS)
+
+    assert [r["dream_text"] for r in results if r["dream_text"].startswith("⚠️")] == []
+    print(f"\n⚡ 吞吐量提升：{single_time / batch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# bench_card_deck.py
+# 比較「pandas 每次篩選抽卡」與「card_deck 預先索引抽卡」的耗時
+import random
+import timeit
+
+from card_deck import CARDS_CSV_PATH, DECK
+
+N = 20000
+
+
+def draw_with_deck():
+    DECK.draw(random.choice(DECK.emotions))
+
+
+def main():
+    emotions = DECK.emotions
+    print(f"🃏 牌組共 {len(DECK)} 張、{len(emotions)} 種情緒，每種方式抽 {N} 次\n")
+
+    deck_time = timeit.timeit(draw_with_deck, number=N)
+    print(f"card_deck.draw      ：{deck_time / N * 1e6:8.2f} µs / 次")
+
+    try:
+        import pandas as pd
+    except ImportError:
+        print("⚠️ 未安裝 pandas，略過舊版對照組")
+        return
+
+    cards_df = pd.read_csv(CARDS_CSV_PATH)
+
+    # 原本 dream_core.get_emotion_card 的寫法
+    def draw_with_pandas():
+        emotion = random.choice(emotions)
+        if emotion in cards_df["emotion"].unique():
+            matched = cards_df[cards_df["emotion"] == emotion]
+            matched.sample(1).iloc[0].to_dict()
+
+    pandas_time = timeit.timeit(draw_with_pandas, number=N)
+    print(f"pandas 篩選 + sample ：{pandas_time / N * 1e6:8.2f} µs / 次")
+    print(f"\n⚡ 加速倍數：{pandas_time / deck_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# bench_dream_snapshot.py
+# 比較以 JSON 載入整個字典與開啟 mmap 快照的啟動時間、記憶體與查詢速度
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from dream_snapshot import DreamSnapshot, write_snapshot
+
+N_KEYWORDS = 50000
+VALUE = "夢見此景象徵你正在面對生活中的轉變，內心渴望安定與被理解，試著放慢腳步，溫柔地接住自己。" * 2
+
+
+def measure(name, load):
+    tracemalloc.start()
+    started = time.perf_counter()
+    data = load()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<12}載入 {elapsed * 1000:8.1f} ms   Python 記憶體高峰 {peak / 1e6:7.1f} MB")
+    return data
+
+
+def lookups(name, data, keys):
+    started = time.perf_counter()
+    for key in keys:
+        data[key]
+    print(f"{name:<12}查詢 {(time.perf_counter() - started) / len(keys) * 1e6:8.2f} µs / 次")
+
+
+def main():
+    rng = random.Random(42)
+    items = {f"關鍵字{i:06d}": f"https://www.golla.tw/x/{i}.html|{VALUE}" for i in range(N_KEYWORDS)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, snap_path = Path(tmp) / "links.json", Path(tmp) / "links.snap"
+        json_path.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+        write_snapshot(items, str(snap_path))
+        print(f"📚 {N_KEYWORDS} 筆，JSON {json_path.stat().st_size / 1e6:.1f} MB，快照 {snap_path.stat().st_size / 1e6:.1f} MB\n")
+
+        as_dict = measure("JSON dict", lambda: json.loads(json_path.read_text(encoding="utf-8")))
+        snapshot = measure("mmap 快照", lambda: DreamSnapshot(str(snap_path)))
+        print()
+
+        keys = rng.sample(list(items), 10000)
+        lookups("JSON dict", as_dict, keys)
+        lookups("mmap 快照", snapshot, keys)
+
+        snapshot.set("新關鍵字", "https://www.golla.tw/new.html")
+        assert DreamSnapshot(str(snap_path))["新關鍵字"] == "https://www.golla.tw/new.html"
+        assert snapshot.compact() == N_KEYWORDS + 1
+        snapshot.close()
+
+
+if __name__ == "__main__":
+    main()
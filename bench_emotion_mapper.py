@@ -0,0 +1,78 @@
+# bench_emotion_mapper.py
+# 比較 map_emotion 的 Aho–Corasick 單次掃描（預設）與 jieba 分詞比對
+import csv
+import random
+import time
+from pathlib import Path
+
+from emotion_lexicon import get_lexicon
+from emotion_mapper import map_emotion_automaton, map_emotion_jieba
+
+ROUNDS = 5
+OUTPUT_DIR = Path(__file__).parent / "output"
+
+
+def load_corpus():
+    """從歷史輸出讀取解夢文字，並以關鍵詞隨機組句補足語料"""
+    corpus = []
+    for path in OUTPUT_DIR.glob("*.csv"):
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                text = (row.get("dream_text") or "").strip()
+                if text and not text.startswith("⚠️"):
+                    corpus.append(text)
+
+    rng = random.Random(42)
+    words = [w for ws in get_lexicon().emotions.values() for w in ws]
+    filler = "夢境反映了你內心深處的想法，也許最近的生活讓你有些感觸，試著溫柔地對待自己。"
+    while len(corpus) < 500:
+        parts = [filler[rng.randrange(len(filler)):] for _ in range(3)] + rng.sample(words, 3)
+        rng.shuffle(parts)
+        corpus.append("".join(parts))
+    return corpus
+
+
+def naive_map_emotion(text):
+    # 對照組：不分詞，逐一以 str.count 比對每個關鍵詞
+    best, best_count = "未知", 0
+    for emotion, words in get_lexicon().emotions.items():
+        count = sum(text.count(w) for w in words)
+        if count > best_count:
+            best, best_count = emotion, count
+    return best
+
+
+def bench(name, fn, corpus):
+    fn(corpus[0])  # 預熱（jieba 會在此載入字典）
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for text in corpus:
+            fn(text)
+    elapsed = time.perf_counter() - started
+    n = ROUNDS * len(corpus)
+    print(f"{name:<24}{elapsed / n * 1e6:10.1f} µs / 篇")
+    return elapsed
+
+
+def main():
+    corpus = load_corpus()
+    chars = sum(len(t) for t in corpus)
+    print(f"📚 語料 {len(corpus)} 篇，平均 {chars / len(corpus):.0f} 字，每種方式跑 {ROUNDS} 輪\n")
+
+    automaton_time = bench("Aho–Corasick（預設）", map_emotion_automaton, corpus)
+    naive_time = bench("逐詞 str.count", naive_map_emotion, corpus)
+
+    try:
+        import jieba  # noqa: F401
+    except ImportError:
+        print("⚠️ 未安裝 jieba，略過 jieba 對照組")
+        print(f"\n⚡ 相對逐詞比對：{naive_time / automaton_time:.1f}x")
+        return
+
+    jieba_time = bench("jieba 分詞", map_emotion_jieba, corpus)
+    agree = sum(map_emotion_automaton(t) == map_emotion_jieba(t) for t in corpus)
+    print(f"\n⚡ 相對 jieba：{jieba_time / automaton_time:.1f}x，判定一致率 {agree / len(corpus):.1%}")
+
+
+if __name__ == "__main__":
+    main()
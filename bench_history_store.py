@@ -0,0 +1,78 @@
+# bench_history_store.py
+# 比較「每筆開連線 + 建表 + commit」與 history_store 單一寫入器的吞吐量
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from history_store import HISTORY_INSERT_SQL, HISTORY_SCHEMA, SQLiteWriter
+
+THREADS = 8
+ROWS_PER_THREAD = 250
+
+
+def sample_row(i):
+    return ("2025-07-02 07:27:58", f"user{i % 50}", "蛇", "夢見蛇代表潛在危險與內在恐懼。", "恐懼", "內心的影子", "面對恐懼，你才能真正自由。", "E1.jpg")
+
+
+def save_per_connection(path, row):
+    # 原本 dream_core.save_to_sqlite 的寫法
+    conn = sqlite3.connect(path, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute(HISTORY_SCHEMA[0])
+    cursor.execute(HISTORY_INSERT_SQL, row)
+    conn.commit()
+    conn.close()
+
+
+def run_threads(target):
+    threads = [threading.Thread(target=target, args=(t,)) for t in range(THREADS)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started
+
+
+def count_rows(path):
+    conn = sqlite3.connect(path)
+    n = conn.execute("SELECT COUNT(*) FROM dream_history").fetchone()[0]
+    conn.close()
+    return n
+
+
+def main():
+    total = THREADS * ROWS_PER_THREAD
+    workdir = tempfile.mkdtemp(prefix="dream_bench_")
+    print(f"🧪 {THREADS} 條執行緒，共寫入 {total} 筆\n")
+
+    old_path = os.path.join(workdir, "old.db")
+
+    def old_worker(t):
+        for i in range(ROWS_PER_THREAD):
+            save_per_connection(old_path, sample_row(i))
+
+    old_time = run_threads(old_worker)
+    print(f"每筆開連線 + commit   ：{total / old_time:10.0f} 筆/秒（{count_rows(old_path)} 筆）")
+
+    new_path = os.path.join(workdir, "new.db")
+    writer = SQLiteWriter(new_path, HISTORY_SCHEMA, HISTORY_INSERT_SQL)
+
+    def new_worker(t):
+        for i in range(ROWS_PER_THREAD):
+            writer.submit(sample_row(i))
+
+    started = time.perf_counter()
+    run_threads(new_worker)
+    writer.flush()
+    new_time = time.perf_counter() - started
+    stats = writer.stats()
+    writer.close()
+    print(f"history_store 批次寫入：{total / new_time:10.0f} 筆/秒（{count_rows(new_path)} 筆，{stats['batches']} 次 commit）")
+    print(f"\n⚡ 加速倍數：{old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
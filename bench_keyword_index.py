@@ -0,0 +1,44 @@
+# bench_keyword_index.py
+# 以數萬個合成關鍵字測試 keyword_index 的建立時間與各種查詢延遲
+import random
+import time
+
+from keyword_index import KeywordIndex
+
+N_KEYWORDS = 30000
+ROUNDS = 2000
+CHARS = "蛇貓狗火水山海雨雪風雷龍虎鬼神佛車船飛掉牙齒錢考試老師學校結婚懷孕嬰兒死亡追殺墜落迷路房子搬家"
+
+
+def synthetic_keywords(rng):
+    keywords = set()
+    while len(keywords) < N_KEYWORDS:
+        keywords.add("".join(rng.choice(CHARS) for _ in range(rng.randint(2, 5))))
+    return sorted(keywords)
+
+
+def bench(name, index, queries):
+    started = time.perf_counter()
+    for q in queries:
+        index.lookup(q)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<14}{elapsed / len(queries) * 1e6:10.1f} µs / 次")
+
+
+def main():
+    rng = random.Random(42)
+    keywords = synthetic_keywords(rng)
+
+    started = time.perf_counter()
+    index = KeywordIndex(keywords)
+    print(f"📚 {len(index)} 個關鍵字，建立索引 {time.perf_counter() - started:.2f} 秒\n")
+
+    sample = [rng.choice(keywords) for _ in range(ROUNDS)]
+    bench("完全相同", index, sample)
+    bench("句中包含", index, [f"昨晚夢到一個{kw}然後醒來" for kw in sample])
+    bench("近似（錯一字）", index, [kw[:-1] + rng.choice("甲乙丙丁") for kw in sample if len(kw) >= 4])
+    bench("查無結果", index, ["今天天氣很好" + str(i) for i in range(ROUNDS)])
+
+
+if __name__ == "__main__":
+    main()
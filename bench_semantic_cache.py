@@ -0,0 +1,90 @@
+# bench_semantic_cache.py
+# 以 dream_history.db 的歷史查詢依序重播，比較「精確快取」與「精確 + 近似句快取」的命中率，並量測近似查詢延遲
+#
+#   python bench_semantic_cache.py [dream_history.db]
+# 資料庫不存在或沒有紀錄時，改用合成的換句話說查詢
+import os
+import random
+import sqlite3
+import sys
+import time
+
+from history_store import HISTORY_DB_PATH
+from interpretation_cache import normalize_keyword
+from semantic_cache import SEMANTIC_CACHE_THRESHOLD, SemanticCache
+
+# 同一個夢的不同說法（合成歷史用）
+PARAPHRASES = [
+    ["被蛇咬", "蛇咬我", "夢到被蛇咬", "被蛇咬了"],
+    ["掉牙齒", "牙齒掉了", "夢見牙齒掉光", "掉了牙齒"],
+    ["被狗追", "狗追我", "一直被狗追", "夢到狗追著我"],
+    ["考試遲到", "考試時遲到", "夢到考試遲到了"],
+    ["從高處掉下來", "從高處墜落", "夢見從高處掉落"],
+    ["前任結婚", "前任要結婚", "夢到前任結婚了"],
+    ["房子失火", "家裡房子失火", "夢見房子著火"],
+    ["在海裡游泳", "海裡游泳", "夢到在大海游泳"],
+]
+FILLER = "蛇貓狗火水山海雨雪風雷龍虎鬼神佛車船飛錢學校老師嬰兒鏡子電梯樓梯"
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with sqlite3.connect(path) as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT keyword FROM dream_history WHERE keyword IS NOT NULL ORDER BY id"
+        )]
+
+
+def synthetic_history(n=5000, seed=42):
+    """七成是常見夢境的不同說法，三成是少見的隨機關鍵字"""
+    rng = random.Random(seed)
+    history = []
+    for _ in range(n):
+        if rng.random() < 0.7:
+            history.append(rng.choice(rng.choice(PARAPHRASES)))
+        else:
+            history.append("".join(rng.choice(FILLER) for _ in range(rng.randint(2, 4))))
+    return history
+
+
+def replay(history, threshold):
+    exact, semantic = set(), SemanticCache(maxsize=2048, threshold=threshold)
+    exact_hits = semantic_hits = 0
+    latencies = []
+    for keyword in history:
+        if normalize_keyword(keyword) in exact:
+            exact_hits += 1
+            continue
+        started = time.perf_counter()
+        found = semantic.lookup(keyword)
+        latencies.append(time.perf_counter() - started)
+        if found is not None:
+            semantic_hits += 1
+        else:
+            semantic.set(keyword, keyword)   # 模擬呼叫 Gemini 後寫回
+        exact.add(normalize_keyword(keyword))
+    return exact_hits, semantic_hits, sorted(latencies), len(semantic)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else HISTORY_DB_PATH
+    history = load_history(path)
+    source = path
+    if not history:
+        history, source = synthetic_history(), "合成資料"
+    print(f"📜 重播 {len(history)} 筆查詢（{source}）\n")
+
+    for threshold in sorted({0.7, SEMANTIC_CACHE_THRESHOLD, 0.9}):
+        exact_hits, semantic_hits, latencies, size = replay(history, threshold)
+        total = len(history)
+        p50 = latencies[len(latencies) // 2] * 1e6 if latencies else 0.0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1e6 if latencies else 0.0
+        print(f"門檻 {threshold:.2f}：精確快取命中 {exact_hits / total:6.1%}"
+              f"，加上近似快取 {(exact_hits + semantic_hits) / total:6.1%}"
+              f"（省下 {semantic_hits} 次 Gemini，快取 {size} 筆）"
+              f"，近似查詢 p50 {p50:.1f} µs、p99 {p99:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
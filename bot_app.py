@@ -1,24 +1,51 @@
-from flask import Flask, request, abort, send_from_directory
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from flask import (
+    Flask, request, abort, send_from_directory, send_file, jsonify, g,
+    Response, stream_with_context, url_for
+)
 from linebot.v3 import WebhookHandler
+from linebot.v3.webhook import SignatureValidator
 from linebot.v3.exceptions import InvalidSignatureError
 from linebot.v3.messaging import (
-    Configuration, ApiClient, MessagingApi, ReplyMessageRequest,
-    TextMessage, ImageMessage
+    Configuration, ApiClient, MessagingApi, ReplyMessageRequest, PushMessageRequest
 )
 from linebot.v3.webhooks import MessageEvent, TextMessageContent
 from dotenv import load_dotenv
 from pathlib import Path
-import google.generativeai as genai
-import psycopg2
 import os
 import traceback
-from dream_core import process_dream
-from database import write_to_postgres, init_db, get_all_logs, upgrade_db_add_user_id
+import base64
+import itertools
+import json
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+from html import escape
+from dream_core import process_dream, process_dream_local, process_dream_remote, process_dreams_batch, split_keywords, interpretation_cache, semantic_cache, interpretation_flight
+from database import write_to_postgres, get_logs_page, iter_logs
+from result_sinks import publish_result, get_pipeline
+from task_queue import WorkQueue
+from llm_client import get_llm_client
+from keyword_index import get_keyword_index
+from precompute import get_precomputed_store
+from card_assets import CARD_ASSET_MAX_AGE, get_card_assets
+from line_replies import (
+    LINE_API_HOST, QUIT_COMMANDS, LINE_MAX_REPLY_MESSAGES, goodbye_messages, acknowledgement_messages,
+    rate_limited_messages, busy_messages, dream_reply_messages, multi_dream_reply_messages
+)
+from rate_limit import LoadShedder, create_default_rate_limiter
+from metrics import (
+    REGISTRY, TRACE_HEADER, TRACE_SLOW_SECONDS, counter_samples, gauge_sample,
+    stage, start_trace, finish_trace, trace_request
+)
+from two_phase import TWO_PHASE_MODE, two_phase_wait, reply_timings, get_two_phase_executor
+from lazy_import import IMPORT_TIMINGS
+from warmup import WARMUP_TIMINGS, start_background_warmup
 
 # === ✅ 初始化環境變數與 API 金鑰 ===
 load_dotenv(dotenv_path=Path(".env"))
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 LINE_CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
 LINE_CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET")
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -28,18 +55,69 @@ if not all([LINE_CHANNEL_ACCESS_TOKEN, LINE_CHANNEL_SECRET, DATABASE_URL]):
 
 # === ✅ 初始化 Flask 與 LINE Webhook Handler ===
 app = Flask(__name__)
-configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
+configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN, host=LINE_API_HOST)
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
-# === ✅ 啟動時建立資料表與補欄位 ===
-init_db()
-upgrade_db_add_user_id()
+# === ✅ Webhook 處理模式：sync（預設，同步處理）或 async（驗簽後排入佇列並立即回 200） ===
+WEBHOOK_MODE = os.getenv("WEBHOOK_MODE", "sync").lower()
+webhook_queue = None
+signature_validator = SignatureValidator(LINE_CHANNEL_SECRET)
+
+if WEBHOOK_MODE == "async":
+    webhook_queue = WorkQueue(
+        workers=int(os.getenv("WEBHOOK_WORKERS", "4")),
+        maxsize=int(os.getenv("WEBHOOK_QUEUE_SIZE", "100")),
+        backpressure=os.getenv("WEBHOOK_BACKPRESSURE", "block"),
+        block_timeout=float(os.getenv("WEBHOOK_BLOCK_TIMEOUT", "1.0")),
+        name="webhook",
+    ).start()
+
+# === ✅ 限流（RATE_LIMIT_*）與過載降級（SHED_*），見 rate_limit.py ===
+rate_limiter = create_default_rate_limiter()
+load_shedder = LoadShedder(
+    depth=lambda: webhook_queue.depth() if webhook_queue is not None else 0,
+    latency=get_llm_client().attempt_latency,
+)
+
+# === ✅ 慢請求追蹤（TRACE_SLOW_SECONDS / TRACE_HEADER，或請求帶 X-Dream-Trace: 1），見 metrics.py ===
+def _trace_requested():
+    return TRACE_HEADER or request.headers.get("X-Dream-Trace") == "1"
+
+@app.before_request
+def begin_trace():
+    if TRACE_SLOW_SECONDS > 0 or _trace_requested():
+        g.trace = start_trace(f"{request.method} {request.path}")
+
+@app.after_request
+def add_server_timing(response):
+    started = g.pop("trace", None)
+    if started is not None:
+        if _trace_requested():
+            response.headers["Server-Timing"] = started[0].server_timing()
+        finish_trace(started)
+    return response
+
+# === ✅ 資料表遷移不在 import 時執行：第一次使用連線池時自動執行（flask run 亦同），
+#   gunicorn 另由 post_worker_init 的背景預熱提早觸發（見 warmup.py）；
+#   Procfile 以 release 步驟執行 python migrate.py，web 行程設定 DB_MIGRATE_ON_STARTUP=0
 
 # === ✅ 卡牌圖片靜態路由 ===
 @app.route("/Cards/<path:filename>")
 def serve_card_image(filename):
     return send_from_directory("Cards", filename)
 
+# === ✅ 卡牌原圖與預覽圖（檔名含內容雜湊：強 ETag、immutable 長效快取、If-None-Match 回 304） ===
+@app.route("/card-assets/<filename>")
+def serve_card_asset(filename):
+    asset = get_card_assets().asset(filename)
+    if asset is None:
+        abort(404)
+    path, etag, mimetype = asset
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=CARD_ASSET_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 # === ✅ 健康檢查路由 ===
 @app.route("/", methods=["GET"])
 def index():
@@ -51,6 +129,15 @@ def callback():
     signature = request.headers.get("X-Line-Signature", "")
     body = request.get_data(as_text=True)
 
+    if webhook_queue is not None:
+        if not signature_validator.validate(body, signature):
+            app.logger.warning("⚠️ Invalid signature.")
+            abort(400)
+        if not webhook_queue.submit(handler.handle, body, signature):
+            app.logger.warning("⚠️ Webhook 佇列已滿，請 LINE 稍後重送")
+            abort(503)
+        return "OK"
+
     try:
         handler.handle(body, signature)
     except InvalidSignatureError:
@@ -63,60 +150,250 @@ def callback():
 
     return "OK"
 
+# === ✅ Webhook 佇列狀態 ===
+@app.route("/stats/webhook", methods=["GET"])
+def webhook_stats():
+    if webhook_queue is None:
+        return jsonify({"mode": WEBHOOK_MODE})
+    return jsonify({"mode": WEBHOOK_MODE, **webhook_queue.stats()})
+
+# === ✅ 解夢快取狀態 ===
+@app.route("/stats/cache", methods=["GET"])
+def cache_stats():
+    if interpretation_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **interpretation_cache.stats()})
+
+# === ✅ 近似句快取狀態 ===
+@app.route("/stats/semantic-cache", methods=["GET"])
+def semantic_cache_stats():
+    if semantic_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **semantic_cache.stats()})
+
+# === ✅ Gemini 呼叫狀態 ===
+@app.route("/stats/llm", methods=["GET"])
+def llm_stats():
+    return jsonify(get_llm_client().stats())
+
+# === ✅ 請求合併狀態（每個進行中關鍵字的等待人數） ===
+@app.route("/stats/single-flight", methods=["GET"])
+def single_flight_stats():
+    return jsonify({**interpretation_flight.stats(), "waiting": interpretation_flight.waiting()})
+
+# === ✅ dream_links 關鍵字索引（省下的 Gemini 呼叫比例） ===
+@app.route("/stats/keyword-index", methods=["GET"])
+def keyword_index_stats():
+    return jsonify(get_keyword_index().stats())
+
+# === ✅ 預先生成結果（熱門關鍵字零 LLM 呼叫）的命中率 ===
+@app.route("/stats/precomputed", methods=["GET"])
+def precomputed_stats():
+    store = get_precomputed_store()
+    if store is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **store.stats()})
+
+# === ✅ 結果輸出管線狀態 ===
+@app.route("/stats/sinks", methods=["GET"])
+def sink_stats():
+    return jsonify(get_pipeline().stats())
+
+# === ✅ 限流與過載降級次數 ===
+@app.route("/stats/rate-limit", methods=["GET"])
+def rate_limit_stats():
+    return jsonify({
+        "rate_limit": rate_limiter.stats() if rate_limiter is not None else {"enabled": False},
+        "load_shedding": load_shedder.stats(),
+    })
+
+# === ✅ 回覆延遲（第一則訊息 / 完整結果）與兩段式回覆次數 ===
+@app.route("/stats/replies", methods=["GET"])
+def reply_stats():
+    return jsonify(reply_timings.stats())
+
+# === ✅ 卡牌圖片 manifest ===
+@app.route("/stats/card-assets", methods=["GET"])
+def card_asset_stats():
+    return jsonify(get_card_assets().stats())
+
+# === ✅ Prometheus 指標（各階段耗時、快取 / Gemini / 佇列計數） ===
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+# === ✅ 啟動耗時（import、延遲載入模組、背景預熱） ===
+@app.route("/stats/startup", methods=["GET"])
+def startup_stats():
+    return jsonify({
+        "bot_app_import": BOT_APP_IMPORT_SECONDS,
+        "lazy_imports": IMPORT_TIMINGS,
+        "warmup": WARMUP_TIMINGS,
+    })
+
 # === ✅ 處理使用者文字訊息 ===
 @handler.add(MessageEvent, message=TextMessageContent)
 def handle_message(event):
+    # webhook 佇列模式下在工作執行緒執行，沒有外層的 HTTP 請求追蹤
+    with trace_request("handle_message"):
+        handle_text_message(event)
+
+def handle_text_message(event):
+    started = time.perf_counter()
     user_input = event.message.text.strip()
     user_id = event.source.user_id
     print("👤 使用者 ID：", user_id)
 
     try:
-        if user_input.lower() in ["q", "quit", "exit"]:
-            messages = [TextMessage(text="👋 感謝使用 Dream Oracle，再會～")]
+        if user_input.lower() not in QUIT_COMMANDS and reply_if_limited(event, user_input, user_id, started):
+            return
+
+        keywords = split_keywords(user_input) if MULTI_KEYWORD_REPLY else []
+        if len(keywords) > 1:
+            with load_shedder.track():
+                return handle_multi_keyword_message(event, keywords, user_id)
+
+        result = None
+        if user_input.lower() in QUIT_COMMANDS:
+            messages = goodbye_messages()
         else:
-            result = process_dream(user_input)
+            if TWO_PHASE_MODE == "off":
+                with load_shedder.track():
+                    result = process_dream(user_input, user_id=user_id, persist=False)
+            else:
+                result = process_dream_or_acknowledge(event, user_input, user_id, started)
+                if result is None:
+                    return  # 已回覆確認訊息，完整結果稍後推播
             print("[DEBUG] 處理結果：", result)
+            # 先交給背景輸出管線（只是排入佇列）再回覆，回覆失敗（例如 reply token 過期）也會留下紀錄
+            publish_result(user_input, result["dream_text"], result["emotion"], result, user_id)
+            messages = dream_reply_messages(user_input, result)
 
-            write_to_postgres(user_id, user_input, result["emotion"])
+        reply_messages(event.reply_token, messages)
+        reply_timings.first(started)
+        if result is not None:
+            reply_timings.full(started)
 
-            reply_text = (
-                f"🔍 解夢關鍵字：{user_input}\n"
-                f"🧠 解夢結果：\n{result['dream_text']}\n\n"
-                f"🌝 情緒判定：{result['emotion']}\n"
-                f"🃏 命定卡牌：「{result['title']}」\n"
-                f"👉 {result['message']}"
-            )
+    except Exception as e:
+        traceback.print_exc()
+        print(f"[ERROR] 回傳訊息失敗：{str(e)}")
 
-            messages = [TextMessage(text=reply_text[i:i + 4900]) for i in range(0, len(reply_text), 4900)]
+def reply_messages(reply_token, messages):
+    with stage("line_reply"), ApiClient(configuration) as api_client:
+        MessagingApi(api_client).reply_message(
+            ReplyMessageRequest(reply_token=reply_token, messages=messages)
+        )
 
-            if result.get("image"):
-                image_url = f"https://dream-oracle.onrender.com/Cards/{result['image']}"
-                messages.append(ImageMessage(
-                    original_content_url=image_url,
-                    preview_image_url=image_url
-                ))
+# === ✅ 限流與過載降級 ===
+def reply_if_limited(event, user_input, user_id, started):
+    """
+    在此直接回覆並回傳 True 的情況：
+    - 超過每位使用者或全域的次數上限：請使用者稍後再輸入
+    - 過載（排隊 + 處理中太多、或 Gemini 近期延遲過高）：本機能回答（預先生成、快取）就照常回覆，否則回覆忙碌訊息
+    """
+    if rate_limiter is not None and rate_limiter.acquire(event.source.user_id or push_target(event.source),
+                                                         group=group_target(event.source)) is not None:
+        reply_messages(event.reply_token, rate_limited_messages())
+        reply_timings.first(started)
+        return True
 
-            messages.append(TextMessage(text="請再輸入下一個夢境關鍵字吧，我們會為你持續指導\n🌟 Dream Oracle 與你一起探索夢境與情緒 🌙"))
+    if not load_shedder.enabled or load_shedder.overloaded() is None:
+        return False
 
-        with ApiClient(configuration) as api_client:
-            line_bot_api = MessagingApi(api_client)
-            line_bot_api.reply_message(
-                ReplyMessageRequest(
-                    reply_token=event.reply_token,
-                    messages=messages
-                )
+    result = process_dream_local(user_input, user_id=user_id, persist=False)
+    if result is None:
+        load_shedder.incr("shed_busy")
+        reply_messages(event.reply_token, busy_messages())
+        reply_timings.first(started)
+        return True
+
+    load_shedder.incr("shed_local")
+    publish_result(user_input, result["dream_text"], result["emotion"], result, user_id)
+    reply_messages(event.reply_token, dream_reply_messages(user_input, result))
+    reply_timings.first(started)
+    reply_timings.full(started)
+    return True
+
+# === ✅ 兩段式回覆（TWO_PHASE_MODE=auto / always，見 two_phase.py） ===
+def process_dream_or_acknowledge(event, keyword, user_id, started):
+    """
+    本機可直接回答（預先生成、快取）或在 TWO_PHASE_WAIT 秒內完成時回傳結果，照常以 reply token 回覆；
+    否則先以 reply token 回覆確認訊息、完成後改用 push 送出結果，並回傳 None。
+    """
+    result = process_dream_local(keyword, user_id=user_id, persist=False)
+    if result is not None:
+        reply_timings.incr("local")
+        return result
+
+    future = get_two_phase_executor().submit(process_dream_remote_tracked, keyword, user_id)
+    try:
+        result = future.result(timeout=two_phase_wait())
+        reply_timings.incr("single_phase")
+        return result
+    except FutureTimeoutError:
+        pass
+
+    reply_timings.incr("two_phase")
+    try:
+        reply_messages(event.reply_token, acknowledgement_messages(keyword))
+        reply_timings.first(started)
+    finally:
+        # 確認訊息送出失敗（例如 reply token 過期）時照樣推播並寫入結果
+        future.add_done_callback(lambda done: push_dream_result(event, keyword, user_id, done, started))
+    return None
+
+def process_dream_remote_tracked(keyword, user_id):
+    with load_shedder.track():
+        return process_dream_remote(keyword, user_id=user_id, persist=False)
+
+def group_target(source):
+    """群組 / 聊天室 ID，一對一聊天為 None"""
+    return getattr(source, "group_id", None) or getattr(source, "room_id", None)
+
+def push_target(source):
+    """群組 / 聊天室推播到群組本身，一對一推播給使用者"""
+    return group_target(source) or source.user_id
+
+def push_dream_result(event, keyword, user_id, future, started):
+    try:
+        result = future.result()
+        publish_result(keyword, result["dream_text"], result["emotion"], result, user_id)
+        messages = dream_reply_messages(keyword, result)[:LINE_MAX_REPLY_MESSAGES]
+        with stage("line_push"), ApiClient(configuration) as api_client:
+            MessagingApi(api_client).push_message(
+                PushMessageRequest(to=push_target(event.source), messages=messages)
             )
+        reply_timings.full(started)
+        reply_timings.incr("pushed")
 
     except Exception as e:
+        reply_timings.incr("push_errors")
         traceback.print_exc()
-        print(f"[ERROR] 回傳訊息失敗：{str(e)}")
+        print(f"[ERROR] 推播解夢結果失敗：{str(e)}")
 
-# === ✅ 顯示更新記錄 ===
-@app.route("/logs", methods=["GET"])
-def view_logs():
+# === ✅ 一則訊息多個關鍵字（MULTI_KEYWORD_REPLY=1 時啟用，合併成一次 Gemini 批次請求） ===
+MULTI_KEYWORD_REPLY = os.getenv("MULTI_KEYWORD_REPLY", "0") == "1"
+
+def handle_multi_keyword_message(event, keywords, user_id):
     try:
-        rows = get_all_logs()
-        html = """
+        keywords = keywords[:LINE_MAX_REPLY_MESSAGES]
+        results = process_dreams_batch(keywords, user_id=user_id, persist=False)
+        for keyword, result in zip(keywords, results):
+            publish_result(keyword, result["dream_text"], result["emotion"], result, user_id)
+
+        messages = multi_dream_reply_messages(keywords, results)
+
+        reply_messages(event.reply_token, messages)
+
+    except Exception as e:
+        traceback.print_exc()
+        print(f"[ERROR] 回傳訊息失敗：{str(e)}")
+
+# === ✅ 顯示更新記錄（keyset 分頁 + 串流輸出） ===
+LOGS_PAGE_SIZE = int(os.getenv("LOGS_PAGE_SIZE", "100"))
+LOGS_MAX_PAGE_SIZE = int(os.getenv("LOGS_MAX_PAGE_SIZE", "1000"))
+
+LOGS_HTML_HEAD = """
         <html>
         <head>
             <title>Dream Oracle - 使用者夢境記錄</title>
@@ -161,12 +438,9 @@ def view_logs():
         </head>
         <body>
             <h2>🌙 使用者夢境記錄</h2>
-        """
+"""
 
-        if not rows:
-            html += "<p class='empty'>目前尚無資料紀錄。</p>"
-        else:
-            html += """
+LOGS_TABLE_HEAD = """
             <table>
                 <thead>
                     <tr>
@@ -177,21 +451,111 @@ def view_logs():
                     </tr>
                 </thead>
                 <tbody>
-            """
+"""
+
+def _encode_cursor(timestamp, row_id):
+    raw = json.dumps([timestamp.isoformat() if timestamp else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(value):
+    if not value:
+        return None
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(value.encode()))
+        return (datetime.fromisoformat(timestamp) if timestamp is not None else None, int(row_id))
+    except Exception:
+        raise ValueError("cursor 格式錯誤")
+
+def _parse_logs_args():
+    """
+    解析 /logs 查詢參數：limit、cursor、user_id、emotion、since、until（ISO 日期時間）
+    """
+    args = request.args
+    limit = min(max(int(args.get("limit", LOGS_PAGE_SIZE)), 1), LOGS_MAX_PAGE_SIZE)
+    filters = {
+        "user_id": args.get("user_id") or None,
+        "emotion": args.get("emotion") or None,
+        "since": datetime.fromisoformat(args["since"]) if args.get("since") else None,
+        "until": datetime.fromisoformat(args["until"]) if args.get("until") else None,
+    }
+    return limit, _decode_cursor(args.get("cursor")), filters
+
+@app.route("/logs", methods=["GET"])
+def view_logs():
+    try:
+        limit, after, filters = _parse_logs_args()
+    except ValueError as e:
+        return f"❌ 參數錯誤：{str(e)}", 400
+
+    def generate():
+        yield LOGS_HTML_HEAD
+        # 在產生器內才借連線：用戶端在開始讀取前就斷線時不會佔用連線；
+        # 多取一筆，只有確實還有資料時才顯示「下一頁」
+        rows = iter_logs(limit=limit + 1, after=after, **filters)
+        count, last, has_more = 0, None, False
+        try:
             for row in rows:
-                user_id = row[0]
-                keyword = row[1]
-                emotion = row[2]
-                timestamp = row[3].strftime("%Y-%m-%d %H:%M:%S") if row[3] else "無時間"
-                html += f"<tr><td>{user_id}</td><td>{keyword}</td><td>{emotion}</td><td>{timestamp}</td></tr>"
-            html += "</tbody></table>"
+                if count == limit:
+                    has_more = True
+                    break
+                if count == 0:
+                    yield LOGS_TABLE_HEAD
+                count, last = count + 1, row
+                timestamp = row[4].strftime("%Y-%m-%d %H:%M:%S") if row[4] else "無時間"
+                yield (
+                    f"<tr><td>{escape(str(row[1]))}</td><td>{escape(str(row[2]))}</td>"
+                    f"<td>{escape(str(row[3]))}</td><td>{timestamp}</td></tr>\n"
+                )
+        except Exception as e:
+            traceback.print_exc()
+            if count == 0:
+                yield f"<p class='empty'>❌ 查詢失敗：{escape(str(e))}</p>"
+                yield "</body></html>"
+                return
+            yield f"<tr><td colspan='4'>❌ 查詢中斷：{escape(str(e))}</td></tr>"
+        finally:
+            rows.close()   # 提前離開時立即歸還連線
 
-        html += "</body></html>"
-        return html
+        if count == 0:
+            yield "<p class='empty'>目前尚無資料紀錄。</p>"
+            yield "</body></html>"
+            return
+        yield "</tbody></table>"
 
+        if has_more:
+            params = request.args.to_dict()
+            params["cursor"] = _encode_cursor(last[4], last[0])
+            yield f"<p><a href='{escape(url_for('view_logs', **params))}'>下一頁 →</a></p>"
+        yield "</body></html>"
+
+    return Response(stream_with_context(generate()), mimetype="text/html")
+
+@app.route("/logs.json", methods=["GET"])
+def view_logs_json():
+    try:
+        limit, after, filters = _parse_logs_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        rows, next_after = get_logs_page(limit=limit, after=after, **filters)
     except Exception as e:
         traceback.print_exc()
-        return f"❌ 查詢失敗：{str(e)}", 500
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "logs": [
+            {
+                "id": row[0],
+                "user_id": row[1],
+                "keyword": row[2],
+                "emotion": row[3],
+                "timestamp": row[4].isoformat() if row[4] else None,
+            }
+            for row in rows
+        ],
+        "next_cursor": _encode_cursor(*next_after) if next_after else None,
+    })
 
 # === ✅ 手動測試記錄 ===
 @app.route("/log/<keyword>/<emotion>")
@@ -203,5 +567,43 @@ def log(keyword, emotion):
         traceback.print_exc()
         return f"❌ 寫入失敗：{str(e)}", 500
 
+# === ✅ /metrics 的計數來源：沿用各模組既有的 stats，輸出時才讀取 ===
+REGISTRY.attach("dream_llm_call_seconds", get_llm_client().latency, "Gemini 成功呼叫的總耗時（含重試）")
+REGISTRY.attach("dream_llm_attempt_seconds", get_llm_client().attempt_latency, "Gemini 每次請求的耗時")
+REGISTRY.attach("dream_reply_first_message_seconds", reply_timings.first_message, "收到事件到第一則回覆的秒數")
+REGISTRY.attach("dream_reply_full_result_seconds", reply_timings.full_result, "收到事件到送出完整結果的秒數")
+if webhook_queue is not None:
+    REGISTRY.attach("dream_webhook_queue_wait_seconds", webhook_queue.wait_time, "webhook 事件排隊時間")
+
+@REGISTRY.collector
+def collect_app_metrics():
+    llm = get_llm_client()
+    samples = counter_samples("dream_llm_events_total", "Gemini 呼叫、重試、逾時與失敗次數", llm.counters)
+    samples.append(gauge_sample("dream_llm_in_flight", "進行中的 Gemini 請求數", llm.in_flight))
+    for name, cache in (("exact", interpretation_cache), ("semantic", semantic_cache)):
+        if cache is not None:
+            samples += counter_samples("dream_cache_events_total", "解夢快取事件次數", cache.counters, cache=name)
+    store = get_precomputed_store()
+    if store is not None:
+        samples += counter_samples("dream_cache_events_total", "解夢快取事件次數", store.counters, cache="precomputed")
+    samples += counter_samples("dream_keyword_index_total", "dream_links 關鍵字查詢結果", get_keyword_index().counters)
+    samples += counter_samples("dream_reply_events_total", "回覆方式與推播結果", reply_timings.counters)
+    samples += counter_samples("dream_load_shedding_total", "過載判斷與降級次數", load_shedder.counters)
+    if rate_limiter is not None:
+        samples += counter_samples("dream_rate_limit_total", "限流結果次數", rate_limiter.counters)
+    if webhook_queue is not None:
+        samples += counter_samples("dream_webhook_queue_total", "webhook 佇列事件次數", webhook_queue.counters)
+        samples.append(gauge_sample("dream_webhook_queue_depth", "webhook 佇列長度", webhook_queue.depth()))
+    pipeline = get_pipeline().stats()
+    samples += counter_samples("dream_pipeline_events_total", "輸出管線事件次數", {"dropped": pipeline["dropped"]})
+    for sink, sink_stats in pipeline["sinks"].items():
+        samples += counter_samples("dream_sink_events_total", "各輸出寫入筆數、批次與錯誤次數",
+                                   {k: v for k, v in sink_stats.items() if k != "pending"}, sink=sink)
+        samples.append(gauge_sample("dream_sink_pending", "各輸出等待寫入的筆數", sink_stats["pending"], sink=sink))
+    return samples
+
+BOT_APP_IMPORT_SECONDS = round(time.perf_counter() - _IMPORT_STARTED, 4)
+
 if __name__ == "__main__":
+    start_background_warmup()
     app.run(port=5001)
\ No newline at end of file
@@ -0,0 +1,166 @@
+# build_card_previews.py
+# 依 emotion_cards_full.csv 為每張卡牌產生預覽圖（與選用的 WebP）及 manifest，供 card_assets.py 使用
+#
+#   python build_card_previews.py                 產生預覽圖與 manifest（來源未變更的卡牌略過）
+#   python build_card_previews.py --webp          另外產生 WebP 預覽圖
+#   python build_card_previews.py --force --prune 全部重建，並刪除 manifest 不再引用的舊檔
+#
+# 對外檔名含內容雜湊（例如 A1.3f9c2a1b.jpg），內容一變網址就變，所以可以設 immutable 長效快取；
+# 原圖不另外複製，manifest 直接指向 Cards/ 裡的檔案。
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+from pathlib import Path
+
+from card_assets import CARD_ASSET_DIR, CARDS_DIR, MANIFEST_NAME, MANIFEST_VERSION
+from card_deck import CARDS_CSV_PATH, load_deck
+
+# ✅ 預覽圖設定（LINE 的 preview_image_url 上限 1MB，建議短邊約 240px）
+PREVIEW_MAX_SIZE = int(os.getenv("CARD_PREVIEW_MAX_SIZE", "480"))
+PREVIEW_QUALITY = int(os.getenv("CARD_PREVIEW_QUALITY", "80"))
+PREVIEW_MAX_BYTES = 1024 * 1024
+HASH_LENGTH = 12
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def variant_entry(stem, suffix, data, size, path=None):
+    """path 為相對輸出資料夾的實際路徑，未指定時即為對外檔名"""
+    digest = content_hash(data)
+    name = f"{stem}.{digest[:HASH_LENGTH]}{suffix}"
+    return {
+        "file": name,
+        "path": path or name,
+        "etag": digest[:32],
+        "bytes": len(data),
+        "width": size[0],
+        "height": size[1],
+    }
+
+
+def render_preview(image, fmt, quality):
+    """等比例縮到長邊不超過 PREVIEW_MAX_SIZE，超過 1MB 時逐步降低品質"""
+    from PIL import Image
+
+    preview = image.convert("RGB")
+    preview.thumbnail((PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE), Image.LANCZOS)
+    while True:
+        buffer = io.BytesIO()
+        if fmt == "WEBP":
+            preview.save(buffer, "WEBP", quality=quality, method=6)
+        else:
+            preview.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+        if buffer.tell() <= PREVIEW_MAX_BYTES or quality <= 30:
+            return buffer.getvalue(), preview.size
+        quality -= 10
+
+
+def build_card(image_name, source, out_dir, webp, quality):
+    from PIL import Image
+
+    data = source.read_bytes()
+    stem = Path(image_name).stem
+    with Image.open(io.BytesIO(data)) as image:
+        size = image.size
+        variants = {"original": variant_entry(stem, source.suffix.lower(), data, size,
+                                              os.path.relpath(source, out_dir))}
+        formats = [("preview", "JPEG", ".preview.jpg")] + ([("preview_webp", "WEBP", ".preview.webp")] if webp else [])
+        for key, fmt, suffix in formats:
+            preview, preview_size = render_preview(image, fmt, quality)
+            entry = variant_entry(stem, suffix, preview, preview_size)
+            (out_dir / entry["file"]).write_bytes(preview)
+            variants[key] = entry
+    return variants
+
+
+def load_manifest(out_dir):
+    """回傳 (cards, sources)；sources 為每張原圖的 sha256，用來判斷是否需要重建"""
+    path = out_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}, {}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}, {}
+    return manifest.get("cards", {}), manifest.get("sources", {})
+
+
+def write_manifest(out_dir, cards, sources):
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "cards": cards,
+        "sources": sources,
+    }
+    tmp = out_dir / f"{MANIFEST_NAME}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, out_dir / MANIFEST_NAME)
+
+
+def build(csv_path=CARDS_CSV_PATH, cards_dir=CARDS_DIR, out_dir=CARD_ASSET_DIR, webp=False,
+          quality=PREVIEW_QUALITY, force=False, prune=False):
+    out_dir, cards_dir = Path(out_dir), Path(cards_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    images = sorted({card.image for card in load_deck(csv_path).cards if card.image})
+    previous, previous_sources = ({}, {}) if force else load_manifest(out_dir)
+
+    cards, sources, built, skipped, missing = {}, {}, 0, 0, []
+    for image_name in images:
+        source = cards_dir / image_name
+        if not source.exists():
+            missing.append(image_name)
+            continue
+        source_hash = content_hash(source.read_bytes())
+        old = previous.get(image_name)
+        up_to_date = (
+            old is not None
+            and previous_sources.get(image_name) == source_hash
+            and ("preview_webp" in old) == webp
+            and all((out_dir / v["path"]).exists() for v in old.values())
+        )
+        if up_to_date:
+            cards[image_name] = old
+            skipped += 1
+        else:
+            cards[image_name] = build_card(image_name, source, out_dir, webp, quality)
+            built += 1
+        sources[image_name] = source_hash
+
+    write_manifest(out_dir, cards, sources)
+
+    pruned = 0
+    if prune:
+        referenced = {v["file"] for variants in cards.values() for key, v in variants.items() if key != "original"}
+        for path in out_dir.iterdir():
+            if path.name != MANIFEST_NAME and path.name not in referenced and ".preview." in path.name:
+                path.unlink()
+                pruned += 1
+
+    print(f"✅ {len(cards)} 張卡牌：重建 {built}、略過 {skipped}、刪除舊檔 {pruned} → {out_dir / MANIFEST_NAME}")
+    for image_name in missing:
+        print(f"⚠️ 找不到卡牌圖片：{cards_dir / image_name}")
+    return cards
+
+
+def main():
+    ap = argparse.ArgumentParser(description="產生卡牌預覽圖與 manifest")
+    ap.add_argument("--csv", default=str(CARDS_CSV_PATH))
+    ap.add_argument("--cards", default=str(CARDS_DIR), help="原圖資料夾")
+    ap.add_argument("--out", default=CARD_ASSET_DIR)
+    ap.add_argument("--webp", action="store_true", help="另外產生 WebP 預覽圖")
+    ap.add_argument("--quality", type=int, default=PREVIEW_QUALITY)
+    ap.add_argument("--force", action="store_true", help="忽略既有 manifest，全部重建")
+    ap.add_argument("--prune", action="store_true", help="刪除 manifest 不再引用的預覽圖")
+    args = ap.parse_args()
+    build(args.csv, args.cards, args.out, args.webp, args.quality, args.force, args.prune)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,267 @@
 # build_dream_links.py
-import requests
-from bs4 import BeautifulSoup
+# 以廣度優先爬取整個解夢網站，建立「夢境關鍵字 → 解析頁網址」對照表（dream_links.json）
+#
+#   python build_dream_links.py                      從 https://www.golla.tw/ 開始（中斷後重跑會接續）
+#   python build_dream_links.py --workers 8 --rate 2 --max-pages 5000
+#   python build_dream_links.py --reset              清除進度，從頭開始
+#
+# 進度（待爬網址、已完成網址、已找到的關鍵字）存在 SQLite（--state），
+# 每爬完一頁就寫入，程式中斷後重跑會從未完成的網址繼續；
+# dream_links.json 每 --flush-every 頁更新一次，手動加入（add_dream_link.py）的項目不會被覆蓋。
+import argparse
 import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit, urldefrag
 
-def get_all_dream_links(base_url="https://www.golla.tw/"):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    dream_links = {}
+from crawl_cache import fetch_url
 
+DEFAULT_BASE_URL = "https://www.golla.tw/"
+CRAWL_STATE_DB = os.getenv("CRAWL_STATE_DB", "crawl_state.db")
+DREAM_LINKS_SNAPSHOT = os.getenv("DREAM_LINKS_SNAPSHOT", "dream_links.snap")
+NAV_TEXTS = {"首頁", "上一頁", "下一頁", "更多", "返回", "尾頁", "more", "next", "prev"}
+
+
+class LinkExtractor(HTMLParser):
+    """以標準函式庫解析 <a href>，回傳 [(網址, 連結文字)]（不需建立整棵 DOM）"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._href = dict(attrs).get("href")
+            self._text = []
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._href is not None:
+            self.links.append((self._href, "".join(self._text).strip()))
+            self._href = None
+
+
+def extract_links(html, page_url):
+    parser = LinkExtractor()
+    parser.feed(html)
+    for href, text in parser.links:
+        if href.startswith(("javascript:", "mailto:", "#")):
+            continue
+        yield urldefrag(urljoin(page_url, href))[0], text
+
+
+def is_keyword(text):
+    return 0 < len(text) <= 12 and text not in NAV_TEXTS and not text.isdigit()
+
+
+class HostRateLimiter:
+    """每個網站每秒最多 rate 次請求（多個 worker 共用）"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class CrawlState:
+    """
+    爬蟲進度（SQLite）：
+    - frontier：網址、深度、狀態（pending / done / failed）、重試次數；網址為主鍵，天然去重
+    - links   ：關鍵字 → 網址（先找到的為準）
+    只在主執行緒存取。
+    """
+
+    def __init__(self, path=CRAWL_STATE_DB):
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT UNIQUE,
+                depth INTEGER,
+                status TEXT DEFAULT 'pending',
+                tries INTEGER DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_frontier_pending ON frontier (status, depth, id);
+            CREATE TABLE IF NOT EXISTS links (
+                keyword TEXT PRIMARY KEY,
+                url TEXT
+            );
+        """)
+        self._db.commit()
+
+    def reset(self):
+        self._db.executescript("DELETE FROM frontier; DELETE FROM links;")
+        self._db.commit()
+
+    def add_urls(self, urls, depth):
+        self._db.executemany("INSERT OR IGNORE INTO frontier (url, depth) VALUES (?, ?)", [(u, depth) for u in urls])
+
+    def add_links(self, pairs):
+        self._db.executemany("INSERT OR IGNORE INTO links (keyword, url) VALUES (?, ?)", pairs)
+
+    def claim(self, limit, exclude):
+        """依深度（廣度優先）取出待爬網址"""
+        rows = self._db.execute(
+            "SELECT url, depth FROM frontier WHERE status = 'pending' ORDER BY depth, id LIMIT ?",
+            (limit + len(exclude),)
+        ).fetchall()
+        return [row for row in rows if row[0] not in exclude][:limit]
+
+    def finish(self, url, ok, max_tries):
+        if ok:
+            self._db.execute("UPDATE frontier SET status = 'done' WHERE url = ?", (url,))
+        else:
+            self._db.execute(
+                "UPDATE frontier SET tries = tries + 1, "
+                "status = CASE WHEN tries + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE url = ?",
+                (max_tries, url)
+            )
+
+    def commit(self):
+        self._db.commit()
+
+    def links(self):
+        return dict(self._db.execute("SELECT keyword, url FROM links ORDER BY rowid").fetchall())
+
+    def counts(self):
+        counts = dict(self._db.execute("SELECT status, COUNT(*) FROM frontier GROUP BY status").fetchall())
+        counts["links"] = self._db.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+        return counts
+
+    def close(self):
+        self._db.close()
+
+
+def export_links(links, path="dream_links.json"):
+    """合併寫入 dream_links.json（既有項目優先），先寫暫存檔再替換，中斷也不會留下半個檔案"""
+    existing = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            existing = json.load(f)
+    merged = {**links, **existing}
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return merged
+
+
+def crawl_site(base_url=DEFAULT_BASE_URL, state_path=CRAWL_STATE_DB, output="dream_links.json",
+               workers=8, rate=2.0, max_pages=None, max_depth=None, max_tries=3,
+               flush_every=50, reset=False, fetch=fetch_url, log=print):
+    """
+    由 base_url 開始廣度優先爬取同一網站的頁面，回傳 {關鍵字: 網址}。
+    - workers ：同時下載的執行緒數
+    - rate    ：每個網站每秒最多幾次請求
+    - max_pages / max_depth：本次最多爬幾頁 / 最深幾層（None＝不限）
+    """
+    host = urlsplit(base_url).netloc
+    state = CrawlState(state_path)
+    if reset:
+        state.reset()
+    state.add_urls([base_url], 0)
+    state.commit()
+
+    limiter = HostRateLimiter(rate)
+
+    def visit(url):
+        limiter.wait(url)
+        status, body, _ = fetch(url, {})
+        if status != 200:
+            raise IOError(f"HTTP {status}")
+        return list(extract_links(body, url))
+
+    crawled = flushed = 0
+    in_flight = {}
+    started = time.monotonic()
     try:
-        resp = requests.get(base_url, headers=headers, timeout=10)
-        resp.encoding = "utf-8"
-        if resp.status_code != 200:
-            print("❌ 主頁載入失敗")
-            return {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            while True:
+                room = workers - len(in_flight)
+                if max_pages is not None:
+                    room = min(room, max_pages - crawled - len(in_flight))
+                if room > 0:
+                    for url, depth in state.claim(room, {u for u, _ in in_flight.values()}):
+                        in_flight[pool.submit(visit, url)] = (url, depth)
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = in_flight.pop(future)
+                    try:
+                        found = future.result()
+                    except Exception as e:
+                        log(f"⚠️ {url}：{e}")
+                        state.finish(url, False, max_tries)
+                        continue
 
-        soup = BeautifulSoup(resp.text, "html.parser")
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            text = a.get_text(strip=True)
+                    same_site = [(u, t) for u, t in found if urlsplit(u).netloc == host]
+                    if max_depth is None or depth < max_depth:
+                        state.add_urls([u for u, _ in same_site if u.endswith((".html", "/"))], depth + 1)
+                    state.add_links([(t, u) for u, t in same_site if u.endswith(".html") and is_keyword(t)])
+                    state.finish(url, True, max_tries)
+                    crawled += 1
 
-            # 過濾出像 /dongwu/she.html 這樣的有效連結
-            if href.endswith(".html") and text and not href.startswith("http"):
-                full_url = base_url.rstrip("/") + "/" + href.lstrip("/")
-                if text not in dream_links:
-                    dream_links[text] = full_url
+                state.commit()
+                if output and crawled - flushed >= flush_every:
+                    flushed = crawled
+                    export_links(state.links(), output)
+                    counts = state.counts()
+                    log(f"📄 已爬 {crawled} 頁（{crawled / (time.monotonic() - started):.1f} 頁/秒），"
+                        f"待爬 {counts.get('pending', 0)}，關鍵字 {counts['links']}")
+    finally:
+        state.commit()
+        links = state.links()
+        if output:
+            export_links(links, output)
+        log(f"✅ 本次爬取 {crawled} 頁，累計 {len(links)} 筆關鍵字，進度：{state.counts()}")
+        if output and os.path.exists(DREAM_LINKS_SNAPSHOT):
+            log(f"💡 執行中的服務讀取的是快照，請更新：python dream_snapshot.py build {output} {DREAM_LINKS_SNAPSHOT}")
+        state.close()
+    return links
 
-        return dream_links
 
-    except Exception as e:
-        print(f"⚠️ 發生錯誤：{e}")
-        return {}
+def get_all_dream_links(base_url=DEFAULT_BASE_URL):
+    """只爬首頁上的連結（舊版行為），不寫檔"""
+    return crawl_site(base_url, state_path=":memory:", output=None, max_depth=0, log=lambda *_: None)
+
 
 if __name__ == "__main__":
-    links = get_all_dream_links()
-    with open("dream_links.json", "w", encoding="utf-8") as f:
-        json.dump(links, f, ensure_ascii=False, indent=2)
+    ap = argparse.ArgumentParser(description="建立夢境關鍵字連結表")
+    ap.add_argument("base_url", nargs="?", default=DEFAULT_BASE_URL)
+    ap.add_argument("--output", default="dream_links.json")
+    ap.add_argument("--state", default=CRAWL_STATE_DB, help="爬蟲進度檔（SQLite）")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--rate", type=float, default=2.0, help="每秒最多請求數（每個網站）")
+    ap.add_argument("--max-pages", type=int)
+    ap.add_argument("--max-depth", type=int)
+    ap.add_argument("--flush-every", type=int, default=50)
+    ap.add_argument("--reset", action="store_true", help="清除進度，從頭開始")
+    args = ap.parse_args()
+
+    links = crawl_site(args.base_url, args.state, args.output, workers=args.workers, rate=args.rate,
+                       max_pages=args.max_pages, max_depth=args.max_depth, flush_every=args.flush_every,
+                       reset=args.reset)
     print(f"✅ 共建立 {len(links)} 筆夢境關鍵詞連結")
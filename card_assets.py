@@ -0,0 +1,79 @@
+# card_assets.py
+# 卡牌圖片的靜態資源清單（由 build_card_previews.py 產生）：
+# 每張卡牌有原圖與縮小的預覽圖，檔名含內容雜湊，可用 immutable 長效快取；
+# 啟動時讀一次 manifest，回覆訊息時直接查表取得網址，不必每次碰檔案系統。
+import json
+import os
+import threading
+from pathlib import Path
+
+# ✅ 資源設定
+#   CARD_ASSET_DIR      ：manifest 與預覽圖所在資料夾（原圖仍在 Cards/）
+#   CARD_ASSET_BASE_URL ：對外網址前綴（對應 bot_app 的 /card-assets 路由）
+#   CARD_ASSET_MAX_AGE  ：Cache-Control max-age 秒數（檔名含雜湊，預設一年）
+CARD_ASSET_DIR = os.getenv("CARD_ASSET_DIR", str(Path(__file__).parent / "card_assets"))
+CARD_ASSET_BASE_URL = os.getenv("CARD_ASSET_BASE_URL", "https://dream-oracle.onrender.com/card-assets")
+CARD_ASSET_MAX_AGE = int(os.getenv("CARD_ASSET_MAX_AGE", str(365 * 24 * 3600)))
+CARDS_DIR = Path(__file__).parent / "Cards"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+MIMETYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+
+
+class CardAssets:
+    """
+    manifest 的唯讀查詢：
+    - urls(image)  ：卡牌圖檔名 → (原圖網址, 預覽圖網址)；不在 manifest 時回傳 None
+    - asset(name)  ：對外檔名 → (實際路徑, ETag, MIME)，供靜態路由使用
+    manifest 的 cards 依原始檔名記錄各版本：{"original": {...}, "preview": {...}, "preview_webp": {...}}，
+    每個版本含 file（對外檔名）、path（相對 CARD_ASSET_DIR 的實際路徑）、etag、bytes、width、height。
+    """
+
+    def __init__(self, directory=CARD_ASSET_DIR, base_url=CARD_ASSET_BASE_URL):
+        self.directory = Path(directory)
+        self.base_url = base_url.rstrip("/")
+        self.cards = {}
+        self._files = {}
+        manifest_path = self.directory / MANIFEST_NAME
+        if manifest_path.exists():
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                self.cards = manifest.get("cards", {})
+        for variants in self.cards.values():
+            for variant in variants.values():
+                path = (self.directory / variant["path"]).resolve()
+                mimetype = MIMETYPES.get(path.suffix.lower(), "application/octet-stream")
+                self._files[variant["file"]] = (str(path), variant["etag"], mimetype)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def urls(self, image):
+        variants = self.cards.get(image)
+        if not variants:
+            return None
+        original = f"{self.base_url}/{variants['original']['file']}"
+        preview = variants.get("preview")
+        return original, f"{self.base_url}/{preview['file']}" if preview else original
+
+    def asset(self, name):
+        return self._files.get(name)
+
+    def stats(self):
+        return {"directory": str(self.directory), "cards": len(self.cards), "files": len(self._files)}
+
+
+_assets = None
+_assets_lock = threading.Lock()
+
+
+def get_card_assets():
+    """共用的資源清單（沒有 manifest 時為空，回覆訊息改用 Cards/ 原圖網址）"""
+    global _assets
+    if _assets is None:
+        with _assets_lock:
+            if _assets is None:
+                _assets = CardAssets()
+    return _assets
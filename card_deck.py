@@ -0,0 +1,89 @@
+# card_deck.py
+import csv
+import random
+from collections import namedtuple
+from pathlib import Path
+
+from emotion_lexicon import canonical_emotion
+
+# ✅ 卡牌資料檔（與本模組同一資料夾）
+CARDS_CSV_PATH = Path(__file__).parent / "emotion_cards_full.csv"
+
+
+class Card(namedtuple("Card", ["id", "emotion", "title", "message", "image"])):
+    """單張卡牌（tuple 結構，不可變）"""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        return {"title": self.title, "message": self.message, "image": self.image}
+
+
+class CardDeck:
+    """
+    不可變的卡牌牌組：啟動時載入一次，
+    以 dict 建立「情緒 → 卡牌編號」索引，抽卡為 O(1)。
+    情緒別名（例如「愛」→「被愛」）交給 resolve 轉換，預設使用情緒詞庫的 synonyms。
+    """
+
+    __slots__ = ("cards", "emotions", "_index", "_resolve")
+
+    def __init__(self, cards, resolve=None):
+        self.cards = tuple(cards)
+
+        index = {}
+        for card in self.cards:
+            index.setdefault(card.emotion, []).append(card.id)
+        self.emotions = tuple(index)
+        self._index = {emotion: tuple(ids) for emotion, ids in index.items()}
+        self._resolve = resolve
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __contains__(self, emotion):
+        return bool(self.card_ids(emotion))
+
+    def card_ids(self, emotion):
+        ids = self._index.get(emotion)
+        if ids is None and self._resolve is not None:
+            ids = self._index.get(self._resolve(emotion))
+        return ids or ()
+
+    def draw(self, emotion, rng=random):
+        """依情緒（或同義詞）隨機抽一張，沒有對應情緒時回傳 None"""
+        ids = self.card_ids(emotion)
+        if not ids:
+            return None
+        return self.cards[rng.choice(ids)]
+
+    def random_card(self, rng=random):
+        if not self.cards:
+            return None
+        return rng.choice(self.cards)
+
+
+def load_deck(path=CARDS_CSV_PATH, resolve=canonical_emotion):
+    """從 CSV 載入卡牌；讀取失敗時回傳空牌組"""
+    cards = []
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                emotion = (row.get("emotion") or "").strip()
+                if not emotion:
+                    continue
+                cards.append(Card(
+                    len(cards),
+                    emotion,
+                    row.get("title") or "",
+                    row.get("message") or "",
+                    (row.get("image") or "").strip()
+                ))
+    except Exception as e:
+        print(f"❌ 無法讀取卡牌資料: {str(e)}")
+
+    return CardDeck(cards, resolve)
+
+
+# ✅ 共用牌組：整個行程只載入一次
+DECK = load_deck()
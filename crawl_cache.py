@@ -0,0 +1,259 @@
+# crawl_cache.py
+# 夢境解析頁面的本機快取：每個網址只存解析後的 #entrybody 文字（不存整頁 HTML），
+# 過期後以 ETag / Last-Modified 條件請求重新驗證，沒有變更時不必重新下載與解析。
+#
+#   python crawl_cache.py prefetch [--workers 8] [--force]   依 dream_links.json 預先抓取全部頁面
+#   python crawl_cache.py stats                              查看快取筆數
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from lazy_import import LazyModule
+
+# ✅ 爬蟲快取設定
+#   CRAWL_CACHE_DB  ：快取 SQLite 檔案路徑
+#   CRAWL_CACHE_TTL ：快取新鮮期（秒），過期後以條件請求重新驗證，預設 7 天
+#   CRAWL_OFFLINE=1 ：離線模式，只讀快取、不連網
+#   CRAWL_PREFETCH_WORKERS：預先抓取時的同時連線數
+CRAWL_CACHE_DB = os.getenv("CRAWL_CACHE_DB", "crawl_cache.db")
+CRAWL_CACHE_TTL = float(os.getenv("CRAWL_CACHE_TTL", str(7 * 86400)))
+CRAWL_OFFLINE = os.getenv("CRAWL_OFFLINE", "0") == "1"
+CRAWL_PREFETCH_WORKERS = int(os.getenv("CRAWL_PREFETCH_WORKERS", "8"))
+CRAWL_HEADERS = {"User-Agent": "Mozilla/5.0"}
+CRAWL_TIMEOUT = 10
+
+OFFLINE_MISS = "⚠️ 離線模式：快取中沒有此夢境頁面"
+
+requests = LazyModule("requests")
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def fetch_url(url, headers):
+    """預設的下載方式：共用 requests.Session（保留連線），回傳 (狀態碼, 內文, 回應標頭)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = requests().Session()
+                _session.headers.update(CRAWL_HEADERS)
+    resp = _session.get(url, headers=headers, timeout=CRAWL_TIMEOUT)
+    resp.encoding = "utf-8"
+    return resp.status_code, resp.text, resp.headers
+
+
+class CrawlEntry:
+    __slots__ = ("url", "text", "etag", "last_modified", "fetched_at")
+
+    def __init__(self, url, text, etag, last_modified, fetched_at):
+        self.url = url
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class CrawlCache:
+    """
+    網址 → 解析後文字 的 SQLite 快取：
+    - 新鮮期內直接回傳快取，不連網
+    - 過期後送出條件請求：304 只更新時間，200 才重新解析
+    - 重新驗證失敗（連線錯誤、5xx）時沿用舊內容
+    - offline=True 時只讀快取
+    extract(html) 負責把頁面轉成文字，回傳以 ⚠️ 開頭代表解析失敗（不寫入快取）。
+    """
+
+    def __init__(self, extract, db_path=CRAWL_CACHE_DB, ttl=CRAWL_CACHE_TTL, offline=CRAWL_OFFLINE,
+                 fetch=fetch_url):
+        self.extract = extract
+        self.ttl = float(ttl)
+        self.offline = offline
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "fetched": 0, "revalidated": 0, "refreshed": 0,
+                         "stale_served": 0, "offline_misses": 0, "errors": 0}
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_cache (
+                url TEXT PRIMARY KEY,
+                text TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL
+            )
+        """)
+        self._db.commit()
+
+    def _incr(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def entry(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, text, etag, last_modified, fetched_at FROM crawl_cache WHERE url = ?", (url,)
+            ).fetchone()
+        return CrawlEntry(*row) if row else None
+
+    def is_fresh(self, entry, now=None):
+        return entry is not None and (now or time.time()) - entry.fetched_at < self.ttl
+
+    def store(self, url, text, etag=None, last_modified=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO crawl_cache (url, text, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, text, etag, last_modified, time.time())
+            )
+            self._db.commit()
+
+    def touch(self, url):
+        with self._lock:
+            self._db.execute("UPDATE crawl_cache SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+
+    def lookup(self, url, force=False):
+        """
+        只查快取，回傳 (快取項目, 可直接回傳的文字)；
+        文字為 None 代表需要連網（新抓或條件請求重新驗證）。
+        """
+        entry = self.entry(url)
+        if entry is not None and (self.offline or (not force and self.is_fresh(entry))):
+            self._incr("hits")
+            return entry, entry.text
+        if self.offline:
+            self._incr("offline_misses")
+            return entry, OFFLINE_MISS
+        return entry, None
+
+    def get(self, url, force=False):
+        """回傳網址對應的夢境文字（或 ⚠️ 開頭的錯誤訊息）"""
+        entry, text = self.lookup(url, force)
+        if text is not None:
+            return text
+
+        try:
+            status, body, headers = self.fetch(url, entry.conditional_headers() if entry else {})
+        except Exception as e:
+            return self.fallback(entry, f"⚠️ 發生錯誤：{e}")
+        return self.handle_response(url, entry, status, body, headers)
+
+    def handle_response(self, url, entry, status, body, headers):
+        """處理（條件）請求的結果；同步與 asyncio 版本共用"""
+        if status == 304 and entry is not None:
+            self.touch(url)
+            self._incr("revalidated")
+            return entry.text
+        if status != 200:
+            return self.fallback(entry, "⚠️ 無法載入夢境解析頁面")
+
+        text = self.extract(body)
+        if text.startswith("⚠️"):
+            return self.fallback(entry, text)
+
+        self.store(url, text, headers.get("ETag"), headers.get("Last-Modified"))
+        self._incr("refreshed" if entry is not None else "fetched")
+        return text
+
+    def fallback(self, entry, error):
+        """下載或解析失敗：有舊內容就沿用，否則回傳錯誤訊息"""
+        if entry is not None:
+            self._incr("stale_served")
+            return entry.text
+        self._incr("errors")
+        return error
+
+    def prefetch(self, urls, workers=CRAWL_PREFETCH_WORKERS, force=False, progress=None):
+        """
+        以最多 workers 條連線同時抓取，填滿快取；新鮮的項目會略過（force=True 時全部重新驗證）。
+        回傳 {"ok": 成功數, "failed": {網址: 錯誤訊息}}
+        """
+        urls = list(dict.fromkeys(urls))
+        failed = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(self.get, url, force): url for url in urls}
+            for done, future in enumerate(as_completed(futures), 1):
+                url = futures[future]
+                try:
+                    text = future.result()
+                except Exception as e:
+                    text = f"⚠️ 發生錯誤：{e}"
+                if text.startswith("⚠️"):
+                    failed[url] = text
+                if progress:
+                    progress(done, len(urls), url, text)
+        return {"ok": len(urls) - len(failed), "failed": failed}
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM crawl_cache").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {"entries": len(self), "ttl": self.ttl, "offline": self.offline, **counters}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_crawl_cache():
+    """取得行程共用的爬蟲快取（以 dream_parser.extract_dream_text 解析頁面）"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from dream_parser import extract_dream_text
+                _cache = CrawlCache(extract=extract_dream_text)
+    return _cache
+
+
+def main():
+    ap = argparse.ArgumentParser(description="夢境解析頁面快取")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("prefetch", help="依 dream_links.json 預先抓取全部頁面")
+    p.add_argument("--links", default="dream_links.json")
+    p.add_argument("--workers", type=int, default=CRAWL_PREFETCH_WORKERS)
+    p.add_argument("--force", action="store_true", help="忽略新鮮期，全部重新驗證")
+    sub.add_parser("stats", help="查看快取狀態")
+    args = ap.parse_args()
+
+    cache = get_crawl_cache()
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), ensure_ascii=False, indent=2))
+        return
+
+    with open(args.links, "r", encoding="utf-8") as f:
+        urls = list(json.load(f).values())
+
+    def progress(done, total, url, text):
+        mark = "⚠️" if text.startswith("⚠️") else "✅"
+        print(f"[{done}/{total}] {mark} {url}")
+
+    started = time.perf_counter()
+    result = cache.prefetch(urls, workers=args.workers, force=args.force, progress=progress)
+    print(f"\n✅ 完成 {result['ok']} 筆，失敗 {len(result['failed'])} 筆，耗時 {time.perf_counter() - started:.1f} 秒")
+    print(json.dumps(cache.stats(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
 # database.py
-import psycopg2
+import atexit
 import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, timezone
 
@@ -8,56 +14,502 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# ✅ 連線池設定
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_HEALTH_CHECK_INTERVAL", "30"))
+
+# ✅ 批次寫入（write-behind）設定：DB_WRITE_BUFFER=1 啟用
+DB_WRITE_BUFFER = os.getenv("DB_WRITE_BUFFER", "0") == "1"
+DB_FLUSH_SIZE = int(os.getenv("DB_FLUSH_SIZE", "50"))
+DB_FLUSH_INTERVAL = float(os.getenv("DB_FLUSH_INTERVAL", "2"))
+
+INSERT_LOG_SQL = """
+    INSERT INTO dream_logs (user_id, keyword, emotion, timestamp)
+    VALUES (%s, %s, %s, %s)
+"""
+
+
+class PoolTimeout(Exception):
+    """等待可用連線逾時"""
+
+
+# === ✅ 本機替身：以 SQLite 模擬 psycopg2 連線（DATABASE_URL=sqlite:///路徑） ===
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+
+_SQL_REWRITES = (
+    (re.compile(r"\bSERIAL PRIMARY KEY\b", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"%s"), "?"),
+    # SQLite 的 NULL 視為最小值，倒序時本來就排在最後；索引定義不接受 NULLS LAST
+    (re.compile(r"\s+NULLS LAST\b", re.I), ""),
+)
+
+
+def _to_sqlite(sql):
+    for pattern, repl in _SQL_REWRITES:
+        sql = pattern.sub(repl, sql)
+    return sql
+
+
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        return self._cursor.execute(_to_sqlite(sql), params)
+
+    def executemany(self, sql, seq):
+        return self._cursor.executemany(_to_sqlite(sql), seq)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SQLiteConnection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self.closed = 0
+
+    def cursor(self, name=None):
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+        self.closed = 1
+
+
+def _connect(url=None):
+    url = url or DATABASE_URL
+    if url and url.startswith("sqlite:///"):
+        return SQLiteConnection(url[len("sqlite:///"):])
+
+    import psycopg2
+    return psycopg2.connect(url)
+
+
+# === ✅ 執行緒安全連線池 ===
+class ConnectionPool:
+    """
+    執行緒安全的連線池：
+    - 維持 minconn～maxconn 條連線，借不到時最多等待 timeout 秒
+    - 閒置超過 health_check_interval 的連線借出前先 SELECT 1 檢查
+    - 發生錯誤且連線已失效時丟棄，下次借用自動重連
+    - 歸還時一律 rollback，連線不會帶著未結束的交易（idle in transaction）回到池中
+    """
+
+    def __init__(self, connect=_connect, minconn=1, maxconn=5, timeout=5.0, health_check_interval=30.0):
+        self._connect = connect
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn)
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = []  # (conn, last_used)
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        for _ in range(self.minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    @staticmethod
+    def _is_alive(conn):
+        if getattr(conn, "closed", 0):
+            return False
+        try:
+            conn.rollback()
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("連線池已關閉")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"等待資料庫連線逾時（{self.timeout} 秒）")
+                self._cond.wait(remaining)
+
+        try:
+            if conn is not None and time.monotonic() - last_used > self.health_check_interval:
+                if not self._is_alive(conn):
+                    print("[DB] 偵測到失效連線，重新連線")
+                    self._close(conn)
+                    conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard=False):
+        if not discard and not getattr(conn, "closed", 0):
+            try:
+                conn.rollback()  # 結束未完成的交易（例如中途關閉的串流游標）
+            except Exception:
+                discard = True
+        with self._cond:
+            if discard or self._closed or getattr(conn, "closed", 0):
+                self._close(conn)
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception:
+            discard = not self._is_alive(conn)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "maxconn": self.maxconn}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    minconn=DB_POOL_MIN,
+                    maxconn=DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    health_check_interval=DB_HEALTH_CHECK_INTERVAL,
+                )
+                atexit.register(_pool.closeall)
+    _migrate_on_first_use()
+    return _pool
+
+
+def _migrate_on_first_use():
+    """
+    第一次使用連線池時建立資料表（flask run、python bot_app.py、gunicorn 皆適用）。
+    每個行程只嘗試一次；失敗時只記錄，不讓之後的讀寫因遷移步驟而失敗
+    （需要重試時執行 python migrate.py）
+    """
+    from migrate import DB_MIGRATE_ON_STARTUP, _state, run_migrations
+    if not DB_MIGRATE_ON_STARTUP or _state["attempted"]:
+        return
+    try:
+        run_migrations()
+    except Exception as e:
+        print(f"[DB] 資料庫遷移失敗，略過（請執行 python migrate.py）：{e}")
+
+
+def _run(work, retries=1):
+    """借一條連線執行 work(conn)；若連線中斷則以新連線重試"""
+    pool = get_pool()
+    for attempt in range(retries + 1):
+        try:
+            with pool.connection() as conn:
+                return work(conn)
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            if attempt >= retries or not _is_connection_error(e):
+                raise
+            print(f"[DB] 連線錯誤，重新連線後重試：{e}")
+
+
+def _is_connection_error(e):
+    try:
+        import psycopg2
+        if isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+            return True
+    except ImportError:
+        pass
+    return isinstance(e, sqlite3.OperationalError) and "closed" in str(e)
+
+
+# === ✅ 批次寫入緩衝區 ===
+class WriteBuffer:
+    """
+    背景執行緒收集待寫入的資料列，
+    累積到 max_size 筆或距離上次寫入超過 interval 秒時批次寫入；
+    行程結束前會把剩下的資料全部寫完。
+    """
+
+    def __init__(self, flush_fn, max_size=50, interval=2.0, name="db-writer"):
+        self._flush_fn = flush_fn
+        self.max_size = max(1, max_size)
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, row):
+        self._queue.put(row)
+
+    def _drain(self, batch, block_until):
+        while len(batch) < self.max_size:
+            timeout = block_until - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            self._flush_fn(batch)
+        except Exception as e:
+            print(f"[DB] 批次寫入失敗（{len(batch)} 筆）：{e}")
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            self._write(self._drain([], time.monotonic() + self.interval))
+        while not self._queue.empty():
+            self._write(self._drain([], 0))
+
+    def close(self, timeout=10.0):
+        self._stopped.set()
+        self._thread.join(timeout)
+
+
+_write_buffer = None
+
+
+def get_write_buffer():
+    global _write_buffer
+    if _write_buffer is None:
+        get_pool()  # 先建立連線池，確保結束時緩衝區先寫完才關閉連線
+        with _pool_lock:
+            if _write_buffer is None:
+                _write_buffer = WriteBuffer(write_many, max_size=DB_FLUSH_SIZE, interval=DB_FLUSH_INTERVAL)
+    return _write_buffer
+
+
+# === ✅ 資料表操作 ===
 def init_db():
-    conn = psycopg2.connect(DATABASE_URL)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS dream_logs (
-            id SERIAL PRIMARY KEY,
-            user_id TEXT,
-            keyword TEXT,
-            emotion TEXT,
-            timestamp TIMESTAMP
+    def work(conn):
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS dream_logs (
+                id SERIAL PRIMARY KEY,
+                user_id TEXT,
+                keyword TEXT,
+                emotion TEXT,
+                timestamp TIMESTAMP
+            )
+        ''')
+        # /logs 依 (timestamp, id) 倒序做 keyset 分頁，沒有時間的記錄排在最後
+        cursor.execute("DROP INDEX IF EXISTS idx_dream_logs_ts_id")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_dream_logs_ts_id_nulls_last "
+            "ON dream_logs (timestamp DESC NULLS LAST, id DESC)"
         )
-    ''')
-    conn.commit()
-    conn.close()
+        conn.commit()
+    _run(work)
 
-def write_to_postgres(user_id, keyword, emotion):
-    conn = psycopg2.connect(DATABASE_URL)
-    cursor = conn.cursor()
+def write_many(rows):
+    """
+    批次寫入多筆 (user_id, keyword, emotion, timestamp)；
+    Postgres 使用 execute_values 一次送出。
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    def work(conn):
+        cursor = conn.cursor()
+        if isinstance(conn, SQLiteConnection):
+            cursor.executemany(INSERT_LOG_SQL, rows)
+        else:
+            from psycopg2.extras import execute_values
+            execute_values(
+                cursor,
+                "INSERT INTO dream_logs (user_id, keyword, emotion, timestamp) VALUES %s",
+                rows
+            )
+        conn.commit()
+    _run(work)
 
+def write_to_postgres(user_id, keyword, emotion):
     # 台灣時間
     taiwan_time = datetime.now(timezone(timedelta(hours=8)))
+    row = (user_id, keyword, emotion, taiwan_time)
 
-    cursor.execute("""
-        INSERT INTO dream_logs (user_id, keyword, emotion, timestamp) 
-        VALUES (%s, %s, %s, %s)
-    """, (user_id, keyword, emotion, taiwan_time))
-
-    conn.commit()
-    conn.close()
+    if DB_WRITE_BUFFER:
+        get_write_buffer().add(row)
+    else:
+        write_many([row])
 
 def get_all_logs():
-    conn = psycopg2.connect(DATABASE_URL)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT user_id, keyword, emotion, timestamp
-        FROM dream_logs 
-        ORDER BY timestamp DESC
-    """)
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    def work(conn):
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT user_id, keyword, emotion, timestamp
+            FROM dream_logs
+            ORDER BY timestamp DESC NULLS LAST
+        """)
+        return cursor.fetchall()
+    return _run(work)
+
+def keyword_counts(since=None, limit=None):
+    """各關鍵字的查詢次數（由多到少），回傳 [(keyword, count)]"""
+    def work(conn):
+        sql = "SELECT keyword, COUNT(*) AS n FROM dream_logs WHERE keyword IS NOT NULL"
+        params = []
+        if since is not None:
+            sql += " AND timestamp >= %s"
+            params.append(since)
+        sql += " GROUP BY keyword ORDER BY n DESC"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    return _run(work)
+
+def _build_logs_query(after=None, user_id=None, emotion=None, since=None, until=None, limit=None):
+    """
+    組出 dream_logs 查詢：依 (timestamp, id) 倒序，timestamp 為 NULL 的記錄排在最後；
+    after=(timestamp, id) 為上一頁最後一筆（keyset 分頁），timestamp 可為 None。
+    """
+    conditions, params = [], []
+    if user_id:
+        conditions.append("user_id = %s")
+        params.append(user_id)
+    if emotion:
+        conditions.append("emotion = %s")
+        params.append(emotion)
+    if since:
+        conditions.append("timestamp >= %s")
+        params.append(since)
+    if until:
+        conditions.append("timestamp < %s")
+        params.append(until)
+    if after:
+        after_ts, after_id = after
+        if after_ts is None:
+            # 已經翻到沒有時間的記錄：只剩 id 更小的 NULL
+            conditions.append("(timestamp IS NULL AND id < %s)")
+            params.append(after_id)
+        else:
+            # 比較式遇到 NULL 不成立，排在後面的 NULL 要另外列入
+            conditions.append("((timestamp, id) < (%s, %s) OR timestamp IS NULL)")
+            params.extend((after_ts, after_id))
+
+    sql = "SELECT id, user_id, keyword, emotion, timestamp FROM dream_logs"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY timestamp DESC NULLS LAST, id DESC"
+    if limit:
+        sql += " LIMIT %s"
+        params.append(int(limit))
+    return sql, params
+
+def get_logs_page(limit=50, after=None, user_id=None, emotion=None, since=None, until=None):
+    """
+    取一頁記錄，回傳 (rows, next_after)；next_after 為 None 代表已是最後一頁。
+    rows 欄位：id, user_id, keyword, emotion, timestamp
+    """
+    sql, params = _build_logs_query(after, user_id, emotion, since, until, limit + 1)
+
+    def work(conn):
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    rows = _run(work)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (rows[-1][4], rows[-1][0])
+    return rows, None
+
+def iter_logs(limit=None, after=None, user_id=None, emotion=None, since=None, until=None, batch_size=500):
+    """
+    以伺服器端游標逐批讀取記錄（產生器），不會一次把整張表載入記憶體。
+    """
+    sql, params = _build_logs_query(after, user_id, emotion, since, until, limit)
+    with get_pool().connection() as conn:
+        cursor = conn.cursor(name="dream_logs_stream")
+        cursor.itersize = batch_size
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+        cursor.close()
 
 def upgrade_db_add_user_id():
-    conn = psycopg2.connect(DATABASE_URL)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("ALTER TABLE dream_logs ADD COLUMN user_id TEXT;")
+    def work(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("ALTER TABLE dream_logs ADD COLUMN user_id TEXT;")
+            conn.commit()
+            print("✅ 已成功新增 user_id 欄位")
+        except Exception as e:
+            if "duplicate" not in type(e).__name__.lower() + str(e).lower():
+                raise
+            conn.rollback()
+            print("⚠️ user_id 欄位已存在，略過")
+        # 依使用者查詢 /logs 時使用
+        cursor.execute("DROP INDEX IF EXISTS idx_dream_logs_user_ts")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_dream_logs_user_ts_nulls_last "
+            "ON dream_logs (user_id, timestamp DESC NULLS LAST, id DESC)"
+        )
         conn.commit()
-        print("✅ 已成功新增 user_id 欄位")
-    except psycopg2.errors.DuplicateColumn:
-        print("⚠️ user_id 欄位已存在，略過")
-    finally:
-        conn.close()
\ No newline at end of file
+    _run(work)
@@ -1,22 +1,29 @@
 # dream_core.py
 
+import asyncio
 import random
+import re
 import os
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
-import pandas as pd
-import google.generativeai as genai
 
-from dream_parser import get_dream_interpretation
+from dream_parser import find_dream_link, crawl_dream_from_url, crawl_dream_from_url_async
 from emotion_mapper import map_emotion
-from utils import save_result
+from result_sinks import publish_result
+from interpretation_cache import create_default_cache, normalize_keyword
+from card_deck import DECK
+from emotion_lexicon import canonical_emotion
+from llm_client import get_llm_client, LLM_TIMEOUT
+from metrics import stage
+from precompute import get_precomputed_store
+from semantic_cache import create_default_semantic_cache
+from single_flight import SingleFlight, AsyncSingleFlight, SingleFlightTimeout
 
 # ✅ 載入 .env 環境變數
 load_dotenv()
 
-# ✅ 設定 Gemini API 金鑰
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# ✅ Gemini 呼叫統一交給 llm_client（共用模型、期限、重試、併發上限）
 
 # ✅ 備用卡牌圖片清單（請放在 /Cards 資料夾中）
 ALL_CARD_IMAGES = [
@@ -28,30 +35,45 @@ ALL_CARD_IMAGES = [
     "P1.jpg", "P2.jpg", "P3.jpg"
 ]
 
-# ✅ 載入完整卡牌資料（含情緒、標題、訊息、圖片）
-CARDS_DF = pd.read_csv(Path(__file__).parent / "emotion_cards_full.csv")
+# ✅ 解夢結果快取（依正規化後的關鍵字，記憶體 LRU + TTL，可選 SQLite 磁碟層）
+interpretation_cache = create_default_cache()
+
+# ✅ 近似句快取（「被蛇咬」≈「蛇咬我」）：精確快取未命中時使用，預設停用（SEMANTIC_CACHE_SIZE），見 semantic_cache.py
+semantic_cache = create_default_semantic_cache()
+
+# ✅ 請求合併：同一關鍵字同時只送一個 Gemini 請求，其餘等待共用結果
+#   SINGLE_FLIGHT_MAX_WAIT：跟隨者最長等待秒數（預設為 Gemini 期限再多 5 秒）
+SINGLE_FLIGHT_MAX_WAIT = float(os.getenv("SINGLE_FLIGHT_MAX_WAIT", str(LLM_TIMEOUT + 5)))
+interpretation_flight = SingleFlight(max_wait=SINGLE_FLIGHT_MAX_WAIT)
+async_interpretation_flight = AsyncSingleFlight(max_wait=SINGLE_FLIGHT_MAX_WAIT)
+
+# ✅ DREAM_LINKS_FIRST=1：關鍵字（或句中關鍵字、近似字）在 dream_links 中有解析頁時直接取用，不呼叫 Gemini
+#   預設關閉：開啟後回覆的是爬取 golla.tw 解析頁的原文（不是 80 字內、語氣溫柔的 Gemini 解析），
+#   快取未命中時還會在請求中連外抓取；開啟前先以 `python keyword_index.py report` 檢查命中內容
+DREAM_LINKS_FIRST = os.getenv("DREAM_LINKS_FIRST", "0") == "1"
+
+MISSING_INTERPRETATION = "⚠️ 尚未支援此夢境，請稍後再試或由開發者補充資料"
+INTERPRETATION_PROMPT = "請根據以下夢境關鍵字提供一段簡短的夢境解析：'{keyword}'，語氣溫柔，有療癒感，限 80 字內"
 
 def get_emotion_card(emotion: str):
     """
-    從 emotion_cards_full.csv 中依情緒抽卡，
+    從共用牌組（emotion_cards_full.csv）中依情緒抽卡，
     並確保 title、message、image 對應同一筆資料。
     """
-    emotion_clean = emotion.strip()
-    if emotion_clean in CARDS_DF["emotion"].unique():
-        matched = CARDS_DF[CARDS_DF["emotion"] == emotion_clean]
-        result = matched.sample(1).iloc[0].to_dict()  # ✅ 隨機抽一整筆，保持對應一致
+    card = DECK.draw(emotion.strip())  # ✅ 隨機抽一整筆，保持對應一致
+    if card is not None:
         return {
-            "title": result["title"],
-            "message": result["message"],
-            "image": result.get("image", random.choice(ALL_CARD_IMAGES))
+            "title": card.title,
+            "message": card.message,
+            "image": card.image or random.choice(ALL_CARD_IMAGES)
         }
     else:
         # ⚠️ 無對應情緒時，才從全部中隨機抽一筆（可保持原邏輯）
-        result = CARDS_DF.sample(1).iloc[0].to_dict()
+        card = DECK.random_card()
         return {
             "title": "無法對應情緒",
-            "message": "✨ 目前僅支援特定情緒，這是隨機卡牌：\n\n☞ {}\n✨ {}".format(result["title"], result["message"]),
-            "image": result.get("image", random.choice(ALL_CARD_IMAGES))
+            "message": "✨ 目前僅支援特定情緒，這是隨機卡牌：\n\n☞ {}\n✨ {}".format(card.title, card.message),
+            "image": card.image or random.choice(ALL_CARD_IMAGES)
         }
 
 def log_missing_keyword(keyword, user_id=None):
@@ -75,8 +97,9 @@ def notify_developer(keyword, user_id=None):
 
         from linebot.v3.messaging.rest import Configuration
         from linebot.v3.messaging import MessagingApi, ApiClient, TextMessage
+        from line_replies import LINE_API_HOST
 
-        configuration = Configuration(access_token=access_token)
+        configuration = Configuration(access_token=access_token, host=LINE_API_HOST)
         with ApiClient(configuration) as api_client:
             line_bot_api = MessagingApi(api_client)
             message = f"🛑 使用者 {user_id or 'unknown'} 查詢「{keyword}」，但查無解夢資料"
@@ -90,32 +113,123 @@ def notify_developer(keyword, user_id=None):
         print(f"[SKIPPED] 推播功能錯誤已略過：{e}")
 
 def get_dream_interpretation(keyword):
+    """
+    先查解夢快取，再查 dream_links 解析頁，都沒有才呼叫 Gemini（同一關鍵字的同時請求合併成一次）；
+    失敗的備用訊息不寫入快取。
+    """
+    cached = get_cached_interpretation(keyword)
+    if cached is not None:
+        return cached
+    return fetch_dream_interpretation(keyword)
+
+def fetch_dream_interpretation(keyword):
+    """略過快取，直接查 dream_links 或呼叫 Gemini（結果寫回快取）"""
+    def fetch():
+        dream_text = interpret_from_dream_links(keyword) or generate_dream_interpretation(keyword)
+        cache_interpretation(keyword, dream_text)
+        return dream_text
+
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        prompt = f"請根據以下夢境關鍵字提供一段簡短的夢境解析：'{keyword}'，語氣溫柔，有療癒感，限 80 字內"
-        response = model.generate_content(prompt)
+        dream_text, _ = interpretation_flight.do(normalize_keyword(keyword), fetch)
+    except SingleFlightTimeout as e:
+        print(f"[ERROR] {e}")
+        return MISSING_INTERPRETATION
+    return dream_text
 
-        # ✅ 加入判斷是否為空
-        if response.text and response.text.strip():
-            return response.text.strip()
-        else:
-            raise ValueError("Gemini 回傳空白內容")
+def get_cached_interpretation(keyword):
+    """先查精確快取，再查近似句快取"""
+    if interpretation_cache is not None:
+        cached = interpretation_cache.get(keyword)
+        if cached is not None:
+            return cached
+    if semantic_cache is not None:
+        return semantic_cache.get(keyword)
+    return None
+
+def cache_interpretation(keyword, dream_text):
+    """失敗的備用訊息不寫入快取"""
+    if dream_text.startswith("⚠️"):
+        return
+    if interpretation_cache is not None:
+        interpretation_cache.set(keyword, dream_text)
+    if semantic_cache is not None:
+        semantic_cache.set(keyword, dream_text)
+
+def interpret_from_dream_links(keyword):
+    """dream_links 有對應解析頁時取回內容（經 crawl_cache），否則回傳 None 交給 Gemini"""
+    url = find_dream_link(keyword) if DREAM_LINKS_FIRST else None
+    if url is None:
+        return None
+    dream_text = crawl_dream_from_url(url)
+    return None if dream_text.startswith("⚠️") else dream_text
+
+def generate_dream_interpretation(keyword):
+    try:
+        # ✅ 空白內容、逾時、重試用盡都會丟出 LLMError
+        return get_llm_client().generate(INTERPRETATION_PROMPT.format(keyword=keyword))
 
     except Exception as e:
         print(f"[ERROR] Gemini API 錯誤：{e}")
-        return "⚠️ 尚未支援此夢境，請稍後再試或由開發者補充資料"
+        return MISSING_INTERPRETATION
 
-def process_dream(keyword, user_id=None):
-    dream_text = get_dream_interpretation(keyword)
+def process_dream(keyword, user_id=None, persist=True):
+    """
+    解夢 + 情緒判定 + 抽卡。
+    persist=True 時把結果交給背景輸出管線（CSV / SQLite / Postgres / JSONL）；
+    呼叫端若想先回覆再寫入，可傳 persist=False 並自行呼叫 publish_result。
+    熱門關鍵字優先使用預先生成的結果（precompute.py），輪流回傳不同版本。
+    """
+    precomputed = pick_precomputed(keyword)
+    if precomputed is not None:
+        dream_text, emotion = precomputed
+        return build_dream_result(keyword, dream_text, user_id, persist, emotion)
+
+    with stage("interpretation"):
+        dream_text = get_dream_interpretation(keyword)
+    return build_dream_result(keyword, dream_text, user_id, persist)
+
+def process_dream_local(keyword, user_id=None, persist=True):
+    """
+    只用本機資料（預先生成結果、精確 / 近似快取）完成 process_dream；
+    需要爬蟲或 Gemini 時回傳 None，呼叫端再改走 process_dream_remote。
+    """
+    precomputed = pick_precomputed(keyword)
+    if precomputed is not None:
+        dream_text, emotion = precomputed
+        return build_dream_result(keyword, dream_text, user_id, persist, emotion)
+
+    cached = get_cached_interpretation(keyword)
+    if cached is None:
+        return None
+    return build_dream_result(keyword, cached, user_id, persist)
+
+def process_dream_remote(keyword, user_id=None, persist=True):
+    """process_dream 的慢速路徑（process_dream_local 未命中後使用，不再重複查快取）"""
+    with stage("interpretation"):
+        dream_text = fetch_dream_interpretation(keyword)
+    return build_dream_result(keyword, dream_text, user_id, persist)
 
+def pick_precomputed(keyword):
+    """回傳預先生成的 (解夢文字, 情緒)；沒有快照或未收錄時回傳 None"""
+    store = get_precomputed_store()
+    return store.pick(keyword) if store is not None else None
+
+def build_dream_result(keyword, dream_text, user_id=None, persist=True, emotion=None):
+    """
+    由解夢文字完成情緒判定（未指定 emotion 時使用 map_emotion）與抽卡，組出回傳格式。
+    """
     if dream_text.startswith("⚠️"):
         log_missing_keyword(keyword, user_id)
         notify_developer(keyword, user_id)
         emotion = "未知"
-        card = get_emotion_card(emotion)
+        with stage("card_draw"):
+            card = get_emotion_card(emotion)
     else:
-        emotion = map_emotion(dream_text)
-        card = get_emotion_card(emotion)
+        if not emotion:
+            with stage("map_emotion"):
+                emotion = map_emotion(dream_text)
+        with stage("card_draw"):
+            card = get_emotion_card(emotion)
 
         if not all(k in card for k in ["title", "message", "image"]):
             card = {
@@ -124,8 +238,8 @@ def process_dream(keyword, user_id=None):
                 "image": random.choice(ALL_CARD_IMAGES)
             }
 
-    save_result(keyword, dream_text, emotion, card)
-    save_to_sqlite(keyword, emotion, card, dream_text, user_id)  # <-- 加這行
+    if persist:
+        publish_result(keyword, dream_text, emotion, card, user_id)
 
     text = f"""
 🔍 解夢關鍵字：{keyword}
@@ -145,6 +259,158 @@ def process_dream(keyword, user_id=None):
         "dream_text": dream_text
     }
 
+# === ✅ asyncio 版本（供 async_app.py 使用）：等待 Gemini 時不佔用執行緒 ===
+async def get_dream_interpretation_async(keyword):
+    """get_dream_interpretation 的 asyncio 版本（快取讀寫為本機操作，直接在事件迴圈執行）"""
+    cached = get_cached_interpretation(keyword)
+    if cached is not None:
+        return cached
+
+    async def fetch():
+        dream_text = await interpret_from_dream_links_async(keyword) or await generate_dream_interpretation_async(keyword)
+        cache_interpretation(keyword, dream_text)
+        return dream_text
+
+    try:
+        dream_text, _ = await async_interpretation_flight.do(normalize_keyword(keyword), fetch)
+    except SingleFlightTimeout as e:
+        print(f"[ERROR] {e}")
+        return MISSING_INTERPRETATION
+    return dream_text
+
+async def interpret_from_dream_links_async(keyword):
+    url = find_dream_link(keyword) if DREAM_LINKS_FIRST else None
+    if url is None:
+        return None
+    dream_text = await crawl_dream_from_url_async(url)
+    return None if dream_text.startswith("⚠️") else dream_text
+
+async def generate_dream_interpretation_async(keyword):
+    try:
+        return await get_llm_client().agenerate(INTERPRETATION_PROMPT.format(keyword=keyword))
+    except Exception as e:
+        print(f"[ERROR] Gemini API 錯誤：{e}")
+        return MISSING_INTERPRETATION
+
+async def process_dream_async(keyword, user_id=None, persist=True):
+    """
+    process_dream 的 asyncio 版本；情緒判定、抽卡與缺字通知（可能寫檔、推播）交給執行緒。
+    """
+    precomputed = pick_precomputed(keyword)
+    if precomputed is not None:
+        dream_text, emotion = precomputed
+        return await asyncio.to_thread(build_dream_result, keyword, dream_text, user_id, persist, emotion)
+
+    with stage("interpretation"):
+        dream_text = await get_dream_interpretation_async(keyword)
+    return await asyncio.to_thread(build_dream_result, keyword, dream_text, user_id, persist)
+
+# === ✅ 批次解夢：多個關鍵字合併成一次 Gemini 請求 ===
+# BATCH_MAX_KEYWORDS：每次請求最多包含的關鍵字數
+BATCH_MAX_KEYWORDS = int(os.getenv("BATCH_MAX_KEYWORDS", "10"))
+
+_KEYWORD_SEPARATORS = re.compile(r"[、，,；;／/\n]+")
+_BATCH_FIELD = re.compile(r"^[*#\-\s]*(?:\d+[.、)）][*\s]*)?(關鍵字|說明|情緒)[*\s]*[:：]\s*(.*)$")
+
+def split_keywords(text):
+    """把一則訊息依頓號、逗號、分號、斜線或換行切成多個關鍵字（去除重複與空白）"""
+    keywords = []
+    for part in _KEYWORD_SEPARATORS.split(text):
+        part = part.strip()
+        if part and part not in keywords:
+            keywords.append(part)
+    return keywords
+
+def build_batch_prompt(keywords):
+    items = "\n".join(f"{i}. {kw}" for i, kw in enumerate(keywords, 1))
+    return (
+        "請根據以下每個夢境關鍵字，分別提供一段簡短的夢境解析，語氣溫柔，有療癒感，每段限 80 字內。\n"
+        f"並回覆該夢境可能對應的情緒，僅限以下情緒中的一種：{', '.join(DECK.emotions)}。\n"
+        f"關鍵字：\n{items}\n\n"
+        "請依序逐一回覆，每個關鍵字一組，格式如下（組與組之間空一行）：\n"
+        "關鍵字：xxx\n說明：xxx\n情緒：xxx"
+    )
+
+def parse_batch_response(text, keywords):
+    """
+    解析批次回覆，回傳 {關鍵字: (說明, 情緒或 None)}；
+    只收錄能對應回原始關鍵字且說明非空白的項目。
+    """
+    wanted = {normalize_keyword(kw): kw for kw in keywords}
+    blocks, current, field = [], None, None
+
+    for line in text.splitlines():
+        m = _BATCH_FIELD.match(line)
+        if m:
+            field, value = m.group(1), m.group(2).strip().strip("*").strip()
+            if field == "關鍵字":
+                current = {"關鍵字": value, "說明": "", "情緒": ""}
+                blocks.append(current)
+            elif current is not None:
+                current[field] = value
+        elif current is not None and field == "說明" and line.strip():
+            current["說明"] = (current["說明"] + "\n" + line.strip()).strip()
+
+    parsed = {}
+    for block in blocks:
+        keyword = wanted.get(normalize_keyword(block["關鍵字"]))
+        if keyword is None or keyword in parsed or not block["說明"]:
+            continue
+        emotion = canonical_emotion(block["情緒"])
+        emotion = emotion if emotion in DECK else None
+        parsed[keyword] = (block["說明"], emotion)
+    return parsed
+
+def get_dream_interpretations_batch(keywords):
+    """
+    批次取得解夢文字，回傳 {關鍵字: (說明, 情緒或 None)}：
+    先查預先生成結果、快取與 dream_links，其餘每 BATCH_MAX_KEYWORDS 個合併成一次請求，
+    解析不到的項目再個別呼叫 get_dream_interpretation。
+    """
+    results, pending = {}, []
+    for keyword in dict.fromkeys(keywords):
+        precomputed = pick_precomputed(keyword)
+        if precomputed is not None:
+            results[keyword] = precomputed
+            continue
+        cached = get_cached_interpretation(keyword)
+        if cached is None:
+            cached = interpret_from_dream_links(keyword)
+        if cached is not None:
+            results[keyword] = (cached, None)
+        else:
+            pending.append(keyword)
+
+    for i in range(0, len(pending), max(1, BATCH_MAX_KEYWORDS)):
+        chunk = pending[i:i + BATCH_MAX_KEYWORDS]
+        try:
+            parsed = parse_batch_response(get_llm_client().generate(build_batch_prompt(chunk)), chunk)
+        except Exception as e:
+            print(f"[ERROR] Gemini 批次請求失敗，改為逐一查詢：{e}")
+            parsed = {}
+
+        for keyword in chunk:
+            if keyword in parsed:
+                results[keyword] = parsed[keyword]
+                cache_interpretation(keyword, parsed[keyword][0])
+            else:
+                print(f"[BATCH] 無法解析「{keyword}」，改為個別查詢")
+                results[keyword] = (get_dream_interpretation(keyword), None)
+
+    return results
+
+def process_dreams_batch(keywords, user_id=None, persist=True):
+    """
+    process_dream 的批次版本：回傳與 keywords 順序相同的結果列表。
+    """
+    with stage("interpretation_batch"):
+        interpretations = get_dream_interpretations_batch(keywords)
+    results = []
+    for keyword in keywords:
+        dream_text, emotion = interpretations[keyword]
+        results.append(build_dream_result(keyword, dream_text, user_id, persist, emotion))
+    return results
+
 # ✅ 本機測試入口
 # if __name__ == "__main__":
 #     test_keyword = "火鍋寶寶外星人"
@@ -152,47 +418,3 @@ def process_dream(keyword, user_id=None):
 #     print("\n====== 測試結果 ======\n")
 #     print(result["text"])
 #     print(f"\n🖼️ 圖片檔名：{result['image']}")
-
-import sqlite3
-
-def save_to_sqlite(keyword, emotion, card, dream_text, user_id=None):
-    db_path = Path(__file__).parent / "dream_history.db"
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # 建立表格（如果尚未存在）
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS dream_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            user_id TEXT,
-            keyword TEXT,
-            dream_text TEXT,
-            emotion TEXT,
-            card_title TEXT,
-            card_message TEXT,
-            card_image TEXT
-        )
-    """)
-
-    # 插入資料
-    cursor.execute(
-        """
-        INSERT INTO dream_history (
-            timestamp, user_id, keyword, dream_text, emotion,
-            card_title, card_message, card_image
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        user_id or "anonymous",
-        keyword,
-        dream_text,
-        emotion,
-        card["title"],
-        card["message"],
-        card["image"]
-    ))
-
-    conn.commit()
-    conn.close()
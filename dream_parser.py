@@ -1,11 +1,24 @@
 # dream_parser.py
+import asyncio
 import json
 import os
-from bs4 import BeautifulSoup
-import requests
+from lazy_import import LazyModule
+
+from dream_snapshot import DreamSnapshot
+from crawl_cache import get_crawl_cache, CRAWL_HEADERS, CRAWL_TIMEOUT
+
+# ✅ 爬蟲相關套件延遲載入（requests 由 crawl_cache 使用）
+bs4 = LazyModule("bs4")
+httpx = LazyModule("httpx")  # 只有 asyncio 版本（crawl_dream_from_url_async）需要
+
+# ✅ 關鍵字網址對應表：有快照（DREAM_LINKS_SNAPSHOT，見 dream_snapshot.py）時以 mmap 開啟，否則讀 JSON
+DREAM_LINKS_SNAPSHOT = os.getenv("DREAM_LINKS_SNAPSHOT", "dream_links.snap")
 
 # 載入自訂關鍵字網址對應表
 def load_dream_links():
+    if os.path.exists(DREAM_LINKS_SNAPSHOT):
+        return DreamSnapshot(DREAM_LINKS_SNAPSHOT)
+
     path = "dream_links.json"
     if os.path.exists(path):
         with open(path, "r", encoding="utf-8") as f:
@@ -14,30 +27,65 @@ def load_dream_links():
 
 dream_links = load_dream_links()
 
-# ✅ 直接從網址爬取夢境內容
+# ✅ 從網址取得夢境內容：經由 crawl_cache 本機快取（過期才以 ETag / Last-Modified 重新驗證）
 def crawl_dream_from_url(url):
     try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        resp = requests.get(url, headers=headers, timeout=10)
-        resp.encoding = "utf-8"
+        return get_crawl_cache().get(url)
+
+    except Exception as e:
+        return f"⚠️ 發生錯誤：{e}"
 
-        if resp.status_code != 200:
-            return "⚠️ 無法載入夢境解析頁面"
+def extract_dream_text(html):
+    # 只建立 #entrybody 的節點樹，其餘頁面內容直接略過
+    only_entry = bs4().SoupStrainer("div", id="entrybody")
+    soup = bs4().BeautifulSoup(html, "html.parser", parse_only=only_entry)
+    body_div = soup.find("div", id="entrybody")
+    if not body_div:
+        return "⚠️ 找不到夢境解析內容"
 
-        soup = BeautifulSoup(resp.text, "html.parser")
-        body_div = soup.find("div", id="entrybody")
-        if not body_div:
-            return "⚠️ 找不到夢境解析內容"
+    return body_div.get_text(separator="\n", strip=True)
 
-        return body_div.get_text(separator="\n", strip=True)
+# ✅ asyncio 版本：以 httpx.AsyncClient 下載，HTML 解析（CPU 工作）與快取讀寫交給執行緒
+async def crawl_dream_from_url_async(url, client=None):
+    try:
+        cache = get_crawl_cache()
+        entry, text = await asyncio.to_thread(cache.lookup, url)
+        if text is not None:
+            return text
+
+        headers = {**CRAWL_HEADERS, **(entry.conditional_headers() if entry else {})}
+        try:
+            if client is None:
+                async with httpx().AsyncClient(timeout=CRAWL_TIMEOUT) as own_client:
+                    resp = await own_client.get(url, headers=headers)
+            else:
+                resp = await client.get(url, headers=headers, timeout=CRAWL_TIMEOUT)
+        except Exception as e:
+            return cache.fallback(entry, f"⚠️ 發生錯誤：{e}")
+
+        body = resp.content.decode("utf-8", errors="replace")
+        return await asyncio.to_thread(cache.handle_response, url, entry, resp.status_code, body, resp.headers)
 
     except Exception as e:
         return f"⚠️ 發生錯誤：{e}"
 
+# ✅ 找出關鍵字對應的解析頁：完全相同優先，其次以 keyword_index 比對句中關鍵字與近似字
+def find_dream_link(keyword):
+    from keyword_index import get_keyword_index
+    match = get_keyword_index().best(keyword)
+    return dream_links[match] if match else None
+
 # ✅ 解夢主邏輯
 def get_dream_interpretation(keyword):
-    if keyword in dream_links:
-        url = dream_links[keyword]
+    url = find_dream_link(keyword)
+    if url:
         return crawl_dream_from_url(url)
 
     return "⚠️ 尚未支援此夢境，請稍後再試或由開發者補充資料"
+
+async def get_dream_interpretation_async(keyword, client=None):
+    url = find_dream_link(keyword)
+    if url:
+        return await crawl_dream_from_url_async(url, client)
+
+    return "⚠️ 尚未支援此夢境，請稍後再試或由開發者補充資料"
@@ -0,0 +1,283 @@
+# dream_snapshot.py
+# 夢境關鍵字字典的二進位快照：排序後的鍵 + 位移表 + 字串區塊，以 mmap 唯讀開啟。
+# 多個 gunicorn worker 開同一個檔案時共用作業系統的 page cache，不必各自解析 JSON 成 dict。
+#
+#   python dream_snapshot.py build dream_links.json dream_links.snap   JSON → 快照
+#   python dream_snapshot.py export dream_links.snap dream_links.json  快照（含增量紀錄）→ JSON
+#   python dream_snapshot.py compact dream_links.snap                  把增量紀錄併入快照（紀錄先輪替再整併）
+#
+# 檔案格式（little-endian）：
+#   header ：magic "DRMSNAP1"、版本 u32、筆數 u32、位移表起點 u64、字串區塊起點 u64
+#   位移表 ：每筆 (鍵位移 u64, 鍵長度 u32, 值位移 u64, 值長度 u32)，依鍵的 UTF-8 位元組排序
+#   字串區塊：所有鍵與值的 UTF-8 位元組
+# 增量更新寫在「<快照>.log」（每行一筆 JSON：{"k": 鍵, "v": 值} 或 {"k": 鍵, "d": 1} 表示刪除），
+# 開啟時套用在快照之上，compact 時再整併。
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import Mapping
+
+MAGIC = b"DRMSNAP1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+RECORD = struct.Struct("<QIQI")
+
+# 最多每幾秒檢查一次快照或增量紀錄是否有變更
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", "5"))
+
+
+def write_snapshot(items, path):
+    """把 {鍵: 字串值} 寫成快照（先寫暫存檔再替換）"""
+    encoded = sorted((str(k).encode("utf-8"), str(v).encode("utf-8")) for k, v in dict(items).items())
+    index_offset = HEADER.size
+    blob_offset = index_offset + RECORD.size * len(encoded)
+
+    records, blob, pos = [], [], blob_offset
+    for key, value in encoded:
+        records.append(RECORD.pack(pos, len(key), pos + len(key), len(value)))
+        blob.append(key)
+        blob.append(value)
+        pos += len(key) + len(value)
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(encoded), index_offset, blob_offset))
+        f.write(b"".join(records))
+        f.write(b"".join(blob))
+    os.replace(tmp, path)
+    return len(encoded)
+
+
+class _Mapped:
+    """一個已 mmap 的快照檔（唯讀）"""
+
+    __slots__ = ("file", "mm", "count", "index_offset", "inode")
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        size = os.fstat(self.file.fileno()).st_size
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if size < HEADER.size:
+            raise ValueError(f"快照檔格式錯誤：{path}")
+        magic, version, self.count, self.index_offset, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"快照檔格式或版本不符：{path}")
+
+    def record(self, i):
+        return RECORD.unpack_from(self.mm, self.index_offset + i * RECORD.size)
+
+    def key(self, i):
+        key_pos, key_len, _, _ = self.record(i)
+        return self.mm[key_pos:key_pos + key_len]
+
+    def items(self):
+        """依序產生 (鍵, 值) 字串"""
+        for i in range(self.count):
+            key_pos, key_len, value_pos, value_len = self.record(i)
+            yield (self.mm[key_pos:key_pos + key_len].decode("utf-8"),
+                   self.mm[value_pos:value_pos + value_len].decode("utf-8"))
+
+    def find(self, key):
+        """二分搜尋，回傳值（bytes）或 None"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key_pos, key_len, value_pos, value_len = self.record(mid)
+            current = self.mm[key_pos:key_pos + key_len]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return self.mm[value_pos:value_pos + value_len]
+        return None
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self.file.close()
+
+
+class DreamSnapshot(Mapping):
+    """
+    唯讀 Mapping 介面的快照（查詢為 mmap 上的二分搜尋），加上增量紀錄的覆寫層：
+    - set() / delete() 只在 .log 尾端追加一行，不重寫整個檔案
+    - 其他行程寫入的增量、或 compact 後替換的快照，會在下次存取時（最多每 check_interval 秒）自動載入
+    """
+
+    def __init__(self, path, check_interval=SNAPSHOT_CHECK_INTERVAL):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._mapped = _Mapped(path) if os.path.exists(path) else None
+        self._overlay = {}   # 鍵 → 值（None 表示已刪除）
+        self._log_pos = 0
+        self._log_inode = None
+        self._version = 0    # 內容每次變更就加一，供 keyword_index 判斷是否要重建
+        self._next_check = 0.0
+        self._read_log()
+
+    @property
+    def version(self):
+        """內容版本號（會先檢查快照與增量紀錄是否有變更）"""
+        self._maybe_refresh()
+        return self._version
+
+    # --- 增量紀錄 ---
+    def _read_log(self):
+        try:
+            with open(self.log_path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self._log_inode or stat.st_size < self._log_pos:
+                    # 紀錄已被 compact 輪替成新檔：從頭讀（舊紀錄的內容仍在 overlay 或已併入快照）
+                    self._log_pos, self._log_inode = 0, stat.st_ino
+                f.seek(self._log_pos)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # 另一個行程正在寫的半行，下次再讀
+                    self._log_pos += len(line)
+                    entry = json.loads(line)
+                    self._overlay[entry["k"]] = None if entry.get("d") else entry["v"]
+                    self._version += 1
+        except FileNotFoundError:
+            self._log_pos, self._log_inode = 0, None
+
+    def _append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._read_log()
+
+    def set(self, key, value):
+        self._append({"k": key, "v": value})
+
+    def delete(self, key):
+        self._append({"k": key, "d": 1})
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        with self._lock:
+            try:
+                inode = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                inode = None
+            if inode is not None and (self._mapped is None or inode != self._mapped.inode):
+                # 快照已被 compact 替換：重新 mmap，增量紀錄從頭讀
+                # 舊的 mmap 不主動關閉（其他執行緒可能正在讀），交給垃圾回收
+                self._mapped = _Mapped(self.path)
+                self._overlay, self._log_pos = {}, 0
+                self._version += 1
+            self._read_log()
+
+    # --- Mapping 介面 ---
+    def __getitem__(self, key):
+        self._maybe_refresh()
+        if key in self._overlay:
+            value = self._overlay[key]
+            if value is None:
+                raise KeyError(key)
+            return value
+        value = self._mapped.find(key.encode("utf-8")) if self._mapped is not None and isinstance(key, str) else None
+        if value is None:
+            raise KeyError(key)
+        return value.decode("utf-8")
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        self._maybe_refresh()
+        overlay = dict(self._overlay)
+        if self._mapped is not None:
+            for i in range(self._mapped.count):
+                key = self._mapped.key(i).decode("utf-8")
+                if key not in overlay:
+                    yield key
+        for key, value in overlay.items():
+            if value is not None:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    # --- 整併 ---
+    def compact(self):
+        """
+        把增量紀錄併入新的快照檔：先把 .log 改名（之後其他行程的 set() 會寫到新的 .log），
+        再以「目前的快照 + 改名後的紀錄」寫出新快照，最後刪除改名的紀錄。
+        不直接清空 .log，避免漏掉寫快照期間其他行程追加的紀錄。
+        """
+        with self._lock:
+            rotated = f"{self.log_path}.{os.getpid()}.compacting"
+            try:
+                os.replace(self.log_path, rotated)
+            except FileNotFoundError:
+                rotated = None
+
+            items = {}
+            if os.path.exists(self.path):
+                mapped = _Mapped(self.path)
+                try:
+                    items.update(mapped.items())
+                finally:
+                    mapped.close()
+            if rotated is not None:
+                with open(rotated, "rb") as f:
+                    for line in f:
+                        if line.endswith(b"\n"):
+                            entry = json.loads(line)
+                            if entry.get("d"):
+                                items.pop(entry["k"], None)
+                            else:
+                                items[entry["k"]] = entry["v"]
+
+            count = write_snapshot(items, self.path)
+            if rotated is not None:
+                os.remove(rotated)
+            self._next_check = 0.0
+            self._maybe_refresh()
+            return count
+
+    def close(self):
+        with self._lock:
+            if self._mapped is not None:
+                self._mapped.close()
+                self._mapped = None
+
+
+def main():
+    import sys
+
+    args = sys.argv[1:]
+    if len(args) == 3 and args[0] == "build":
+        with open(args[1], "r", encoding="utf-8") as f:
+            count = write_snapshot(json.load(f), args[2])
+        print(f"✅ 已建立快照 {args[2]}：{count} 筆")
+    elif len(args) == 3 and args[0] == "export":
+        snapshot = DreamSnapshot(args[1])
+        with open(args[2], "w", encoding="utf-8") as f:
+            json.dump(dict(snapshot.items()), f, ensure_ascii=False, indent=2)
+        print(f"✅ 已匯出 {args[2]}：{len(snapshot)} 筆")
+    elif len(args) == 2 and args[0] == "compact":
+        count = DreamSnapshot(args[1]).compact()
+        print(f"✅ 已整併 {args[1]}：{count} 筆")
+    else:
+        print("用法：python dream_snapshot.py build <json> <snap> | export <snap> <json> | compact <snap>")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
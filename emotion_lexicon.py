@@ -0,0 +1,134 @@
+# emotion_lexicon.py
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from keyword_matcher import KeywordAutomaton
+
+# ✅ 情緒詞庫設定
+#   EMOTION_LEXICON_PATH          ：詞庫 JSON 路徑（預設為本資料夾的 emotion_lexicon.json）
+#   EMOTION_LEXICON_CHECK_INTERVAL：最多每幾秒檢查一次檔案是否更新（0＝每次都檢查）
+LEXICON_PATH = os.getenv("EMOTION_LEXICON_PATH") or str(Path(__file__).parent / "emotion_lexicon.json")
+LEXICON_CHECK_INTERVAL = float(os.getenv("EMOTION_LEXICON_CHECK_INTERVAL", "5"))
+
+
+class CompiledLexicon:
+    """
+    編譯後的詞庫（唯讀）：
+    - emotions ：{情緒: {關鍵詞: 權重}}
+    - synonyms ：{情緒別名: 卡牌資料中的情緒}
+    - ignore   ：含有關鍵詞、但不帶該情緒的詞（「花費」不是「花」）
+    - automaton：所有關鍵詞的比對器，附帶資料為 (情緒, 權重)；ignore 的詞附帶 None
+    """
+
+    __slots__ = ("emotions", "synonyms", "ignore", "automaton", "version")
+
+    def __init__(self, emotions, synonyms, version=None, ignore=()):
+        self.emotions = emotions
+        self.synonyms = synonyms
+        self.ignore = tuple(ignore)
+        self.version = version
+
+        patterns = {}
+        for emotion, words in emotions.items():
+            for word, weight in words.items():
+                # 同一關鍵詞出現在多個情緒時，以先出現的分類為準
+                patterns.setdefault(word, (emotion, float(weight)))
+        for word in self.ignore:
+            patterns.setdefault(word, None)
+        self.automaton = KeywordAutomaton(patterns)
+
+    def canonical(self, emotion):
+        return self.synonyms.get(emotion, emotion)
+
+
+def compile_lexicon(data, version=None):
+    """檢查 JSON 結構並編譯；格式錯誤時丟出 ValueError"""
+    emotions = data.get("emotions")
+    if not isinstance(emotions, dict):
+        raise ValueError("詞庫缺少 emotions 物件")
+
+    cleaned = {}
+    for emotion, words in emotions.items():
+        if isinstance(words, list):
+            words = {w: 1.0 for w in words}
+        if not isinstance(words, dict):
+            raise ValueError(f"情緒「{emotion}」的關鍵詞格式錯誤")
+        cleaned[emotion] = {str(w).strip(): float(weight) for w, weight in words.items() if str(w).strip()}
+
+    synonyms = data.get("synonyms") or {}
+    if not isinstance(synonyms, dict):
+        raise ValueError("synonyms 必須是物件")
+
+    ignore = data.get("ignore") or []
+    if not isinstance(ignore, list):
+        raise ValueError("ignore 必須是陣列")
+
+    return CompiledLexicon(cleaned, dict(synonyms), version, [str(w).strip() for w in ignore if str(w).strip()])
+
+
+class LexiconStore:
+    """
+    持有目前生效的詞庫；取用時（最多每 check_interval 秒）檢查檔案修改時間，
+    有變更就重新載入並編譯，完成後整個替換（讀取端不會看到一半的狀態）。
+    重新載入失敗時保留舊版詞庫。
+    """
+
+    def __init__(self, path=LEXICON_PATH, check_interval=LEXICON_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lexicon = CompiledLexicon({}, {})
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        with self._lock:
+            mtime = self._stat()
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    lexicon = compile_lexicon(json.load(f), version=mtime)
+            except Exception as e:
+                print(f"[LEXICON] 載入情緒詞庫失敗，沿用目前版本：{e}")
+                self._mtime = mtime
+                return False
+            self._lexicon = lexicon
+            self._mtime = mtime
+            print(f"[LEXICON] 已載入情緒詞庫：{len(lexicon.emotions)} 種情緒、{sum(map(len, lexicon.emotions.values()))} 個關鍵詞")
+            return True
+
+    def current(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            if self._stat() != self._mtime:
+                self.reload()
+        return self._lexicon
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_lexicon():
+    """取得目前生效的詞庫（必要時自動重新載入）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LexiconStore()
+    return _store.current()
+
+
+def canonical_emotion(emotion):
+    """把情緒別名（例如「愛」）轉成卡牌資料中的情緒（例如「被愛」）"""
+    return get_lexicon().canonical(emotion)
@@ -1,9 +1,76 @@
-import jieba
+import os
 from collections import Counter
+from lazy_import import LazyModule
+from emotion_lexicon import get_lexicon
+
+# ✅ jieba 延遲載入（第一次判定或 warmup 時才載入字典）
+jieba = LazyModule("jieba")
+
+# ✅ 比對方式：automaton（預設，Aho–Corasick 單次掃描，不需 jieba）或 jieba（分詞後比對）
+#   automaton 取同一起點最長的詞，詞庫 ignore 的詞（「花費」）不計分，
+#   前後帶否定的關鍵詞（「不開心」「笑不出來」）也不計分
+EMOTION_MATCHER = os.getenv("EMOTION_MATCHER", "automaton").lower()
+
+# 關鍵詞分類與權重放在 emotion_lexicon.json（可在執行中修改，會自動重新載入）
+
+# 關鍵詞前方緊接這些詞、或後方緊接這些詞時視為否定
+NEGATION_PREFIXES = ("不", "沒", "沒有", "未", "別", "無法", "不要", "不用", "不必", "不會", "不再", "不太", "不怎麼")
+NEGATION_SUFFIXES = ("不出", "不起來")
+
+
+def negated(text, start, end):
+    """text[start:end] 的關鍵詞是否被否定"""
+    before = text[max(0, start - 3):start]
+    return before.endswith(NEGATION_PREFIXES) or text.startswith(NEGATION_SUFFIXES, end)
+
+
+def score_emotions(text, lexicon=None):
+    """
+    單次掃描文字（同一起點取最長、不重疊），回傳 {情緒: (加權分數, 命中次數, 最早出現位置)}；
+    ignore 的詞與被否定的關鍵詞不計分
+    """
+    scores = {}
+    for start, word, payload in (lexicon or get_lexicon()).automaton.longest_matches(text):
+        if payload is None or negated(text, start, start + len(word)):
+            continue
+        emotion, weight = payload
+        score, count, first = scores.get(emotion, (0.0, 0, start))
+        scores[emotion] = (score + weight, count + 1, min(first, start))
+    return scores
+
 
 def map_emotion(text):
     """
-    根據夢境解析文字進行情緒判定：
+    根據夢境解析文字進行情緒判定，依 EMOTION_MATCHER 選擇 jieba 或 automaton，
+    回傳卡牌資料中的情緒名稱（經詞庫 synonyms 對應）
+    """
+
+    if EMOTION_MATCHER == "automaton":
+        return map_emotion_automaton(text)
+    return map_emotion_jieba(text)
+
+
+def map_emotion_automaton(text):
+    """
+    Aho–Corasick 判定方式（預設）：
+    - 以詞庫預先編譯的比對器一次掃描全文，略過 ignore 的詞與被否定的關鍵詞
+    - 依加權分數取最高者，同分時比命中次數，再比最早出現位置
+    """
+
+    if text.startswith("⚠️"):
+        return "未知"
+
+    lexicon = get_lexicon()
+    scores = score_emotions(text, lexicon)
+    if not scores:
+        return "未知"
+    best = max(scores.items(), key=lambda item: (item[1][0], item[1][1], -item[1][2]))[0]
+    return lexicon.canonical(best)
+
+
+def map_emotion_jieba(text):
+    """
+    jieba 判定方式：
     - 使用 jieba 分詞建立詞頻表
     - 對照多組情緒關鍵字分類
     """
@@ -11,23 +78,14 @@ def map_emotion(text):
     if text.startswith("⚠️"):
         return "未知"
 
-    words = jieba.lcut(text)
+    words = jieba().lcut(text)
     freq = Counter(words)
-
-    # 關鍵詞分類（可擴充）
-    emotion_keywords = {
-        "焦慮": ["掉牙", "迷路", "追趕", "失敗", "遲到", "焦慮", "緊張"],
-        "恐懼": ["蛇", "黑暗", "鬼", "墜落", "死亡", "害怕"],
-        "快樂": ["飛翔", "陽光", "花", "笑", "海邊", "快樂", "開心", "幸福"],
-        "悲傷": ["哭", "下雨", "失戀", "分手", "孤單", "悲傷", "痛苦", "失落"],
-        "驚奇": ["中獎", "懷孕", "變身", "寶藏", "意外"],
-        "愛": ["擁抱", "親吻", "戀人", "家人", "朋友"]
-    }
+    lexicon = get_lexicon()
 
     # 詞頻分析後比對分類
     for word, _ in freq.most_common():
-        for emotion, keywords in emotion_keywords.items():
+        for emotion, keywords in lexicon.emotions.items():
             if word in keywords:
-                return emotion
+                return lexicon.canonical(emotion)
 
     return "未知"
@@ -0,0 +1,227 @@
+# fake_services.py
+# 壓測用的本機假服務，可設定延遲與錯誤率：
+#   - 假 Gemini：REST 的 models/<模型>:generateContent（以 GEMINI_API_ENDPOINT 指向這裡）
+#   - 假 LINE  ：/v2/bot/message/reply 與 /v2/bot/message/push（以 LINE_API_HOST 指向這裡）
+#
+#   python fake_services.py --gemini-latency 0.8 --gemini-jitter 0.3 --gemini-error-rate 0.02 --line-latency 0.05
+#   GEMINI_API_ENDPOINT=http://127.0.0.1:9101 LINE_API_HOST=http://127.0.0.1:9102 gunicorn bot_app:app -w 2 -b :8000
+#   python loadtest.py http://localhost:8000/callback --line-fake http://127.0.0.1:9102 -n 500 -c 50
+#
+# 假 LINE 會記錄每個 replyToken 的收到時間（GET /_fake/replies），loadtest.py 以此計算
+# 「送出 webhook → LINE 收到回覆」的端到端延遲；GET /_fake/stats 為兩個服務的請求計數。
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 假 Gemini 的回覆內容（含情緒詞，讓 map_emotion 有東西可判斷）
+FAKE_INTERPRETATIONS = [
+    "夢見「{keyword}」象徵你正面對內心的焦慮，提醒你放慢腳步，好好照顧自己。",
+    "「{keyword}」的夢代表新的開始與希望，你對未來充滿期待。",
+    "夢到「{keyword}」反映出你最近感到孤單，渴望被理解與陪伴。",
+    "「{keyword}」出現在夢中，暗示壓抑已久的憤怒需要找到出口。",
+    "這個關於「{keyword}」的夢帶著平靜與安心，代表你正逐漸與自己和解。",
+]
+# dream_core.INTERPRETATION_PROMPT 以 '關鍵字' 包住查詢內容
+_PROMPT_KEYWORD = re.compile(r"'([^']+)'")
+
+
+class FaultProfile:
+    """延遲（固定值 + 均勻抖動）與錯誤注入設定"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def wait(self):
+        delay = self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """共用的 JSON 收發與計數；子類別設定 service 並實作 handle_post(path, payload)"""
+
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/_fake/stats":
+            self._send_json(200, self.service.stats())
+        elif self.path == "/_fake/replies":
+            self._send_json(200, self.service.replies())
+        else:
+            self._send_json(404, {"message": "not found"})
+
+    def do_DELETE(self):
+        if self.path == "/_fake/replies":
+            self.service.reset()
+            self._send_json(200, {})
+        else:
+            self._send_json(404, {"message": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.service.incr("bad_requests")
+            return self._send_json(400, {"message": "invalid json"})
+
+        profile = self.service.profile
+        profile.wait()
+        if profile.should_fail():
+            self.service.incr("injected_errors")
+            return self._send_json(profile.error_status, self.service.error_body(profile.error_status))
+        status, body = self.handle_post(self.path.split("?", 1)[0], payload)
+        self.service.incr("ok" if status == 200 else "not_found")
+        self._send_json(status, body)
+
+    def handle_post(self, path, payload):
+        raise NotImplementedError
+
+
+class FakeService:
+    def __init__(self, name, profile):
+        self.name = name
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._replies = {}
+        self.counters = {"ok": 0, "injected_errors": 0, "bad_requests": 0, "not_found": 0, "pushes": 0}
+
+    def incr(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def record_reply(self, token):
+        with self._lock:
+            self._replies[token] = time.time()
+
+    def replies(self):
+        with self._lock:
+            return dict(self._replies)
+
+    def reset(self):
+        with self._lock:
+            self._replies.clear()
+            for key in self.counters:
+                self.counters[key] = 0
+
+    def error_body(self, status):
+        if self.name == "gemini":
+            grpc_status = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE", 504: "DEADLINE_EXCEEDED"}
+            return {"error": {"code": status, "message": "fake error", "status": grpc_status.get(status, "UNKNOWN")}}
+        return {"message": "fake error"}
+
+    def stats(self):
+        with self._lock:
+            return {"service": self.name, **self.counters, "replies": len(self._replies)}
+
+
+class FakeGeminiHandler(FakeHandler):
+    def handle_post(self, path, payload):
+        if not path.endswith(":generateContent"):
+            return 404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}}
+        try:
+            prompt = payload["contents"][-1]["parts"][0]["text"]
+        except (KeyError, IndexError, TypeError):
+            prompt = ""
+        match = _PROMPT_KEYWORD.search(prompt)
+        keyword = match.group(1) if match else "夢境"
+        text = random.choice(FAKE_INTERPRETATIONS).format(keyword=keyword)
+        return 200, {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {"promptTokenCount": len(prompt), "candidatesTokenCount": len(text),
+                              "totalTokenCount": len(prompt) + len(text)},
+        }
+
+
+class FakeLineHandler(FakeHandler):
+    def handle_post(self, path, payload):
+        if path == "/v2/bot/message/reply":
+            self.service.record_reply(payload.get("replyToken", ""))
+        elif path == "/v2/bot/message/push":
+            self.service.incr("pushes")
+        else:
+            return 404, {"message": "not found"}
+        sent = [{"id": str(random.randrange(10 ** 15)), "quoteToken": uuid.uuid4().hex}
+                for _ in payload.get("messages", [])]
+        return 200, {"sentMessages": sent}
+
+
+def start_fake_service(name, handler, profile, host="127.0.0.1", port=0):
+    """在背景執行緒啟動假服務，回傳 (server, service)；server.server_port 為實際連接埠"""
+    service = FakeService(name, profile)
+    handler_class = type(handler.__name__, (handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"fake-{name}", daemon=True).start()
+    return server, service
+
+
+def start_fake_gemini(profile=None, host="127.0.0.1", port=0):
+    return start_fake_service("gemini", FakeGeminiHandler, profile or FaultProfile(), host, port)
+
+
+def start_fake_line(profile=None, host="127.0.0.1", port=0):
+    return start_fake_service("line", FakeLineHandler, profile or FaultProfile(error_status=500), host, port)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="壓測用的假 Gemini 與假 LINE 伺服器")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--gemini-port", type=int, default=9101)
+    ap.add_argument("--gemini-latency", type=float, default=0.8, help="秒")
+    ap.add_argument("--gemini-jitter", type=float, default=0.2, help="延遲的均勻抖動幅度（秒）")
+    ap.add_argument("--gemini-error-rate", type=float, default=0.0)
+    ap.add_argument("--gemini-error-status", type=int, default=503)
+    ap.add_argument("--line-port", type=int, default=9102)
+    ap.add_argument("--line-latency", type=float, default=0.05)
+    ap.add_argument("--line-jitter", type=float, default=0.02)
+    ap.add_argument("--line-error-rate", type=float, default=0.0)
+    ap.add_argument("--line-error-status", type=int, default=500)
+    args = ap.parse_args()
+
+    gemini, _ = start_fake_gemini(FaultProfile(args.gemini_latency, args.gemini_jitter,
+                                               args.gemini_error_rate, args.gemini_error_status),
+                                  args.host, args.gemini_port)
+    line, _ = start_fake_line(FaultProfile(args.line_latency, args.line_jitter,
+                                           args.line_error_rate, args.line_error_status),
+                              args.host, args.line_port)
+    print("🧪 假服務已啟動，以下列環境變數啟動 bot_app：")
+    print(f"   GEMINI_API_ENDPOINT=http://{args.host}:{gemini.server_port}")
+    print(f"   LINE_API_HOST=http://{args.host}:{line.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        gemini.shutdown()
+        line.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# gunicorn.conf.py（gunicorn 啟動時自動讀取）
+
+
+def post_worker_init(worker):
+    # ✅ worker 已載入 app 且連接埠已由 master 綁定後，才在背景做遷移與預熱
+    from warmup import start_background_warmup
+    start_background_warmup()
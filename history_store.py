@@ -0,0 +1,148 @@
+# history_store.py
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+
+# ✅ dream_history.db 路徑（可由環境變數覆寫）
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH") or str(Path(__file__).parent / "dream_history.db")
+
+HISTORY_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS dream_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        user_id TEXT,
+        keyword TEXT,
+        dream_text TEXT,
+        emotion TEXT,
+        card_title TEXT,
+        card_message TEXT,
+        card_image TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_dream_history_user_id ON dream_history (user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_dream_history_timestamp ON dream_history (timestamp)",
+)
+
+HISTORY_INSERT_SQL = """
+    INSERT INTO dream_history (
+        timestamp, user_id, keyword, dream_text, emotion,
+        card_title, card_message, card_image
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_STOP = object()
+
+
+class SQLiteWriter:
+    """
+    每個行程只開一條長駐的 SQLite 連線（WAL 模式），
+    由單一寫入執行緒把佇列中的資料列合併成批次後一次 commit。
+    資料表與索引只在建立時執行一次。
+    """
+
+    def __init__(self, path, schema, insert_sql, batch_size=200, name="sqlite-writer"):
+        self.path = str(path)
+        self.insert_sql = insert_sql
+        self.batch_size = max(1, batch_size)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.counters = {"rows": 0, "batches": 0, "errors": 0}
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in schema:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row):
+        """非同步寫入一筆（立即返回）"""
+        self._queue.put(row)
+
+    def insert_many(self, rows):
+        """同步寫入一批資料並 commit（給已自行批次化的呼叫端使用）"""
+        rows = list(rows)
+        if not rows:
+            return
+        with self._lock:
+            try:
+                self._conn.executemany(self.insert_sql, rows)
+                self._conn.commit()
+                self.counters["rows"] += len(rows)
+                self.counters["batches"] += 1
+            except Exception:
+                self._conn.rollback()
+                self.counters["errors"] += 1
+                raise
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            batch, stop = [], item is _STOP
+            if not stop:
+                batch.append(item)
+            while len(batch) < self.batch_size and not stop:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            try:
+                self.insert_many(batch)
+            except Exception as e:
+                print(f"[SQLITE] 批次寫入失敗（{len(batch)} 筆）：{e}")
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """等待佇列中的資料全部寫入"""
+        self._queue.join()
+
+    def connect_reader(self):
+        """開一條唯讀用的連線（WAL 模式下不會阻擋寫入）"""
+        return sqlite3.connect(self.path)
+
+    def close(self, timeout=10.0):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._queue.qsize(), **self.counters}
+
+
+_history_store = None
+_history_lock = threading.Lock()
+
+
+def get_history_store():
+    """取得行程共用的 dream_history 寫入器（第一次呼叫時建立資料表）"""
+    global _history_store
+    if _history_store is None:
+        with _history_lock:
+            if _history_store is None:
+                _history_store = SQLiteWriter(
+                    HISTORY_DB_PATH, HISTORY_SCHEMA, HISTORY_INSERT_SQL, name="history-writer"
+                )
+    return _history_store
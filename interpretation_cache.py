@@ -0,0 +1,183 @@
+# interpretation_cache.py
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# ✅ 簡體 → 繁體 常用字對照（未安裝 opencc 時的後備方案，可自行擴充）
+_S2T_TABLE = str.maketrans({
+    "梦": "夢", "见": "見", "齿": "齒", "龙": "龍", "鱼": "魚", "鸟": "鳥", "车": "車", "门": "門", "马": "馬",
+    "头": "頭", "飞": "飛", "杀": "殺", "钱": "錢", "猫": "貓", "虫": "蟲", "龟": "龜", "镜": "鏡", "桥": "橋",
+    "树": "樹", "坠": "墜", "怀": "懷", "宝": "寶", "亲": "親", "恋": "戀", "离": "離", "爱": "愛", "尸": "屍",
+    "鸡": "雞", "猪": "豬", "蚁": "蟻", "蝎": "蠍", "厕": "廁", "试": "試", "丢": "丟", "迟": "遲", "师": "師",
+    "学": "學", "妈": "媽", "爷": "爺", "孙": "孫", "灾": "災", "战": "戰", "枪": "槍", "电": "電", "风": "風",
+    "云": "雲", "阳": "陽", "时": "時", "间": "間", "岁": "歲", "脱": "脫", "泪": "淚", "飘": "飄", "坟": "墳",
+    "医": "醫", "药": "藥", "买": "買", "卖": "賣", "结": "結", "产": "產", "伤": "傷", "楼": "樓", "厨": "廚",
+    "饭": "飯", "钥": "鑰", "锁": "鎖", "书": "書", "笔": "筆", "裤": "褲", "袜": "襪", "脸": "臉",
+})
+
+try:
+    from opencc import OpenCC
+    _opencc = OpenCC("s2t")
+except Exception:
+    _opencc = None
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_keyword(keyword):
+    """
+    快取用的關鍵字正規化：
+    - NFKC 折疊全形／半形
+    - 移除所有空白
+    - 簡體折疊成繁體（優先使用 opencc）
+    - 英文字母轉小寫
+    """
+    text = unicodedata.normalize("NFKC", keyword or "")
+    text = _WHITESPACE.sub("", text)
+    text = _opencc.convert(text) if _opencc else text.translate(_S2T_TABLE)
+    return text.lower()
+
+
+class InterpretationCache:
+    """
+    解夢結果快取：記憶體 LRU（含 TTL）＋ 可選的 SQLite 磁碟層（重啟後仍保留）
+    - 磁碟層開啟時及每寫入約 disk_maxsize / 10 筆清理一次：刪除過期的，
+      再依到期時間（即寫入先後）刪除最舊的，筆數維持在 disk_maxsize 附近
+    """
+
+    def __init__(self, maxsize=1024, ttl=86400, db_path=None, disk_maxsize=10000, clock=time.time):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self.disk_maxsize = max(1, int(disk_maxsize))
+        self._clock = clock
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._purge_every = max(1, self.disk_maxsize // 10)
+        self._disk_writes = 0
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "purged": 0}
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS interpretation_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    expires_at REAL
+                )
+            """)
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_interpretation_cache_expires ON interpretation_cache (expires_at)"
+            )
+            self._db.commit()
+            self._purge(clock())
+
+    def _purge(self, now):
+        """刪除過期的磁碟記錄，超過 disk_maxsize 時再刪除最舊的（呼叫端需持有鎖或尚未共用）"""
+        self._disk_writes = 0
+        purged = self._db.execute("DELETE FROM interpretation_cache WHERE expires_at <= ?", (now,)).rowcount
+        excess = self._db.execute("SELECT COUNT(*) FROM interpretation_cache").fetchone()[0] - self.disk_maxsize
+        if excess > 0:
+            purged += self._db.execute("""
+                DELETE FROM interpretation_cache WHERE key IN (
+                    SELECT key FROM interpretation_cache ORDER BY expires_at LIMIT ?
+                )
+            """, (excess,)).rowcount
+        self._db.commit()
+        self.counters["purged"] += purged
+        return purged
+
+    def _disk_get(self, key, now):
+        row = self._db.execute(
+            "SELECT value, expires_at FROM interpretation_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self._db.execute("DELETE FROM interpretation_cache WHERE key = ?", (key,))
+            self._db.commit()
+            self.counters["expired"] += 1
+            return None
+        return row
+
+    def _remember(self, key, value, expires_at):
+        self._items[key] = (expires_at, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def get(self, keyword):
+        key = normalize_keyword(keyword)
+        now = self._clock()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._items.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return entry[1]
+                del self._items[key]
+                self.counters["expired"] += 1
+
+            if self._db is not None:
+                row = self._disk_get(key, now)
+                if row is not None:
+                    self._remember(key, row[0], row[1])
+                    self.counters["disk_hits"] += 1
+                    return row[0]
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, keyword, value):
+        key = normalize_keyword(keyword)
+        now = self._clock()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO interpretation_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._db.commit()
+                self._disk_writes += 1
+                if self._disk_writes >= self._purge_every:
+                    self._purge(now)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM interpretation_cache")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            size = len(self._items)
+            disk_size = (self._db.execute("SELECT COUNT(*) FROM interpretation_cache").fetchone()[0]
+                         if self._db is not None else None)
+        lookups = counters["hits"] + counters["disk_hits"] + counters["misses"]
+        hit_rate = (counters["hits"] + counters["disk_hits"]) / lookups if lookups else 0.0
+        return {"size": size, "maxsize": self.maxsize, "disk_size": disk_size, "disk_maxsize": self.disk_maxsize,
+                "ttl": self.ttl, "hit_rate": round(hit_rate, 4), **counters}
+
+
+# ✅ 依環境變數建立共用快取（INTERP_CACHE_SIZE=0 代表停用；INTERP_CACHE_DB_MAX 為磁碟層筆數上限）
+def create_default_cache():
+    size = int(os.getenv("INTERP_CACHE_SIZE", "1024"))
+    if size <= 0:
+        return None
+    return InterpretationCache(
+        maxsize=size,
+        ttl=float(os.getenv("INTERP_CACHE_TTL", "86400")),
+        db_path=os.getenv("INTERP_CACHE_DB") or None,
+        disk_maxsize=int(os.getenv("INTERP_CACHE_DB_MAX", "10000")),
+    )
@@ -0,0 +1,178 @@
+# keyword_index.py
+# dream_links 關鍵字查詢索引：整句比對、句中最長關鍵字、近似字（bigram 相似度）
+#
+#   python keyword_index.py report   以 dream_history.db 的歷史查詢估算可省下多少 Gemini 呼叫
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+from interpretation_cache import normalize_keyword
+from keyword_matcher import KeywordAutomaton
+
+# ✅ 查詢設定
+#   KEYWORD_MIN_COVERAGE ：句中關鍵字至少要佔查詢字數的比例（「老虎機」的「老虎」只佔 2/3，不算命中）
+#   KEYWORD_MIN_LENGTH   ：句中比對的關鍵字最短字數（單字關鍵字只接受整句相同、或其餘都是 FILLER_CHARS，
+#                          避免「火鍋」命中「火」）
+#   KEYWORD_FUZZY_MIN    ：近似比對的最低 Dice 相似度
+#   KEYWORD_FUZZY_SHARED ：近似比對至少要共有幾個 bigram（只共有一個的短詞大多無關）
+KEYWORD_MIN_COVERAGE = float(os.getenv("KEYWORD_MIN_COVERAGE", "0.75"))
+KEYWORD_MIN_LENGTH = int(os.getenv("KEYWORD_MIN_LENGTH", "2"))
+KEYWORD_FUZZY_MIN = float(os.getenv("KEYWORD_FUZZY_MIN", "0.6"))
+KEYWORD_FUZZY_SHARED = int(os.getenv("KEYWORD_FUZZY_SHARED", "2"))
+
+# 只帶數量、大小、語氣的字：去掉後只剩一個字時，可命中單字關鍵字（「一條大蛇」→「蛇」）
+FILLER_CHARS = set("一二兩三幾多條隻個頭匹群堆把張大小很好的了著我你他她它被在有是又也都就啊呢嗎吧")
+
+# 查詢前去掉的口語開頭，例如「夢到蛇」→「蛇」
+_LEADING_PHRASES = re.compile(r"^(?:我|昨天|昨晚|今天|晚上)*(?:夢見|夢到|夢裡|夢中|夢)+(?:了|到|見)?")
+
+
+def strip_leading_phrases(text):
+    """去掉「夢到」「昨晚夢見」等開頭（整句都被去掉時保留原文）"""
+    return _LEADING_PHRASES.sub("", text) or text
+
+
+def _grams(text):
+    """字元 bigram（單字關鍵字用單字本身）"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class KeywordIndex:
+    """
+    由關鍵字清單建立的唯讀索引：
+    - exact    ：正規化後完全相同
+    - substring：Aho–Corasick 找出句中包含的關鍵字（長者優先）
+    - fuzzy    ：bigram 倒排索引 + Dice 相似度，處理錯字、語序不同
+    lookup() 回傳依分數排序的 [(關鍵字, 分數, 方式)]，分數介於 0～1。
+    """
+
+    def __init__(self, keywords, min_coverage=KEYWORD_MIN_COVERAGE, min_length=KEYWORD_MIN_LENGTH,
+                 fuzzy_min=KEYWORD_FUZZY_MIN, fuzzy_shared=KEYWORD_FUZZY_SHARED):
+        self.min_coverage = min_coverage
+        self.min_length = min_length
+        self.fuzzy_min = fuzzy_min
+        self.fuzzy_shared = fuzzy_shared
+        self._keys = {}
+        for keyword in keywords:
+            self._keys.setdefault(normalize_keyword(keyword), keyword)
+
+        # 單字等過短的關鍵字不放進句中比對，只能整句命中
+        self._automaton = KeywordAutomaton({norm: keyword for norm, keyword in self._keys.items()
+                                            if len(norm) >= min_length})
+        self._postings = {}
+        self._gram_counts = {}
+        for norm in self._keys:
+            grams = _grams(norm)
+            self._gram_counts[norm] = len(grams)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(norm)
+
+        self._lock = threading.Lock()
+        self.counters = {"lookups": 0, "exact": 0, "substring": 0, "fuzzy": 0, "misses": 0}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def lookup(self, text, limit=5):
+        query = normalize_keyword(text)
+        if query not in self._keys:
+            query = strip_leading_phrases(query)
+        if not query:
+            return []
+        if query in self._keys:
+            return [(self._keys[query], 1.0, "exact")]
+
+        candidates = {}
+        content = [ch for ch in query if ch not in FILLER_CHARS]
+        if len(content) == 1 and content[0] in self._keys:
+            # 單字關鍵字不進句中比對，但其餘都是數量、大小等修飾字時仍算命中
+            candidates[self._keys[content[0]]] = (0.5 + 0.49 / len(query), "substring")
+        for start, norm, keyword in self._automaton.iter_matches(query):
+            coverage = len(norm) / len(query)
+            if coverage >= self.min_coverage:
+                # 句中命中：0.5～0.99，越長的關鍵字分數越高
+                candidates[keyword] = max(candidates.get(keyword, (0.0, "")), (0.5 + 0.49 * coverage, "substring"))
+
+        grams = _grams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        for norm, overlap in shared.items():
+            dice = 2 * overlap / (len(grams) + self._gram_counts[norm])
+            if overlap >= self.fuzzy_shared and dice >= self.fuzzy_min:
+                keyword = self._keys[norm]
+                # 近似：0～0.9，低於同等涵蓋率的句中命中
+                candidates[keyword] = max(candidates.get(keyword, (0.0, "")), (0.9 * dice, "fuzzy"))
+
+        ranked = sorted(((kw, round(score, 4), kind) for kw, (score, kind) in candidates.items()),
+                        key=lambda item: (-item[1], -len(item[0]), item[0]))
+        return ranked[:limit]
+
+    def best(self, text):
+        """回傳最佳的關鍵字（或 None），並累計命中方式"""
+        ranked = self.lookup(text, limit=1)
+        kind = ranked[0][2] if ranked else "misses"
+        with self._lock:
+            self.counters["lookups"] += 1
+            self.counters[kind] += 1
+        return ranked[0][0] if ranked else None
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        hits = counters["lookups"] - counters["misses"]
+        return {"keywords": len(self), **counters,
+                "absorbed_ratio": round(hits / counters["lookups"], 4) if counters["lookups"] else 0.0}
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_keyword_index():
+    """
+    以 dream_parser.dream_links 建立的共用索引。
+    dream_links 為 DreamSnapshot 時依其 version 判斷內容是否變更（含其他行程寫入的增量），變更後重建。
+    """
+    global _index, _index_version
+    from dream_parser import dream_links
+    version = getattr(dream_links, "version", None)
+    if _index is None or version != _index_version:
+        with _index_lock:
+            if _index is None or version != _index_version:
+                index = KeywordIndex(dream_links)
+                if _index is not None:
+                    index.counters = dict(_index.counters)   # 重建後沿用累計的命中次數
+                _index, _index_version = index, version
+    return _index
+
+
+def absorption_report(keywords, index=None):
+    """對一批查詢估算：有多少可由 dream_links 直接回答（不必呼叫 Gemini）"""
+    index = index or get_keyword_index()
+    kinds = Counter()
+    for keyword in keywords:
+        ranked = index.lookup(keyword, limit=1)
+        kinds[ranked[0][2] if ranked else "misses"] += 1
+    total = sum(kinds.values())
+    return {"queries": total, **kinds, "absorbed_ratio": round((total - kinds["misses"]) / total, 4) if total else 0.0}
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    from history_store import HISTORY_DB_PATH
+
+    if sys.argv[1:2] != ["report"]:
+        print("用法：python keyword_index.py report [dream_history.db]")
+        sys.exit(1)
+
+    path = sys.argv[2] if len(sys.argv) > 2 else HISTORY_DB_PATH
+    with sqlite3.connect(path) as conn:
+        history = [row[0] for row in conn.execute("SELECT keyword FROM dream_history WHERE keyword IS NOT NULL")]
+    print(json.dumps(absorption_report(history), ensure_ascii=False, indent=2))
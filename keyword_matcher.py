@@ -0,0 +1,109 @@
+# keyword_matcher.py
+import re
+from collections import deque
+
+
+class KeywordAutomaton:
+    """
+    Aho–Corasick 多關鍵字比對器：建立一次後，
+    只需掃描文字一遍即可找出所有（可重疊的）關鍵字出現位置。
+    停在根狀態時，以正規表示式（C 實作）直接跳到下一個可能的關鍵字首字，
+    略過大段無關文字，避免逐字跑 Python 迴圈。
+
+    patterns 為 {關鍵字: 附帶資料}，比對結果會一併回傳附帶資料。
+    """
+
+    __slots__ = ("_goto", "_fail", "_out", "_patterns", "_payloads", "_skip")
+
+    def __init__(self, patterns):
+        self._goto = [{}]   # 每個狀態的轉移表
+        self._fail = [0]    # 失敗連結
+        self._out = [()]    # 在此狀態結束的關鍵字編號（含失敗連結上的）
+        self._patterns = []
+        self._payloads = []
+
+        for pattern, payload in dict(patterns).items():
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] = self._out[state] + (len(self._patterns),)
+            self._patterns.append(pattern)
+            self._payloads.append(payload)
+
+        self._build_failure_links()
+        first_chars = "".join(re.escape(ch) for ch in self._goto[0])
+        self._skip = re.compile(f"[{first_chars}]") if first_chars else None
+
+    def _build_failure_links(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                if state == 0:
+                    fail[nxt] = 0
+                else:
+                    f = fail[state]
+                    while f and ch not in goto[f]:
+                        f = fail[f]
+                    fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def iter_matches(self, text):
+        """逐一產生 (起始位置, 關鍵字, 附帶資料)"""
+        if self._skip is None:
+            return
+        goto, fail, out = self._goto, self._fail, self._out
+        patterns, payloads = self._patterns, self._payloads
+        search = self._skip.search
+        state, i, n = 0, 0, len(text)
+        while i < n:
+            if state == 0:
+                m = search(text, i)
+                if m is None:
+                    return
+                i = m.start()
+            ch = text[i]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pid in out[state]:
+                pattern = patterns[pid]
+                yield i - len(pattern) + 1, pattern, payloads[pid]
+            i += 1
+
+    def find_all(self, text):
+        return list(self.iter_matches(text))
+
+    def longest_matches(self, text):
+        """
+        由左而右取不重疊、且在同一起點取最長的關鍵字，
+        回傳 [(起始位置, 關鍵字, 附帶資料)]。
+        """
+        best = {}
+        for start, pattern, payload in self.iter_matches(text):
+            current = best.get(start)
+            if current is None or len(pattern) > len(current[0]):
+                best[start] = (pattern, payload)
+
+        result, cursor = [], 0
+        for start in sorted(best):
+            if start < cursor:
+                continue
+            pattern, payload = best[start]
+            result.append((start, pattern, payload))
+            cursor = start + len(pattern)
+        return result
@@ -0,0 +1,38 @@
+# lazy_import.py
+import importlib
+import threading
+import time
+
+# ✅ 延遲載入模組的實際載入耗時（秒），供 /stats/startup 與 startup_profile.py 查看
+IMPORT_TIMINGS = {}
+
+
+class LazyModule:
+    """
+    第一次呼叫時才 import 模組（並執行一次 init），之後直接回傳同一個模組物件。
+    用法：genai = LazyModule("google.generativeai", init=...)；genai().GenerativeModel(...)
+    """
+
+    def __init__(self, name, init=None):
+        self.name = name
+        self._init = init
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __call__(self):
+        module = self._module
+        if module is not None:
+            return module
+        with self._lock:
+            if self._module is None:
+                started = time.perf_counter()
+                module = importlib.import_module(self.name)
+                if self._init is not None:
+                    self._init(module)
+                IMPORT_TIMINGS[self.name] = round(time.perf_counter() - started, 4)
+                self._module = module
+        return self._module
@@ -0,0 +1,76 @@
+# line_replies.py
+# 組出 LINE 回覆訊息（bot_app.py 與 async_app.py 共用）
+import os
+
+from linebot.v3.messaging import TextMessage, ImageMessage
+
+from card_assets import get_card_assets
+
+# LINE Messaging API 位址（壓測時可指向 fake_services.py 的假 LINE 伺服器）
+LINE_API_HOST = os.getenv("LINE_API_HOST", "https://api.line.me")
+CARD_IMAGE_BASE_URL = "https://dream-oracle.onrender.com/Cards"
+QUIT_COMMANDS = ("q", "quit", "exit")
+LINE_MAX_REPLY_MESSAGES = 5  # LINE 每次回覆最多 5 則訊息
+LINE_MAX_TEXT_LENGTH = 4900
+
+
+def goodbye_messages():
+    return [TextMessage(text="👋 感謝使用 Dream Oracle，再會～")]
+
+
+def rate_limited_messages():
+    return [TextMessage(text="🌙 你的夢境來得有點快，讓 Dream Oracle 喘口氣，稍等一下再輸入下一個關鍵字吧～")]
+
+
+def busy_messages():
+    return [TextMessage(text="🌙 目前解夢的人有點多，請過一會兒再試一次，謝謝你的耐心～")]
+
+
+def acknowledgement_messages(keyword):
+    """兩段式回覆的第一段：完整結果稍後以 push 送出"""
+    return [TextMessage(text=f"🔮 正在為你解讀「{keyword}」的夢境，結果馬上送到，請稍候～")]
+
+
+def result_text(keyword, result):
+    return (
+        f"🔍 解夢關鍵字：{keyword}\n"
+        f"🧠 解夢結果：\n{result['dream_text']}\n\n"
+        f"🌝 情緒判定：{result['emotion']}\n"
+        f"🃏 命定卡牌：「{result['title']}」\n"
+        f"👉 {result['message']}"
+    )
+
+
+def card_image_message(result):
+    """有 manifest（build_card_previews.py）時使用含雜湊的原圖與預覽圖網址，否則兩者都用 Cards/ 原圖"""
+    urls = get_card_assets().urls(result["image"])
+    if urls is None:
+        image_url = f"{CARD_IMAGE_BASE_URL}/{result['image']}"
+        urls = (image_url, image_url)
+    original_url, preview_url = urls
+    return ImageMessage(original_content_url=original_url, preview_image_url=preview_url)
+
+
+def dream_reply_messages(keyword, result):
+    reply_text = result_text(keyword, result)
+    messages = [TextMessage(text=reply_text[i:i + LINE_MAX_TEXT_LENGTH])
+                for i in range(0, len(reply_text), LINE_MAX_TEXT_LENGTH)]
+
+    if result.get("image"):
+        messages.append(card_image_message(result))
+
+    messages.append(TextMessage(text="請再輸入下一個夢境關鍵字吧，我們會為你持續指導\n🌟 Dream Oracle 與你一起探索夢境與情緒 🌙"))
+    return messages
+
+
+def multi_dream_reply_messages(keywords, results):
+    """每個關鍵字一則文字訊息，還有名額時才附上卡牌圖片"""
+    messages = [TextMessage(text=result_text(keyword, result)[:LINE_MAX_TEXT_LENGTH])
+                for keyword, result in zip(keywords, results)]
+
+    for result in results:
+        if len(messages) >= LINE_MAX_REPLY_MESSAGES:
+            break
+        if result.get("image"):
+            messages.append(card_image_message(result))
+    return messages
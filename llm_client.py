@@ -0,0 +1,293 @@
+# llm_client.py
+import asyncio
+import os
+import random
+import threading
+import time
+
+from lazy_import import LazyModule
+from metrics import Histogram
+
+# ✅ Gemini 呼叫設定
+#   GEMINI_MODEL        ：模型名稱
+#   LLM_TIMEOUT         ：單次請求（含重試）總期限，秒
+#   LLM_RETRIES         ：可重試錯誤的最多重試次數
+#   LLM_BACKOFF_BASE / LLM_BACKOFF_MAX：指數退避的起始與上限秒數（加上隨機抖動）
+#   LLM_MAX_CONCURRENCY ：同時進行中的請求上限
+#   LLM_ACQUIRE_TIMEOUT ：等待併發名額的最長秒數，逾時直接放棄
+#   GEMINI_FAKE=1       ：改用本機假模型（開發、測試、壓測用，不會呼叫 Gemini）
+#   GEMINI_API_ENDPOINT ：改連其他 Gemini API 位址並使用 REST 傳輸
+#                         （例如壓測時指向 fake_services.py 的 http://127.0.0.1:9101）
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "15"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "4"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_ACQUIRE_TIMEOUT = float(os.getenv("LLM_ACQUIRE_TIMEOUT", "5"))
+GEMINI_FAKE = os.getenv("GEMINI_FAKE", "0") == "1"
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+# ✅ Gemini SDK 延遲載入：第一次呼叫時才 import 並設定 API 金鑰（與 GEMINI_API_ENDPOINT）
+def _configure_genai(module):
+    options = {"api_key": os.getenv("GEMINI_API_KEY")}
+    if GEMINI_API_ENDPOINT:
+        options.update(transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+    module.configure(**options)
+
+
+genai = LazyModule("google.generativeai", init=_configure_genai)
+
+# 可重試的錯誤（google.api_core.exceptions 的類別名稱與 HTTP 狀態碼）
+RETRYABLE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+    "TimeoutError", "ConnectionError", "ReadTimeout", "ConnectTimeout",
+}
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """LLM 呼叫失敗（已用完重試或不可重試）"""
+
+
+class LLMTimeout(LLMError):
+    """超過呼叫期限"""
+
+
+class LLMBusy(LLMError):
+    """併發名額已滿，等待逾時"""
+
+
+def is_retryable(error):
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and code in RETRYABLE_CODES
+
+
+def _is_timeout(error):
+    name = type(error).__name__
+    return "Timeout" in name or name == "DeadlineExceeded"
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """
+    本機假模型：模擬延遲與錯誤，介面與 GenerativeModel.generate_content 相同。
+    responder(prompt) 可自訂回應內容。
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, responder=None, error_factory=TimeoutError):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.responder = responder or (lambda prompt: f"這是關於「{str(prompt)[-20:]}」的夢境解析，代表你內心渴望平靜與快樂。")
+        self.error_factory = error_factory
+        self.calls = 0
+
+    def generate_content(self, prompt, request_options=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise self.error_factory("fake model error")
+        return FakeResponse(self.responder(prompt))
+
+    async def generate_content_async(self, prompt, request_options=None):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise self.error_factory("fake model error")
+        return FakeResponse(self.responder(prompt))
+
+
+class LLMClient:
+    """
+    共用的 Gemini 用戶端：
+    - 模型物件只建立一次並重複使用
+    - 每次呼叫有總期限（含重試），單次請求的 timeout 取剩餘時間
+    - 可重試錯誤以「指數退避 + 隨機抖動」重試
+    - 以 semaphore 限制同時進行中的請求數（generate 與 agenerate 各自計算）
+    - 記錄延遲分佈與各種計數
+    """
+
+    def __init__(self, model=None, model_name=GEMINI_MODEL, timeout=LLM_TIMEOUT, retries=LLM_RETRIES,
+                 backoff_base=LLM_BACKOFF_BASE, backoff_max=LLM_BACKOFF_MAX,
+                 max_concurrency=LLM_MAX_CONCURRENCY, acquire_timeout=LLM_ACQUIRE_TIMEOUT,
+                 sleep=time.sleep):
+        self._model = model
+        self.model_name = model_name
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.acquire_timeout = acquire_timeout
+        self._sleep = sleep
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._async_semaphore = None  # 第一次 agenerate 時在事件迴圈中建立
+        self.max_concurrency = max(1, max_concurrency)
+        self._lock = threading.Lock()
+
+        self.latency = Histogram()          # 成功呼叫的總耗時（含重試）
+        self.attempt_latency = Histogram()  # 每次實際送出請求的耗時
+        self.counters = {"calls": 0, "success": 0, "failures": 0, "retries": 0, "timeouts": 0, "busy": 0}
+        self.in_flight = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = genai().GenerativeModel(self.model_name)
+        return self._model
+
+    def _incr(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, delay)  # full jitter
+
+    def generate(self, prompt, timeout=None):
+        """送出 prompt 並回傳去除頭尾空白的文字；失敗時丟出 LLMError"""
+        self._incr("calls")
+        started = time.monotonic()
+        deadline = started + (timeout or self.timeout)
+
+        if not self._semaphore.acquire(timeout=min(self.acquire_timeout, max(0.0, deadline - started))):
+            self._incr("busy")
+            self._incr("failures")
+            raise LLMBusy("Gemini 同時請求數已達上限")
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._incr("timeouts")
+                    raise LLMTimeout("Gemini 呼叫逾時")
+
+                attempt_started = time.monotonic()
+                try:
+                    response = self.model.generate_content(prompt, request_options={"timeout": remaining})
+                    text = (response.text or "").strip()
+                except Exception as e:
+                    self.attempt_latency.observe(time.monotonic() - attempt_started)
+                    attempt += 1
+                    self._sleep(self._retry_delay(e, attempt, deadline))
+                    continue
+
+                self.attempt_latency.observe(time.monotonic() - attempt_started)
+                return self._finish(text, started)
+        except LLMError:
+            self._incr("failures")
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+    async def agenerate(self, prompt, timeout=None):
+        """generate 的 asyncio 版本（generate_content_async）：等待期間不佔用執行緒"""
+        self._incr("calls")
+        started = time.monotonic()
+        deadline = started + (timeout or self.timeout)
+
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._async_semaphore.acquire(),
+                                   min(self.acquire_timeout, max(0.0, deadline - started)))
+        except asyncio.TimeoutError:
+            self._incr("busy")
+            self._incr("failures")
+            raise LLMBusy("Gemini 同時請求數已達上限") from None
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._incr("timeouts")
+                    raise LLMTimeout("Gemini 呼叫逾時")
+
+                attempt_started = time.monotonic()
+                try:
+                    response = await asyncio.wait_for(
+                        self.model.generate_content_async(prompt, request_options={"timeout": remaining}),
+                        remaining,
+                    )
+                    text = (response.text or "").strip()
+                except Exception as e:
+                    self.attempt_latency.observe(time.monotonic() - attempt_started)
+                    attempt += 1
+                    await asyncio.sleep(self._retry_delay(e, attempt, deadline))
+                    continue
+
+                self.attempt_latency.observe(time.monotonic() - attempt_started)
+                return self._finish(text, started)
+        except LLMError:
+            self._incr("failures")
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._async_semaphore.release()
+
+    def _retry_delay(self, error, attempt, deadline):
+        """第 attempt 次失敗後要等待幾秒再重試；不該再重試時丟出 LLMError"""
+        if attempt > self.retries or not is_retryable(error):
+            if _is_timeout(error):
+                self._incr("timeouts")
+            raise LLMError(f"{type(error).__name__}: {error}") from error
+        delay = self._backoff(attempt - 1)
+        if time.monotonic() + delay >= deadline:
+            self._incr("timeouts")
+            raise LLMTimeout(f"Gemini 重試前已超過期限：{error}") from error
+        self._incr("retries")
+        print(f"[LLM] 第 {attempt} 次重試（{type(error).__name__}），等待 {delay:.2f} 秒")
+        return delay
+
+    def _finish(self, text, started):
+        if not text:
+            raise LLMError("Gemini 回傳空白內容")
+        self.latency.observe(time.monotonic() - started)
+        self._incr("success")
+        return text
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            in_flight = self.in_flight
+        return {
+            "model": self.model_name,
+            "in_flight": in_flight,
+            **counters,
+            "latency": self.latency.snapshot(),
+            "attempt_latency": self.attempt_latency.snapshot(),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """取得行程共用的 LLMClient（GEMINI_FAKE=1 時使用假模型）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                model = FakeModel(latency=float(os.getenv("GEMINI_FAKE_LATENCY", "0"))) if GEMINI_FAKE else None
+                _client = LLMClient(model=model)
+    return _client
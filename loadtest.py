@@ -0,0 +1,243 @@
+# loadtest.py
+# 對 webhook 送出簽章正確的 LINE 訊息事件，量測吞吐量與延遲分佈，可同時比較多個服務
+#
+# 用法（先啟動 fake_services.py，讓 bot_app 的 Gemini 與 LINE 呼叫都打到本機假服務）：
+#   python fake_services.py --gemini-latency 0.8 --line-latency 0.05
+#   同步版：GEMINI_API_ENDPOINT=http://127.0.0.1:9101 LINE_API_HOST=http://127.0.0.1:9102 gunicorn bot_app:app -w 2 -b :8000
+#   async ：ASYNC_WEBHOOK_WAIT=1 uvicorn async_app:app --port 8001（同樣的環境變數）
+#   python loadtest.py http://localhost:8000/callback http://localhost:8001/callback -n 500 -c 100 --line-fake http://127.0.0.1:9102
+#
+# 負載模式：
+#   -c N       ：固定併發（closed loop），N 個連線送完一個才送下一個
+#   --rate R   ：固定速率（open loop），每秒 R 個請求，延遲由預定送出時間起算（-c 為同時進行中的上限）
+# 查詢內容：
+#   --keywords "蛇:5,掉牙:2,飛翔"      ：依權重隨機抽樣（未標權重為 1）
+#   --replay [dream_history.db]       ：依序重播歷史查詢的關鍵字與使用者
+# 指定 --line-fake 時另外統計「送出 webhook → 假 LINE 收到回覆」的端到端延遲
+# （WEBHOOK_MODE=async 時 /callback 立即回 200，只有端到端延遲反映真正的處理時間）。
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import sqlite3
+import time
+import uuid
+
+import httpx
+
+DEFAULT_KEYWORDS = ["蛇", "掉牙", "飛翔", "考試", "下雨", "迷路", "結婚", "火災", "貓", "海邊"]
+
+
+def make_payload(keyword, user_id, reply_token=None):
+    """組出與 LINE 平台相同格式的文字訊息事件"""
+    return json.dumps({
+        "destination": "Uloadtest",
+        "events": [{
+            "type": "message",
+            "mode": "active",
+            "timestamp": int(time.time() * 1000),
+            "webhookEventId": uuid.uuid4().hex,
+            "deliveryContext": {"isRedelivery": False},
+            "source": {"type": "user", "userId": user_id},
+            "replyToken": reply_token or uuid.uuid4().hex,
+            "message": {"type": "text", "id": str(random.randrange(10 ** 15)), "quoteToken": uuid.uuid4().hex,
+                        "text": keyword},
+        }],
+    }, ensure_ascii=False)
+
+
+def sign(body, secret):
+    digest = hmac.new(secret.encode("utf-8"), body.encode("utf-8"), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def latency_summary(latencies):
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+    }
+
+
+# === ✅ 查詢內容 ===
+def parse_keywords(spec):
+    """「蛇:5,掉牙:2,飛翔」→ ([關鍵字], [權重])"""
+    keywords, weights = [], []
+    for item in spec.split(","):
+        keyword, _, weight = item.strip().partition(":")
+        if keyword:
+            keywords.append(keyword)
+            weights.append(float(weight) if weight else 1.0)
+    return keywords, weights
+
+
+def weighted_requests(total, keywords, weights, users, seed=None):
+    rng = random.Random(seed)
+    return [(rng.choices(keywords, weights)[0], f"Uloadtest{rng.randrange(users):04d}") for _ in range(total)]
+
+
+def replay_requests(path, total=None):
+    """dream_history 的 (關鍵字, 使用者) 依時間順序；total 超過筆數時從頭循環"""
+    with sqlite3.connect(path) as conn:
+        rows = [(keyword, user_id or "anonymous") for keyword, user_id in conn.execute(
+            "SELECT keyword, user_id FROM dream_history WHERE keyword IS NOT NULL ORDER BY id"
+        )]
+    if not rows:
+        raise ValueError(f"{path} 沒有可重播的查詢")
+    total = total or len(rows)
+    # LINE 的 userId 為 U 開頭；歷史中的 anonymous 等值加上前綴避免被當成其他來源
+    return [(keyword, user_id if user_id.startswith("U") else f"Ureplay-{user_id}")
+            for keyword, user_id in (rows[i % len(rows)] for i in range(total))]
+
+
+# === ✅ 送出請求 ===
+async def run(url, requests, concurrency, secret, timeout, rate=None):
+    """
+    requests 為 [(關鍵字, 使用者)]。回傳吞吐量、HTTP 延遲與每個 replyToken 的送出時間（供端到端延遲計算）。
+    """
+    latencies, statuses, sent_at = [], {}, {}
+
+    async def send(client, i, scheduled):
+        keyword, user_id = requests[i]
+        reply_token = uuid.uuid4().hex
+        body = make_payload(keyword, user_id, reply_token)
+        headers = {"Content-Type": "application/json", "X-Line-Signature": sign(body, secret)}
+        sent_at[reply_token] = time.time() - (time.perf_counter() - scheduled)
+        try:
+            resp = await client.post(url, content=body.encode("utf-8"), headers=headers)
+            status = resp.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latencies.append(time.perf_counter() - scheduled)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        if rate:
+            # open loop：依預定時間送出，不因服務變慢而放慢（避免 coordinated omission）
+            slots = asyncio.Semaphore(concurrency)
+
+            async def scheduled_send(i, scheduled):
+                async with slots:
+                    await send(client, i, scheduled)
+
+            tasks = []
+            for i in range(len(requests)):
+                scheduled = started + i / rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(scheduled_send(i, scheduled)))
+            await asyncio.gather(*tasks)
+        else:
+            queue = asyncio.Queue()
+            for i in range(len(requests)):
+                queue.put_nowait(i)
+
+            async def worker():
+                while True:
+                    try:
+                        i = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await send(client, i, time.perf_counter())
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "url": url,
+        "requests": len(requests),
+        "mode": f"rate={rate}/s" if rate else f"concurrency={concurrency}",
+        "concurrency": concurrency,
+        "elapsed": round(elapsed, 3),
+        "rps": round(len(requests) / elapsed, 1),
+        "statuses": statuses,
+        **latency_summary(latencies),
+    }, sent_at
+
+
+async def end_to_end(line_fake, sent_at, drain, timeout):
+    """等假 LINE 收齊回覆（最多 drain 秒），以 replyToken 對應計算端到端延遲"""
+    deadline = time.monotonic() + drain
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        while True:
+            replies = (await client.get(f"{line_fake}/_fake/replies")).json()
+            received = {token: replies[token] for token in sent_at if token in replies}
+            if len(received) == len(sent_at) or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.2)
+    latencies = [received[token] - sent_at[token] for token in received]
+    return {"replied": len(received), "missing": len(sent_at) - len(received), **latency_summary(latencies)}
+
+
+def print_report(results):
+    print(f"{'服務':<36}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  狀態碼")
+    for r in results:
+        print(f"{r['url']:<36}{r['rps']:>8}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}  {r['statuses']}")
+        e2e = r.get("end_to_end")
+        if e2e:
+            print(f"{'  └ 端到端（LINE 收到回覆）':<33}{'':>8}{e2e['p50_ms']:>10}{e2e['p95_ms']:>10}{e2e['p99_ms']:>10}"
+                  f"{e2e['max_ms']:>10}  回覆 {e2e['replied']}、未回覆 {e2e['missing']}")
+    if len(results) > 1:
+        base = results[0]
+        for r in results[1:]:
+            p95 = f"{base['p95_ms'] / r['p95_ms']:.1f}x" if r["p95_ms"] else "-"
+            print(f"\n⚡ {r['url']} 相對 {base['url']}：吞吐量 {r['rps'] / base['rps']:.1f}x，p95 {p95}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Dream Oracle webhook 壓測")
+    ap.add_argument("urls", nargs="+", help="webhook 網址（可多個，依序各跑一輪）")
+    ap.add_argument("-n", "--requests", type=int, default=200, help="每輪請求數（--replay 時 0 表示全部重播）")
+    ap.add_argument("-c", "--concurrency", type=int, default=50)
+    ap.add_argument("--rate", type=float, help="固定每秒請求數（open loop）")
+    ap.add_argument("--users", type=int, default=100, help="模擬的使用者數")
+    ap.add_argument("--keywords", default=",".join(DEFAULT_KEYWORDS), help="關鍵字:權重，以逗號分隔")
+    ap.add_argument("--replay", nargs="?", const="", metavar="DB", help="重播 dream_history.db（預設 HISTORY_DB_PATH）")
+    ap.add_argument("--seed", type=int, help="關鍵字抽樣的亂數種子")
+    ap.add_argument("--secret", default=os.getenv("LINE_CHANNEL_SECRET", ""), help="預設讀取 LINE_CHANNEL_SECRET")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--line-fake", help="fake_services.py 的假 LINE 位址，用來計算端到端延遲")
+    ap.add_argument("--drain", type=float, default=30.0, help="送完後最多再等幾秒讓回覆送達假 LINE")
+    ap.add_argument("--json", action="store_true", help="以 JSON 輸出結果")
+    args = ap.parse_args()
+
+    if not args.secret:
+        ap.error("請以 --secret 或 LINE_CHANNEL_SECRET 提供簽章用的 channel secret")
+
+    if args.replay is not None:
+        from history_store import HISTORY_DB_PATH
+        requests = replay_requests(args.replay or HISTORY_DB_PATH, args.requests)
+    else:
+        keywords, weights = parse_keywords(args.keywords)
+        requests = weighted_requests(args.requests, keywords, weights, args.users, args.seed)
+
+    results = []
+    for url in args.urls:
+        result, sent_at = asyncio.run(run(url, requests, args.concurrency, args.secret, args.timeout, args.rate))
+        if args.line_fake:
+            result["end_to_end"] = asyncio.run(end_to_end(args.line_fake.rstrip("/"), sent_at, args.drain, args.timeout))
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# metrics.py
+# 延遲分桶統計、Prometheus 文字格式的指標登錄表、各階段計時與慢請求追蹤
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ✅ 預設延遲分桶（單位：秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """
+    固定分桶的延遲統計（執行緒安全），記錄次數、總和、最大值，
+    並可由分桶估算 p50 / p95 / p99。
+    """
+
+    __slots__ = ("buckets", "counts", "count", "total", "max", "_lock")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後一格為 +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """以分桶上界估算分位數（落在 +Inf 時回傳觀測到的最大值）"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = q * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                seen += n
+                if seen >= target:
+                    return self.buckets[i] if i < len(self.buckets) else self.max
+            return self.max
+
+    def snapshot(self):
+        with self._lock:
+            count, total, maximum = self.count, self.total, self.max
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "avg": round(total / count, 6) if count else 0.0,
+            "max": round(maximum, 6),
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+    def cumulative(self):
+        """回傳 (分桶上界, 累計次數, 總次數, 總和)，供 Prometheus 格式輸出"""
+        with self._lock:
+            counts, count, total = list(self.counts), self.count, self.total
+        running, cumulative = 0, []
+        for n in counts:
+            running += n
+            cumulative.append(running)
+        return self.buckets, cumulative, count, total
+
+
+class Counter:
+    """只增不減的計數器（執行緒安全）"""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+# === ✅ 指標登錄表（Prometheus 文字格式） ===
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    以名稱 + 標籤登錄的指標：
+    - histogram() / counter()：取得（或建立）一個時間序列，熱路徑上直接 observe() / inc()
+    - attach()               ：把既有的 Histogram（例如 LLMClient.attempt_latency）加進輸出
+    - collector(fn)          ：輸出時才呼叫 fn()，把各模組既有的 stats() 轉成
+                               [(名稱, 類型, 說明, {標籤}, 數值)]，不必改動原本的計數方式
+    render() 回傳 Prometheus text exposition format（version 0.0.4）。
+    """
+
+    def __init__(self):
+        self._families = {}   # 名稱 → (類型, 說明, {標籤 tuple: 物件})
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _series(self, name, kind, help, labels, factory):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help, {}))
+            if family[0] != kind:
+                raise ValueError(f"指標 {name} 已登錄為 {family[0]}")
+            series = family[2].get(key)
+            if series is None:
+                series = family[2][key] = factory()
+            return series
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS, /, **labels):
+        return self._series(name, "histogram", help, labels, lambda: Histogram(buckets))
+
+    def counter(self, name, help="", /, **labels):
+        return self._series(name, "counter", help, labels, Counter)
+
+    def attach(self, name, histogram, help="", /, **labels):
+        return self._series(name, "histogram", help, labels, lambda: histogram)
+
+    def collector(self, fn):
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        with self._lock:
+            families = {name: (kind, help, dict(series)) for name, (kind, help, series) in self._families.items()}
+            collectors = list(self._collectors)
+
+        collected = {}
+        for fn in collectors:
+            try:
+                samples = fn()
+            except Exception as e:
+                print(f"[METRICS] 收集失敗：{e}")
+                continue
+            for name, kind, help, labels, value in samples:
+                collected.setdefault(name, (kind, help, []))[2].append((tuple(sorted(labels.items())), value))
+
+        lines = []
+        for name in sorted(families):
+            kind, help, series = families[name]
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in sorted(series.items()):
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+                    continue
+                bounds, cumulative, count, total = metric.cumulative()
+                for bound, n in zip(list(bounds) + [float("inf")], cumulative):
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_value(float(bound))))} {n}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for name in sorted(collected):
+            kind, help, samples = collected[name]
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter_samples(name, help, counters, /, **labels):
+    """把既有 stats 的 counters dict 轉成 collector 樣本（每個鍵一個 event 標籤）"""
+    return [(name, "counter", help, {**labels, "event": key}, value) for key, value in dict(counters).items()]
+
+
+def gauge_sample(name, help, value, /, **labels):
+    return (name, "gauge", help, labels, value)
+
+
+# === ✅ 各階段計時與慢請求追蹤 ===
+# ✅ 追蹤設定
+#   TRACE_SLOW_SECONDS：單一請求超過此秒數時印出一行各階段耗時（0＝停用）
+#   TRACE_HEADER      ：1＝每個回應都附上 Server-Timing；否則只有帶 X-Dream-Trace: 1 的請求才附上
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "0"))
+TRACE_HEADER = os.getenv("TRACE_HEADER", "0") == "1"
+
+STAGE_SECONDS = "dream_stage_seconds"
+# 情緒判定、抽卡等本機階段只需數十微秒，分桶從 0.1 毫秒開始
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025) + DEFAULT_BUCKETS
+STAGE_ERRORS = "dream_stage_errors_total"
+
+_current_trace = contextvars.ContextVar("dream_trace", default=None)
+_stage_series = {}
+
+
+class RequestTrace:
+    """單一請求內各階段的耗時（同名階段累加）"""
+
+    __slots__ = ("name", "started", "stages")
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage_name, seconds):
+        self.stages[stage_name] = self.stages.get(stage_name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing 標頭值（單位：毫秒）"""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def log_line(self):
+        stages = " ".join(f"{name}={seconds:.3f}s" for name, seconds in self.stages.items())
+        return f"[TRACE] {self.name} {self.elapsed():.3f}s {stages}".rstrip()
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def start_trace(name):
+    """開始追蹤目前的請求（已有進行中的追蹤時回傳 None，由外層負責結束）"""
+    if _current_trace.get() is not None:
+        return None
+    trace = RequestTrace(name)
+    return trace, _current_trace.set(trace)
+
+
+def finish_trace(started):
+    """結束 start_trace 開始的追蹤；超過 TRACE_SLOW_SECONDS 時印出各階段耗時"""
+    if started is None:
+        return None
+    trace, token = started
+    _current_trace.reset(token)
+    if TRACE_SLOW_SECONDS > 0 and trace.elapsed() >= TRACE_SLOW_SECONDS:
+        print(trace.log_line())
+    return trace
+
+
+@contextmanager
+def trace_request(name):
+    started = start_trace(name)
+    try:
+        yield current_trace()
+    finally:
+        finish_trace(started)
+
+
+@contextmanager
+def stage(name):
+    """
+    計時一個處理階段：寫入 dream_stage_seconds{stage=...}，例外時累加 dream_stage_errors_total，
+    並記到目前請求的追蹤（若有）。
+    """
+    series = _stage_series.get(name)
+    if series is None:
+        series = _stage_series[name] = (
+            REGISTRY.histogram(STAGE_SECONDS, "各處理階段耗時（秒）", STAGE_BUCKETS, stage=name),
+            REGISTRY.counter(STAGE_ERRORS, "各處理階段丟出例外的次數", stage=name),
+        )
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        series[1].inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        series[0].observe(elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, elapsed)
@@ -0,0 +1,43 @@
+# migrate.py
+# 建立資料表與補欄位／索引
+#   - 預設在每個行程第一次使用連線池時自動執行一次（database.get_pool）
+#   - 有部署步驟可執行時（例如 Procfile 的 release: python migrate.py），
+#     web 行程設定 DB_MIGRATE_ON_STARTUP=0，避免每個 worker 再各跑一次
+import os
+import threading
+
+from database import init_db, upgrade_db_add_user_id
+
+# ✅ DB_MIGRATE_ON_STARTUP：1＝第一次使用連線池時自動遷移（預設），0＝只由 python migrate.py 執行
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "1") == "1"
+
+_lock = threading.RLock()
+# attempted：本行程已嘗試過（成功或失敗）；error：最近一次失敗的原因
+_state = {"done": False, "running": False, "attempted": False, "error": None}
+
+
+def run_migrations():
+    """每個行程只成功執行一次；遷移本身使用連線池時的重入呼叫直接返回；失敗時丟出例外"""
+    if _state["done"]:
+        return
+    with _lock:
+        if _state["done"] or _state["running"]:
+            return
+        _state["running"] = True
+        _state["attempted"] = True
+        try:
+            init_db()
+            upgrade_db_add_user_id()
+            _state["done"], _state["error"] = True, None
+        except Exception as e:
+            _state["error"] = str(e)
+            raise
+        finally:
+            _state["running"] = False
+
+
+if __name__ == "__main__":
+    # 以模組名稱重新匯入，與 database.get_pool 共用同一份「已執行」狀態（__main__ 是另一份模組）
+    import migrate
+    migrate.run_migrations()
+    print("✅ 資料庫遷移完成")
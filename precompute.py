@@ -0,0 +1,202 @@
+# precompute.py
+# 熱門關鍵字的預先生成解夢：離線批次呼叫 Gemini，線上直接取用（零 LLM 呼叫）
+#
+#   python precompute.py build --top 200 --variants 3   依 dream_history / dream_logs 的熱門關鍵字預先生成
+#   python precompute.py report                         以歷史查詢估算預先生成可涵蓋的流量比例
+#
+# 結果存成 dream_snapshot 快照（mmap、多個 worker 共用），
+# 鍵為正規化後的關鍵字，值為 JSON：[{"text": 解夢文字, "emotion": 情緒}, ...]
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dream_snapshot import DreamSnapshot, write_snapshot
+from interpretation_cache import normalize_keyword
+
+# ✅ 預先生成設定
+#   PRECOMPUTED_PATH   ：快照路徑（檔案不存在時線上流程直接略過）
+#   PRECOMPUTED_ENABLED：0＝線上流程不使用預先生成結果
+#   PRECOMPUTED_CHECK_INTERVAL：快照檔不存在時，最多每幾秒再檢查一次（之後才產生的快照也會被載入）
+PRECOMPUTED_PATH = os.getenv("PRECOMPUTED_PATH", "precomputed.snap")
+PRECOMPUTED_ENABLED = os.getenv("PRECOMPUTED_ENABLED", "1") == "1"
+PRECOMPUTED_CHECK_INTERVAL = float(os.getenv("PRECOMPUTED_CHECK_INTERVAL", "30"))
+
+
+class PrecomputedStore:
+    """
+    預先生成結果的唯讀查詢：同一關鍵字輪流回傳不同版本（每個行程各自輪替）。
+    """
+
+    def __init__(self, path=PRECOMPUTED_PATH):
+        self.path = path
+        self._snapshot = DreamSnapshot(path)
+        self._turns = Counter()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def variants(self, keyword):
+        raw = self._snapshot.get(normalize_keyword(keyword))
+        return json.loads(raw) if raw else []
+
+    def pick(self, keyword):
+        """回傳 (解夢文字, 情緒) 或 None"""
+        variants = self.variants(keyword)
+        with self._lock:
+            if not variants:
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+            key = normalize_keyword(keyword)
+            turn = self._turns[key]
+            self._turns[key] = turn + 1
+        variant = variants[turn % len(variants)]
+        return variant["text"], variant.get("emotion")
+
+    def __contains__(self, keyword):
+        return normalize_keyword(keyword) in self._snapshot
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        total = counters["hits"] + counters["misses"]
+        return {"path": self.path, **counters,
+                "coverage": round(counters["hits"] / total, 4) if total else 0.0}
+
+
+_store = None
+_store_lock = threading.Lock()
+_next_check = 0.0
+
+
+def get_precomputed_store():
+    """
+    取得共用的預先生成查詢（未啟用或沒有快照檔時回傳 None）。
+    沒有快照檔時記住結果，PRECOMPUTED_CHECK_INTERVAL 秒內不再檢查檔案。
+    """
+    global _store, _next_check
+    if _store is None and PRECOMPUTED_ENABLED and time.monotonic() >= _next_check:
+        with _store_lock:
+            now = time.monotonic()
+            if _store is None and now >= _next_check:
+                _next_check = now + PRECOMPUTED_CHECK_INTERVAL
+                if os.path.exists(PRECOMPUTED_PATH):
+                    _store = PrecomputedStore(PRECOMPUTED_PATH)
+    return _store
+
+
+# === ✅ 離線批次 ===
+def history_keyword_counts(path=None):
+    """dream_history（SQLite）與 dream_logs（設定 DATABASE_URL 時）的關鍵字次數，依正規化後合併"""
+    from history_store import HISTORY_DB_PATH
+
+    counts, display = Counter(), {}
+
+    def add(keyword, n):
+        norm = normalize_keyword(keyword)
+        if norm:
+            counts[norm] += n
+            display.setdefault(norm, keyword.strip())
+
+    path = path or HISTORY_DB_PATH
+    if os.path.exists(path):
+        with sqlite3.connect(path) as conn:
+            for keyword, n in conn.execute(
+                "SELECT keyword, COUNT(*) FROM dream_history WHERE keyword IS NOT NULL GROUP BY keyword"
+            ):
+                add(keyword, n)
+
+    if os.getenv("DATABASE_URL"):
+        from database import keyword_counts
+        try:
+            for keyword, n in keyword_counts():
+                add(keyword, n)
+        except Exception as e:
+            print(f"⚠️ 讀取 dream_logs 失敗，只使用 dream_history：{e}")
+
+    return counts, display
+
+
+def generate_variants(keyword, variants):
+    """以 Gemini 生成多個版本與對應情緒；失敗的版本略過"""
+    from dream_core import INTERPRETATION_PROMPT
+    from emotion_mapper import map_emotion
+    from llm_client import get_llm_client
+
+    results = []
+    for _ in range(variants):
+        try:
+            text = get_llm_client().generate(INTERPRETATION_PROMPT.format(keyword=keyword))
+        except Exception as e:
+            print(f"⚠️ 「{keyword}」生成失敗：{e}")
+            continue
+        if all(text != r["text"] for r in results):
+            results.append({"text": text, "emotion": map_emotion(text)})
+    return results
+
+
+def build(top=200, variants=3, workers=4, output=PRECOMPUTED_PATH, history=None):
+    counts, display = history_keyword_counts(history)
+    targets = [norm for norm, _ in counts.most_common(top)]
+    print(f"🔮 {len(counts)} 個不同關鍵字，預先生成前 {len(targets)} 個，每個 {variants} 版")
+
+    store = {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(generate_variants, display[norm], variants): norm for norm in targets}
+        for done, future in enumerate(as_completed(futures), 1):
+            norm = futures[future]
+            results = future.result()
+            if results:
+                store[norm] = json.dumps(results, ensure_ascii=False)
+            print(f"[{done}/{len(targets)}] {display[norm]}：{len(results)} 版")
+
+    write_snapshot(store, output)
+    print(f"✅ 已寫入 {output}：{len(store)} 個關鍵字，耗時 {time.perf_counter() - started:.1f} 秒")
+    return store
+
+
+def coverage_report(path=PRECOMPUTED_PATH, history=None):
+    """以歷史查詢估算預先生成結果可直接回答的比例（依查詢次數加權）"""
+    counts, _ = history_keyword_counts(history)
+    covered_keys = set(DreamSnapshot(path)) if os.path.exists(path) else set()
+    total = sum(counts.values())
+    covered = sum(n for norm, n in counts.items() if norm in covered_keys)
+    return {
+        "precomputed_keywords": len(covered_keys),
+        "distinct_keywords": len(counts),
+        "queries": total,
+        "covered_queries": covered,
+        "coverage": round(covered / total, 4) if total else 0.0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="熱門關鍵字預先生成解夢")
+    sub = ap.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="預先生成熱門關鍵字")
+    b.add_argument("--top", type=int, default=200)
+    b.add_argument("--variants", type=int, default=3)
+    b.add_argument("--workers", type=int, default=4)
+    b.add_argument("--output", default=PRECOMPUTED_PATH)
+    b.add_argument("--history", help="dream_history.db 路徑")
+    r = sub.add_parser("report", help="估算可涵蓋的流量比例")
+    r.add_argument("--path", default=PRECOMPUTED_PATH)
+    r.add_argument("--history", help="dream_history.db 路徑")
+    args = ap.parse_args()
+
+    if args.command == "build":
+        build(args.top, args.variants, args.workers, args.output, args.history)
+    else:
+        print(json.dumps(coverage_report(args.path, args.history), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,15 @@
 import random
-import pandas as pd
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from card_deck import DECK
+from llm_client import get_llm_client
 
-# ✅ 載入 .env 檔案取得 GEMINI API KEY
+# ✅ 載入 .env 檔案取得 GEMINI API KEY（由 llm_client 第一次呼叫時設定）
 load_dotenv(dotenv_path=Path(".env"))
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-# ✅ 載入卡牌資料
-CARDS_CSV_PATH = "emotion_cards_full.csv"
-try:
-    card_df = pd.read_csv(CARDS_CSV_PATH)
-except Exception as e:
-    print(f"❌ 無法讀取卡牌資料: {str(e)}")
-    card_df = pd.DataFrame(columns=["emotion", "title", "message", "image"])
-
-# ✅ 預設情緒分類
-DEFAULT_EMOTIONS = card_df["emotion"].unique().tolist() if not card_df.empty else []
+# ✅ 預設情緒分類（來自共用牌組）
+DEFAULT_EMOTIONS = list(DECK.emotions)
 
 def process_dream(user_input: str, user_id: str = None):
     explain_part = "⚠️ 尚未支援此夢境，請稍後再試或由開發者補充資料"
@@ -29,8 +20,7 @@ def process_dream(user_input: str, user_id: str = None):
 
     try:
         # ✅ Gemini 回應
-        gemini_model = genai.GenerativeModel(model_name="gemini-1.5-flash")
-        gemini_response = gemini_model.generate_content([
+        gemini_text = get_llm_client().generate([
             {
                 "role": "user",
                 "parts": [
@@ -39,7 +29,6 @@ def process_dream(user_input: str, user_id: str = None):
             }
         ])
 
-        gemini_text = gemini_response.text.strip()
         gemini_text = gemini_text.encode("utf-8", "ignore").decode("utf-8")
 
         for line in gemini_text.splitlines():
@@ -59,12 +48,11 @@ def process_dream(user_input: str, user_id: str = None):
             emotion_part = random.choice(DEFAULT_EMOTIONS)
 
     # ✅ 從卡牌資料中根據情緒抽一張
-    emotion_cards = card_df[card_df["emotion"] == emotion_part]
-    if not emotion_cards.empty:
-        card = emotion_cards.sample(1).iloc[0]
-        card_title = card.get("title", card_title)
-        card_message = card.get("message", card_message)
-        card_image = card.get("image", card_image)
+    card = DECK.draw(emotion_part)
+    if card is not None:
+        card_title = card.title or card_title
+        card_message = card.message or card_message
+        card_image = card.image or card_image
 
     # ✅ 回傳統一格式，確保不會出現 KeyError
     result = {
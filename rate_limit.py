@@ -0,0 +1,225 @@
+# rate_limit.py
+# 每位使用者與全域的 token bucket 限流，以及依佇列深度 / Gemini 延遲判斷的過載降級（load shedding）
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ✅ 限流設定（RATE_LIMIT_ENABLED=1 時啟用）
+#   RATE_LIMIT_USER_RATE  ：每位使用者每秒補充的次數（0.2 ＝ 每分鐘 12 次）
+#   RATE_LIMIT_USER_BURST ：每位使用者可連續使用的次數
+#   RATE_LIMIT_GROUP_RATE / RATE_LIMIT_GROUP_BURST：同一群組／聊天室所有成員合計（RATE 為 0 表示不限）
+#   RATE_LIMIT_GLOBAL_RATE / RATE_LIMIT_GLOBAL_BURST：全部使用者合計（RATE 為 0 表示不限）
+#   RATE_LIMIT_MAX_USERS  ：最多保留幾位使用者（及幾個群組）的狀態（超過時淘汰最久沒出現的）
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "0") == "1"
+RATE_LIMIT_USER_RATE = float(os.getenv("RATE_LIMIT_USER_RATE", "0.2"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "5"))
+RATE_LIMIT_GROUP_RATE = float(os.getenv("RATE_LIMIT_GROUP_RATE", "0"))
+RATE_LIMIT_GROUP_BURST = float(os.getenv("RATE_LIMIT_GROUP_BURST", "20"))
+RATE_LIMIT_GLOBAL_RATE = float(os.getenv("RATE_LIMIT_GLOBAL_RATE", "0"))
+RATE_LIMIT_GLOBAL_BURST = float(os.getenv("RATE_LIMIT_GLOBAL_BURST", "20"))
+RATE_LIMIT_MAX_USERS = int(os.getenv("RATE_LIMIT_MAX_USERS", "100000"))
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", "60"))
+
+# ✅ 過載降級設定（0 表示不檢查該項）
+#   SHED_QUEUE_DEPTH ：排隊 + 處理中的請求數達到此值即視為過載
+#   SHED_LLM_LATENCY ：最近一段時間 Gemini 單次請求平均秒數達到此值即視為過載
+#   SHED_CHECK_INTERVAL：多久重新計算一次 Gemini 近期延遲
+SHED_QUEUE_DEPTH = int(os.getenv("SHED_QUEUE_DEPTH", "0"))
+SHED_LLM_LATENCY = float(os.getenv("SHED_LLM_LATENCY", "0"))
+SHED_CHECK_INTERVAL = float(os.getenv("SHED_CHECK_INTERVAL", "1.0"))
+
+
+class RateLimiter:
+    """
+    token bucket 限流：每位使用者一個桶（只存 (剩餘次數, 更新時間) 兩個 float），
+    選用的群組／聊天室桶（同一群組的成員合計），另有一個全域桶。
+    - 閒置到補滿的桶與「沒有桶」等價，定期掃除不影響結果
+    - 使用者（群組）數超過 max_users 時淘汰最久沒出現的（dict 依最後使用順序排列）
+    acquire() 通過回傳 None，被限流回傳原因："user"、"group" 或 "global"。
+    """
+
+    def __init__(self, user_rate=RATE_LIMIT_USER_RATE, user_burst=RATE_LIMIT_USER_BURST,
+                 global_rate=RATE_LIMIT_GLOBAL_RATE, global_burst=RATE_LIMIT_GLOBAL_BURST,
+                 max_users=RATE_LIMIT_MAX_USERS, sweep_interval=RATE_LIMIT_SWEEP_INTERVAL, clock=time.monotonic,
+                 group_rate=RATE_LIMIT_GROUP_RATE, group_burst=RATE_LIMIT_GROUP_BURST):
+        if user_rate <= 0:
+            raise ValueError("user_rate 必須大於 0")
+        self.user_rate = user_rate
+        self.user_burst = max(1.0, user_burst)
+        self.group_rate = group_rate
+        self.group_burst = max(1.0, group_burst)
+        self.global_rate = global_rate
+        self.global_burst = max(1.0, global_burst)
+        self.max_users = max(1, max_users)
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._buckets = {}
+        self._groups = {}
+        self._global = (self.global_burst, clock())
+        self._next_sweep = clock() + sweep_interval
+        self._lock = threading.Lock()
+        self.counters = {"allowed": 0, "throttled_user": 0, "throttled_group": 0, "throttled_global": 0, "evicted": 0}
+
+    @staticmethod
+    def _refill(bucket, rate, burst, now):
+        tokens, updated = bucket
+        return min(burst, tokens + (now - updated) * rate)
+
+    def _take(self, buckets, key, rate, burst, now):
+        """取出 key 的桶（之後重新放回時排到最後，維持 LRU 順序），回傳補充後的次數"""
+        bucket = buckets.pop(key, None)
+        return burst if bucket is None else self._refill(bucket, rate, burst, now)
+
+    def acquire(self, key, group=None):
+        """key 為使用者；group 為群組／聊天室 ID（一對一聊天為 None）"""
+        now = self._clock()
+        with self._lock:
+            user_tokens = self._take(self._buckets, key, self.user_rate, self.user_burst, now)
+            if user_tokens < 1:
+                self._buckets[key] = (user_tokens, now)
+                self.counters["throttled_user"] += 1
+                return "user"
+
+            group_tokens = None
+            if group is not None and self.group_rate > 0:
+                group_tokens = self._take(self._groups, group, self.group_rate, self.group_burst, now)
+                if group_tokens < 1:
+                    self._groups[group] = (group_tokens, now)
+                    self._buckets[key] = (user_tokens, now)
+                    self.counters["throttled_group"] += 1
+                    return "group"
+
+            if self.global_rate > 0:
+                global_tokens = self._refill(self._global, self.global_rate, self.global_burst, now)
+                if global_tokens < 1:
+                    self._global = (global_tokens, now)
+                    self._buckets[key] = (user_tokens, now)
+                    if group_tokens is not None:
+                        self._groups[group] = (group_tokens, now)
+                    self.counters["throttled_global"] += 1
+                    return "global"
+                self._global = (global_tokens - 1, now)
+
+            self._buckets[key] = (user_tokens - 1, now)
+            if group_tokens is not None:
+                self._groups[group] = (group_tokens - 1, now)
+            self.counters["allowed"] += 1
+            for buckets in (self._buckets, self._groups):
+                if len(buckets) > self.max_users:
+                    del buckets[next(iter(buckets))]
+                    self.counters["evicted"] += 1
+            if now >= self._next_sweep:
+                self._sweep(now)
+            return None
+
+    def _sweep(self, now):
+        """移除已補滿的桶（呼叫端需持有鎖）"""
+        self._next_sweep = now + self.sweep_interval
+        for buckets, rate, burst in ((self._buckets, self.user_rate, self.user_burst),
+                                     (self._groups, self.group_rate, self.group_burst)):
+            full = [key for key, bucket in buckets.items() if self._refill(bucket, rate, burst, now) >= burst]
+            for key in full:
+                del buckets[key]
+            self.counters["evicted"] += len(full)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buckets)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            users, groups = len(self._buckets), len(self._groups)
+        return {
+            "user_rate": self.user_rate, "user_burst": self.user_burst,
+            "group_rate": self.group_rate, "group_burst": self.group_burst,
+            "global_rate": self.global_rate, "global_burst": self.global_burst,
+            "tracked_users": users, "tracked_groups": groups, **counters,
+        }
+
+
+class LoadShedder:
+    """
+    過載判斷：
+    - 佇列深度：depth()（例如 webhook 佇列長度）加上目前處理中的請求數（以 track() 包住慢速路徑）
+    - 上游延遲：latency 為 metrics.Histogram（例如 LLMClient.attempt_latency），
+      每 check_interval 秒以兩次讀數的差計算這段期間的平均延遲，不受啟動以來的累積值影響
+    overloaded() 回傳 None 或原因："queue_depth" / "llm_latency"。
+    """
+
+    def __init__(self, max_depth=SHED_QUEUE_DEPTH, max_latency=SHED_LLM_LATENCY, depth=None, latency=None,
+                 check_interval=SHED_CHECK_INTERVAL, clock=time.monotonic):
+        self.max_depth = max_depth
+        self.max_latency = max_latency
+        self._depth = depth or (lambda: 0)
+        self._latency = latency
+        self.check_interval = check_interval
+        self._clock = clock
+        self._inflight = 0
+        self._recent_latency = 0.0
+        self._last_reading = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.counters = {"queue_depth": 0, "llm_latency": 0, "shed_local": 0, "shed_busy": 0}
+
+    @property
+    def enabled(self):
+        return self.max_depth > 0 or (self.max_latency > 0 and self._latency is not None)
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self._inflight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    def depth(self):
+        with self._lock:
+            inflight = self._inflight
+        return self._depth() + inflight
+
+    def recent_latency(self):
+        now = self._clock()
+        with self._lock:
+            if self._latency is not None and now >= self._next_check:
+                self._next_check = now + self.check_interval
+                reading = (self._latency.count, self._latency.total)
+                if self._last_reading is not None and reading[0] > self._last_reading[0]:
+                    self._recent_latency = (reading[1] - self._last_reading[1]) / (reading[0] - self._last_reading[0])
+                elif self._last_reading is not None:
+                    self._recent_latency = 0.0  # 這段期間沒有新的呼叫
+                self._last_reading = reading
+            return self._recent_latency
+
+    def overloaded(self):
+        reason = None
+        if self.max_depth > 0 and self.depth() >= self.max_depth:
+            reason = "queue_depth"
+        elif self.max_latency > 0 and self.recent_latency() >= self.max_latency:
+            reason = "llm_latency"
+        if reason is not None:
+            self.incr(reason)
+        return reason
+
+    def incr(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            inflight = self._inflight
+        return {
+            "max_depth": self.max_depth, "max_latency": self.max_latency,
+            "depth": self._depth() + inflight, "inflight": inflight,
+            "recent_llm_latency": round(self._recent_latency, 4), **counters,
+        }
+
+
+def create_default_rate_limiter():
+    """依環境變數建立限流器；RATE_LIMIT_ENABLED 未開啟時回傳 None"""
+    return RateLimiter() if RATE_LIMIT_ENABLED else None
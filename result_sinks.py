@@ -0,0 +1,280 @@
+# result_sinks.py
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from metrics import stage
+
+# ✅ 結果輸出設定
+#   RESULT_SINKS       ：要啟用的輸出，以逗號分隔（csv, sqlite, postgres, jsonl）
+#                        未設定時預設為 csv,sqlite，若有 DATABASE_URL 再加上 postgres
+#   RESULT_JSONL_PATH  ：jsonl 輸出檔路徑
+#   RESULT_QUEUE_SIZE  ：每個佇列的上限，滿了就丟棄並計數（不阻塞回覆）
+#   RESULT_BATCH_SIZE / RESULT_FLUSH_INTERVAL：各輸出獨立的批次大小與最長等待秒數
+RESULT_JSONL_PATH = os.getenv("RESULT_JSONL_PATH", os.path.join("output", "dream_results.jsonl"))
+RESULT_QUEUE_SIZE = int(os.getenv("RESULT_QUEUE_SIZE", "10000"))
+RESULT_BATCH_SIZE = int(os.getenv("RESULT_BATCH_SIZE", "100"))
+RESULT_FLUSH_INTERVAL = float(os.getenv("RESULT_FLUSH_INTERVAL", "1.0"))
+
+TAIWAN_TZ = timezone(timedelta(hours=8))
+
+
+def local_time_text(timestamp):
+    """CSV 與 SQLite 沿用原本的伺服器本地時間（不含時區），Postgres 與 jsonl 才用台灣時間"""
+    return timestamp.astimezone().strftime("%Y-%m-%d %H:%M:%S")
+
+_STOP = object()
+
+
+def make_record(keyword, dream_text, emotion, card, user_id=None):
+    """建立一筆要寫出的解夢結果"""
+    return {
+        "timestamp": datetime.now(TAIWAN_TZ),
+        "user_id": user_id,
+        "keyword": keyword,
+        "dream_text": dream_text,
+        "emotion": emotion,
+        "title": card["title"],
+        "message": card["message"],
+        "image": card.get("image", ""),
+    }
+
+
+# === ✅ 各種輸出 ===
+class ResultSink:
+    """結果輸出的基底類別：子類別實作 write_batch(records)"""
+
+    name = "sink"
+    stage_name = "write_sink"   # metrics 的階段名稱
+
+    def write_batch(self, records):
+        raise NotImplementedError
+
+
+class CSVSink(ResultSink):
+    name = "csv"
+    stage_name = "save_result"
+
+    def __init__(self):
+        from utils import init_db
+        init_db()
+
+    def write_batch(self, records):
+        from utils import save_results
+        save_results([
+            [local_time_text(r["timestamp"]), r["keyword"], r["emotion"],
+             r["title"], r["message"], r["dream_text"]]
+            for r in records
+        ])
+
+
+class SQLiteSink(ResultSink):
+    name = "sqlite"
+    stage_name = "save_to_sqlite"
+
+    def __init__(self):
+        # 先建立寫入器，確保行程結束時管線會在它關閉前寫完
+        from history_store import get_history_store
+        get_history_store()
+
+    def write_batch(self, records):
+        from history_store import get_history_store
+        get_history_store().insert_many([
+            (local_time_text(r["timestamp"]), r["user_id"] or "anonymous", r["keyword"],
+             r["dream_text"], r["emotion"], r["title"], r["message"], r["image"])
+            for r in records
+        ])
+
+
+class PostgresSink(ResultSink):
+    name = "postgres"
+    stage_name = "write_to_postgres"
+
+    def __init__(self):
+        from database import get_pool
+        get_pool()
+
+    def write_batch(self, records):
+        from database import write_many
+        write_many([(r["user_id"], r["keyword"], r["emotion"], r["timestamp"]) for r in records])
+
+
+class JSONLSink(ResultSink):
+    name = "jsonl"
+    stage_name = "write_jsonl"
+
+    def __init__(self, path=RESULT_JSONL_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write_batch(self, records):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for r in records:
+                f.write(json.dumps({**r, "timestamp": r["timestamp"].isoformat()}, ensure_ascii=False) + "\n")
+
+
+SINK_TYPES = {
+    "csv": CSVSink,
+    "sqlite": SQLiteSink,
+    "postgres": PostgresSink,
+    "jsonl": JSONLSink,
+}
+
+
+# === ✅ 每個輸出各自的批次寫入執行緒 ===
+class SinkWorker:
+    def __init__(self, sink, batch_size=100, interval=1.0, maxsize=10000):
+        self.sink = sink
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._lock = threading.Lock()   # 請求執行緒（dropped）與寫入執行緒（其餘）都會更新計數
+        self.counters = {"written": 0, "batches": 0, "errors": 0, "dropped": 0}
+        self._thread = threading.Thread(target=self._loop, name=f"sink-{sink.name}", daemon=True)
+        self._thread.start()
+
+    def offer(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._incr("dropped")
+
+    def _incr(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def _loop(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                with stage(self.sink.stage_name):
+                    self.sink.write_batch(batch)
+                with self._lock:
+                    self.counters["written"] += len(batch)
+                    self.counters["batches"] += 1
+            except Exception as e:
+                # ⚠️ 單一輸出失敗只影響自己，不影響其他輸出與使用者回覆
+                self._incr("errors")
+                print(f"[SINK:{self.sink.name}] 寫入失敗（{len(batch)} 筆）：{e}")
+
+    def close(self, timeout=10.0):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {"pending": self._queue.qsize(), **counters}
+
+
+# === ✅ 非阻塞的扇出管線 ===
+class ResultPipeline:
+    """
+    publish() 只把結果放進輸入佇列就返回；
+    分派執行緒再把每筆結果複製給各個輸出的 SinkWorker。
+    """
+
+    def __init__(self, sinks, batch_size=100, interval=1.0, maxsize=10000):
+        self.workers = [SinkWorker(s, batch_size, interval, maxsize) for s in sinks]
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._dispatch, name="result-dispatcher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def publish(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _dispatch(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                return
+            for worker in self.workers:
+                worker.offer(record)
+
+    def close(self, timeout=10.0):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            for worker in self.workers:
+                worker.close(timeout)
+
+    def stats(self):
+        with self._lock:
+            dropped = self.dropped
+        return {
+            "pending": self._queue.qsize(),
+            "dropped": dropped,
+            "sinks": {w.sink.name: w.stats() for w in self.workers},
+        }
+
+
+def configured_sink_names():
+    names = os.getenv("RESULT_SINKS")
+    if names is None:
+        names = "csv,sqlite,postgres" if os.getenv("DATABASE_URL") else "csv,sqlite"
+    return [n.strip().lower() for n in names.split(",") if n.strip()]
+
+
+def build_sinks(names):
+    sinks = []
+    for name in names:
+        if name not in SINK_TYPES:
+            print(f"[WARNING] 未知的結果輸出：{name}，略過")
+            continue
+        try:
+            sinks.append(SINK_TYPES[name]())
+        except Exception as e:
+            print(f"[WARNING] 無法建立結果輸出 {name}：{e}")
+    return sinks
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = ResultPipeline(
+                    build_sinks(configured_sink_names()),
+                    batch_size=RESULT_BATCH_SIZE,
+                    interval=RESULT_FLUSH_INTERVAL,
+                    maxsize=RESULT_QUEUE_SIZE,
+                )
+    return _pipeline
+
+
+def publish_result(keyword, dream_text, emotion, card, user_id=None):
+    """把一筆解夢結果交給背景輸出（立即返回）"""
+    get_pipeline().publish(make_record(keyword, dream_text, emotion, card, user_id))
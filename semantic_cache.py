@@ -0,0 +1,209 @@
+# semantic_cache.py
+# 近似句解夢快取：把關鍵字轉成字元 n-gram 雜湊向量，以餘弦相似度找出「換句話說」的查詢
+# （例如「被蛇咬」與「蛇咬我」），命中時直接沿用先前的解夢結果。純 CPU、不需模型。
+import os
+import threading
+import time
+import zlib
+
+from interpretation_cache import normalize_keyword
+from keyword_index import strip_leading_phrases
+from lazy_import import LazyModule
+
+# 預設停用時不載入 numpy（約 70 ms）；建立 SemanticCache 時才載入
+numpy = LazyModule("numpy")
+
+# ✅ 近似快取設定（預設停用，設定 SEMANTIC_CACHE_SIZE 後啟用）
+#   SEMANTIC_CACHE_SIZE     ：最多保留幾筆（0＝停用；未安裝 numpy 時也會停用）
+#   SEMANTIC_CACHE_THRESHOLD：命中所需的最低餘弦相似度
+#   SEMANTIC_CACHE_DIM      ：向量維度（雜湊桶數）
+#   SEMANTIC_CACHE_TTL      ：每筆保留秒數
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "0"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+
+# 不帶語意的常見字：不計入單字特徵（仍保留在 bigram 中，維持語序資訊）
+STOP_CHARS = set("夢見到我你他她它被了的在一個很有是和跟著把給又也都就好啊呢嗎吧")
+UNIGRAM_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+# 否定字：兩句出現的否定字不同時一律不算命中（「不想結婚」≠「想結婚」）
+NEGATION_CHARS = set("不沒未別無")
+
+
+def _bucket(gram, dim):
+    h = zlib.crc32(gram.encode("utf-8"))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+def features(text):
+    """回傳 {特徵: 權重}：去除停用字後的單字 + 原句相鄰兩字"""
+    text = strip_leading_phrases(normalize_keyword(text))
+    feats = {}
+    for ch in text:
+        if ch not in STOP_CHARS:
+            feats["1:" + ch] = UNIGRAM_WEIGHT
+    for i in range(len(text) - 1):
+        feats["2:" + text[i:i + 2]] = BIGRAM_WEIGHT
+    return feats
+
+
+def signature(text):
+    """
+    相似度之外的阻擋條件：(出現的否定字, 依序的內容字)。
+    兩句的否定字必須相同，共有的內容字出現順序也必須相同（「狗咬蛇」≠「蛇咬狗」）。
+    """
+    text = strip_leading_phrases(normalize_keyword(text))
+    negations = frozenset(ch for ch in text if ch in NEGATION_CHARS)
+    content = "".join(ch for ch in text if ch not in STOP_CHARS and ch not in NEGATION_CHARS)
+    return negations, content
+
+
+def compatible(a, b):
+    """a、b 為 signature() 的結果"""
+    if a[0] != b[0]:
+        return False
+    shared = set(a[1]) & set(b[1])
+    return [ch for ch in a[1] if ch in shared] == [ch for ch in b[1] if ch in shared]
+
+
+def embed(text, dim=SEMANTIC_CACHE_DIM):
+    """以 signed feature hashing 轉成 L2 正規化的 float32 向量"""
+    np = numpy()
+    vector = np.zeros(dim, dtype=np.float32)
+    for gram, weight in features(text).items():
+        index, sign = _bucket(gram, dim)
+        vector[index] += sign * weight
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    固定容量的向量快取：
+    - 向量存在預先配置的 (size, dim) float32 矩陣，查詢為一次矩陣乘法（全部列的餘弦相似度）
+    - 相似度 ≥ threshold、未過期，且通過 compatible()（否定字、語序）才算命中
+    - 滿了就淘汰最久沒用到的一筆（LRU）
+    """
+
+    def __init__(self, maxsize=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 dim=SEMANTIC_CACHE_DIM, ttl=SEMANTIC_CACHE_TTL):
+        try:
+            np = numpy()
+        except ImportError:
+            raise RuntimeError("SemanticCache 需要 numpy")
+        self._np = np
+        self.maxsize = max(1, int(maxsize))
+        self.threshold = threshold
+        self.dim = dim
+        self.ttl = float(ttl)
+        self._vectors = np.zeros((self.maxsize, dim), dtype=np.float32)
+        self._expires = np.zeros(self.maxsize, dtype=np.float64)   # 0 表示空位
+        self._last_used = np.zeros(self.maxsize, dtype=np.float64)
+        self._keys = [None] * self.maxsize
+        self._values = [None] * self.maxsize
+        self._signatures = [None] * self.maxsize
+        self._slots = {}   # 正規化關鍵字 → 列
+        self._filled = 0   # 用過的列數（空位從前面補起，只需搜尋 [:_filled]）
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "blocked": 0, "inserts": 0, "evictions": 0, "expired": 0}
+
+    def lookup(self, keyword):
+        """回傳 (值, 相似度, 命中的原始關鍵字) 或 None"""
+        query = embed(keyword, self.dim)
+        if not query.any():
+            return None
+        query_signature = signature(keyword)
+        now = time.time()
+        with self._lock:
+            if not self._filled:
+                self.counters["misses"] += 1
+                return None
+            scores = self._vectors[:self._filled] @ query
+            scores[self._expires[:self._filled] <= now] = -1.0
+            np = self._np
+            candidates = np.flatnonzero(scores >= self.threshold)
+            blocked = False
+            # 超過門檻的通常只有幾列，依相似度由高到低找第一個通過阻擋條件的
+            for row in candidates[np.argsort(-scores[candidates])]:
+                row = int(row)
+                if not compatible(query_signature, self._signatures[row]):
+                    blocked = True
+                    continue
+                self._last_used[row] = now
+                self.counters["hits"] += 1
+                return self._values[row], round(float(scores[row]), 4), self._keys[row]
+            self.counters["blocked" if blocked else "misses"] += 1
+            return None
+
+    def get(self, keyword):
+        found = self.lookup(keyword)
+        return found[0] if found else None
+
+    def set(self, keyword, value):
+        vector = embed(keyword, self.dim)
+        if not vector.any():
+            return
+        key = normalize_keyword(keyword)
+        now = time.time()
+        with self._lock:
+            row = self._slots.get(key)
+            if row is None:
+                row = self._free_row(now)
+                self._slots[key] = row
+                self.counters["inserts"] += 1
+            self._vectors[row] = vector
+            self._expires[row] = now + self.ttl
+            self._last_used[row] = now
+            self._keys[row] = keyword
+            self._values[row] = value
+            self._signatures[row] = signature(keyword)
+
+    def _free_row(self, now):
+        if self._filled < self.maxsize:
+            self._filled += 1
+            return self._filled - 1
+        np = self._np
+        expired = np.flatnonzero(self._expires <= now)
+        if len(expired):
+            row = int(expired[0])
+            self.counters["expired"] += 1
+        else:
+            row = int(np.argmin(self._last_used))
+            self.counters["evictions"] += 1
+        self._slots.pop(normalize_keyword(self._keys[row]), None)
+        return row
+
+    def clear(self):
+        with self._lock:
+            self._vectors[:] = 0
+            self._expires[:] = 0
+            self._last_used[:] = 0
+            self._filled = 0
+            self._keys = [None] * self.maxsize
+            self._values = [None] * self.maxsize
+            self._signatures = [None] * self.maxsize
+            self._slots.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._slots)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            size = len(self._slots)
+        total = counters["hits"] + counters["misses"] + counters["blocked"]
+        return {"size": size, "maxsize": self.maxsize, "threshold": self.threshold, **counters,
+                "hit_rate": round(counters["hits"] / total, 4) if total else 0.0}
+
+
+def create_default_semantic_cache():
+    """依環境變數建立近似快取；SEMANTIC_CACHE_SIZE=0 或未安裝 numpy 時回傳 None"""
+    if SEMANTIC_CACHE_SIZE <= 0:
+        return None
+    try:
+        return SemanticCache()
+    except RuntimeError:
+        print("[SEMANTIC CACHE] 未安裝 numpy，停用近似快取")
+        return None
@@ -0,0 +1,158 @@
+# single_flight.py
+import asyncio
+import threading
+
+
+class SingleFlightTimeout(Exception):
+    """等待同一鍵的進行中請求超過期限"""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    請求合併：同一個鍵同時只會有一個呼叫在進行，
+    其餘同鍵的請求等待並共用同一個結果（或同一個例外）。
+    """
+
+    def __init__(self, max_wait=30.0):
+        self.max_wait = max_wait
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {"leaders": 0, "shared": 0, "timeouts": 0}
+
+    def do(self, key, fn, max_wait=None):
+        """
+        執行 fn() 或等待同鍵進行中的呼叫，回傳 (結果, 是否為共用結果)。
+        等待超過 max_wait 秒時丟出 SingleFlightTimeout。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.counters["leaders"] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                leader = False
+
+        if not leader:
+            finished = call.done.wait(self.max_wait if max_wait is None else max_wait)
+            with self._lock:
+                call.waiters -= 1
+                if finished:
+                    self.counters["shared"] += 1
+                else:
+                    self.counters["timeouts"] += 1
+            if not finished:
+                raise SingleFlightTimeout(f"等待「{key}」的進行中請求逾時")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def waiting(self):
+        """目前每個進行中鍵的等待人數"""
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._calls), **self.counters}
+
+
+class _AsyncCall:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+class _LeaderCancelled(Exception):
+    """領頭的協程被取消（例如使用者的請求中斷），跟隨者改由其中一個重新呼叫"""
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight 的 asyncio 版本：同一事件迴圈內，同鍵的協程共用同一個進行中的呼叫。
+    fn 為回傳 awaitable 的函式。
+    領頭的協程被取消時不會取消跟隨者：第一個醒來的跟隨者成為新的領頭並重新呼叫 fn。
+    """
+
+    def __init__(self, max_wait=30.0):
+        self.max_wait = max_wait
+        self._calls = {}
+        self.counters = {"leaders": 0, "shared": 0, "timeouts": 0, "retried": 0}
+
+    async def do(self, key, fn, max_wait=None):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.max_wait if max_wait is None else max_wait)
+        while True:
+            call = self._calls.get(key)
+            if call is None:
+                return await self._lead(key, fn, loop)
+
+            call.waiters += 1
+            try:
+                # shield：跟隨者逾時不會取消領頭的呼叫
+                result = await asyncio.wait_for(asyncio.shield(call.future), max(0.0, deadline - loop.time()))
+            except _LeaderCancelled:
+                self.counters["retried"] += 1
+                continue
+            except asyncio.TimeoutError:
+                if call.future.done():
+                    raise  # 領頭的呼叫本身丟出逾時例外
+                self.counters["timeouts"] += 1
+                raise SingleFlightTimeout(f"等待「{key}」的進行中請求逾時") from None
+            finally:
+                call.waiters -= 1
+            self.counters["shared"] += 1
+            return result, True
+
+    async def _lead(self, key, fn, loop):
+        call = self._calls[key] = _AsyncCall(loop.create_future())
+        self.counters["leaders"] += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._fail(call, _LeaderCancelled(key))
+            raise
+        except BaseException as e:
+            self._fail(call, e)
+            raise
+        else:
+            call.future.set_result(result)
+            return result, False
+        finally:
+            self._calls.pop(key, None)
+
+    @staticmethod
+    def _fail(call, error):
+        call.future.set_exception(error)
+        if not call.waiters:
+            call.future.exception()  # 沒有人等待，避免「exception was never retrieved」警告
+
+    def waiting(self):
+        return {key: call.waiters for key, call in self._calls.items()}
+
+    def stats(self):
+        return {"in_flight": len(self._calls), **self.counters}
@@ -0,0 +1,82 @@
+# startup_profile.py
+# 列出 import bot_app 的耗時分佈（以 python -X importtime 量測）
+# 用法：python startup_profile.py [模組名稱，預設 bot_app] [顯示筆數，預設 20]
+import os
+import subprocess
+import sys
+import tempfile
+
+
+def parse_importtime(text):
+    """
+    解析 -X importtime 的輸出，回傳 [(模組, 深度, 自身微秒, 累計微秒)]；
+    依輸出順序排列（子模組在父模組之前），深度 0 為最外層
+    """
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len("import time:"):].split("|", 2)
+        name = raw_name.strip()
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        rows.append((name, depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def breakdown(rows, module):
+    """
+    回傳 (module 累計微秒, 直接子模組 [(模組, 自身, 累計)] 依累計由大到小,
+    整棵子樹 [(模組, 自身, 累計)] 依自身由大到小)
+    """
+    index = next((i for i in range(len(rows) - 1, -1, -1) if rows[i][:2] == (module, 0)), None)
+    if index is None:
+        raise ValueError(f"輸出中找不到 {module}")
+    children, subtree = [], [(module, rows[index][2], rows[index][3])]
+    # 子模組都在父模組之前輸出：往回走到上一個最外層的 import 為止
+    for name, depth, self_us, cumulative_us in reversed(rows[:index]):
+        if depth == 0:
+            break
+        subtree.append((name, self_us, cumulative_us))
+        if depth == 1:
+            children.append((name, self_us, cumulative_us))
+    children.sort(key=lambda x: -x[2])
+    subtree.sort(key=lambda x: -x[1])
+    return rows[index][3], children, subtree
+
+
+def profile_imports(module="bot_app"):
+    """執行 python -X importtime -c "import module"，回傳 breakdown(...) 的結果"""
+    env = dict(os.environ)
+    # bot_app 啟動時需要這些變數；量測時給假值即可（import 階段不會連線）
+    env.setdefault("LINE_CHANNEL_ACCESS_TOKEN", "profile")
+    env.setdefault("LINE_CHANNEL_SECRET", "profile")
+    env.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "dream_profile.db"))
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"❌ import {module} 失敗")
+    return breakdown(parse_importtime(proc.stderr), module)
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else "bot_app"
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    total, children, subtree = profile_imports(module)
+    print(f"⏱️ import {module} 共 {total / 1000:.1f} ms\n")
+    print(f"{module} 直接 import 的模組（含其下層）")
+    print(f"{'模組':<40}{'累計 (ms)':>12}{'占比':>8}")
+    for name, _, us in children[:top]:
+        print(f"{name:<40}{us / 1000:>12.1f}{us / total:>8.1%}")
+    print(f"\n自身耗時最多的模組（不含其下層）")
+    print(f"{'模組':<40}{'自身 (ms)':>12}{'占比':>8}")
+    for name, us, _ in subtree[:top]:
+        print(f"{name:<40}{us / 1000:>12.1f}{us / total:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# task_queue.py
+import atexit
+import queue
+import threading
+import time
+import traceback
+
+from metrics import Histogram
+
+# ✅ 佇列滿載時的處理策略
+#   block  ：等待 block_timeout 秒，仍滿載則拒絕
+#   reject ：立即拒絕（由呼叫端回覆 503，讓 LINE 稍後重送）
+#   inline ：改由呼叫端執行緒同步處理（退回原本的同步行為）
+BACKPRESSURE_POLICIES = ("block", "reject", "inline")
+
+_STOP = object()
+
+
+class WorkQueue:
+    """
+    有界的行程內工作佇列 + 固定大小的工作執行緒池，
+    並統計排隊等待時間與實際處理時間。
+    """
+
+    def __init__(self, workers=4, maxsize=100, backpressure="block", block_timeout=1.0, name="work"):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"未知的 backpressure 策略：{backpressure}")
+
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.backpressure = backpressure
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max(1, int(maxsize)))
+        self._threads = []
+        self._lock = threading.Lock()
+
+        self.wait_time = Histogram()
+        self.process_time = Histogram()
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "inline": 0}
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return self
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        atexit.register(self.stop)
+        return self
+
+    def _incr(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _run(self, fn, args, kwargs):
+        started = time.perf_counter()
+        try:
+            fn(*args, **kwargs)
+            self._incr("completed")
+        except Exception as e:
+            self._incr("failed")
+            traceback.print_exc()
+            print(f"[{self.name.upper()}] 任務執行失敗：{e}")
+        finally:
+            self.process_time.observe(time.perf_counter() - started)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                enqueued_at, fn, args, kwargs = item
+                self.wait_time.observe(time.perf_counter() - enqueued_at)
+                self._run(fn, args, kwargs)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        送出一個任務，回傳 True 表示已排入佇列（或已於 inline 模式執行完畢），
+        回傳 False 表示因滿載被拒絕。
+        """
+        item = (time.perf_counter(), fn, args, kwargs)
+        try:
+            if self.backpressure == "block":
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if self.backpressure == "inline":
+                self._incr("inline")
+                self._run(fn, args, kwargs)
+                return True
+            self._incr("rejected")
+            return False
+
+        self._incr("submitted")
+        return True
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def stop(self, timeout=10.0):
+        """送出停止訊號並等待工作執行緒把佇列內剩餘任務處理完"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for t in threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "workers": self.workers,
+            "depth": self.depth(),
+            "maxsize": self._queue.maxsize,
+            "backpressure": self.backpressure,
+            **counters,
+            "queue_wait": self.wait_time.snapshot(),
+            "processing": self.process_time.snapshot(),
+        }
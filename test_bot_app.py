@@ -0,0 +1,195 @@
+# test_bot_app.py
+# 以 Flask 測試用戶端測試 bot_app 的 HTTP 路由（資料庫使用 SQLite 替身）
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("linebot")
+
+import database
+import migrate
+from database import ConnectionPool
+
+
+@pytest.fixture(scope="module")
+def bot_app(tmp_path_factory):
+    """bot_app 在 import 時檢查必要的環境變數；這裡只在 import 期間設定"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("LINE_CHANNEL_ACCESS_TOKEN", "test-token")
+        mp.setenv("LINE_CHANNEL_SECRET", "test-secret")
+        mp.setenv("DATABASE_URL", f"sqlite:///{tmp_path_factory.mktemp('db') / 'unused.db'}")
+        import bot_app
+    return bot_app
+
+
+@pytest.fixture()
+def client(bot_app):
+    return bot_app.app.test_client()
+
+
+@pytest.fixture()
+def pool(tmp_path, monkeypatch):
+    db_url = f"sqlite:///{tmp_path / 'dream_logs.db'}"
+    pool = ConnectionPool(connect=lambda: database._connect(db_url), minconn=1, maxconn=2, timeout=0.2)
+    monkeypatch.setattr(database, "_pool", pool)
+    monkeypatch.setitem(migrate._state, "done", False)
+    monkeypatch.setitem(migrate._state, "attempted", False)
+    base = datetime(2025, 1, 1)
+    database.write_many([(f"U{i}", f"關鍵字{i}", "平靜", base + timedelta(minutes=i)) for i in range(4)])
+    yield pool
+    pool.closeall()
+
+
+# === /logs、/logs.json ===
+def test_logs_html_shows_next_page_only_when_rows_remain(client, pool):
+    first = client.get("/logs?limit=2").get_data(as_text=True)
+    assert "關鍵字3" in first and "關鍵字2" in first and "下一頁" in first
+    next_url = first.split("href='")[1].split("'")[0].replace("&amp;", "&")
+
+    second = client.get(next_url).get_data(as_text=True)
+    assert "關鍵字1" in second and "關鍵字0" in second
+    assert "下一頁" not in second          # 剛好剩 limit 筆時不顯示下一頁
+
+
+def test_logs_json_next_cursor(client, pool):
+    first = client.get("/logs.json?limit=2").get_json()
+    assert [log["keyword"] for log in first["logs"]] == ["關鍵字3", "關鍵字2"]
+    second = client.get(f"/logs.json?limit=2&cursor={first['next_cursor']}").get_json()
+    assert [log["keyword"] for log in second["logs"]] == ["關鍵字1", "關鍵字0"]
+    assert second["next_cursor"] is None
+
+
+def test_logs_connection_is_borrowed_only_while_streaming(client, pool):
+    response = client.get("/logs?limit=2", buffered=False)
+    assert pool.stats()["idle"] == pool.stats()["size"]    # 尚未讀取內容：沒有借出連線
+    body = b"".join(response.response).decode()
+    response.close()
+    assert "關鍵字3" in body
+    assert pool.stats()["idle"] == pool.stats()["size"]    # 讀完後已歸還
+
+
+def test_logs_bad_cursor(client, pool):
+    assert client.get("/logs?cursor=not-base64").status_code == 400
+
+
+# === 兩段式回覆（先回確認訊息、完成後推播），LINE 使用 fake_services 的假服務 ===
+@pytest.fixture()
+def fake_line(bot_app, monkeypatch):
+    from linebot.v3.messaging import Configuration
+
+    from fake_services import start_fake_line
+
+    server, service = start_fake_line()
+    monkeypatch.setattr(bot_app, "configuration",
+                        Configuration(access_token="test-token", host=f"http://127.0.0.1:{server.server_port}"))
+    yield service
+    server.shutdown()
+
+
+@pytest.fixture()
+def two_phase(bot_app, monkeypatch):
+    """TWO_PHASE_MODE=auto、等待 0.2 秒；解夢延遲由 delay[0] 控制，結果只記錄不寫檔"""
+    from dream_core import build_dream_result
+
+    delay, published = [0.0], []
+
+    def remote(keyword, user_id=None, persist=True):
+        time.sleep(delay[0])
+        return build_dream_result(keyword, "夢見蛇代表轉變與平靜。", user_id, persist=False, emotion="平靜")
+
+    monkeypatch.setattr(bot_app, "TWO_PHASE_MODE", "auto")
+    monkeypatch.setattr(bot_app, "two_phase_wait", lambda: 0.2)
+    monkeypatch.setattr(bot_app, "rate_limiter", None)
+    monkeypatch.setattr(bot_app, "process_dream_local", lambda *args, **kwargs: None)
+    monkeypatch.setattr(bot_app, "process_dream_remote", remote)
+    monkeypatch.setattr(bot_app, "publish_result", lambda keyword, *args: published.append(keyword))
+    return delay, published
+
+
+def text_event(text, token="reply-token-1"):
+    return SimpleNamespace(reply_token=token, source=SimpleNamespace(user_id="U1"), message=SimpleNamespace(text=text))
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_fast_result_is_replied_directly(bot_app, fake_line, two_phase):
+    bot_app.handle_text_message(text_event("蛇"))
+    assert list(fake_line.replies()) == ["reply-token-1"]
+    assert fake_line.counters["pushes"] == 0
+    assert two_phase[1] == ["蛇"]
+
+
+def test_slow_result_acknowledges_then_pushes(bot_app, fake_line, two_phase):
+    delay, published = two_phase
+    delay[0] = 0.5
+    bot_app.handle_text_message(text_event("蛇"))
+    assert list(fake_line.replies()) == ["reply-token-1"]      # 確認訊息
+    assert fake_line.counters["pushes"] == 0
+    assert wait_for(lambda: fake_line.counters["pushes"] == 1)
+    assert published == ["蛇"]
+
+
+def test_failed_acknowledgement_still_pushes(bot_app, fake_line, two_phase, monkeypatch):
+    delay, published = two_phase
+    delay[0] = 0.5
+
+    def expired_token(reply_token, messages):
+        raise RuntimeError("Invalid reply token")
+
+    monkeypatch.setattr(bot_app, "reply_messages", expired_token)
+    bot_app.handle_text_message(text_event("蛇"))
+    assert wait_for(lambda: fake_line.counters["pushes"] == 1)
+    assert published == ["蛇"]
+
+
+# === /card-assets：檔名含雜湊、immutable 長效快取、ETag 條件請求，只提供 manifest 內的檔案 ===
+@pytest.fixture()
+def card_assets(bot_app, tmp_path, monkeypatch):
+    import json
+
+    from card_assets import MANIFEST_NAME, MANIFEST_VERSION, CardAssets
+
+    (tmp_path / "A1.29571a10a28e.preview.jpg").write_bytes(b"\xff\xd8preview\xff\xd9")
+    (tmp_path / "secret.txt").write_text("不在 manifest 中")
+    variant = {"file": "A1.29571a10a28e.preview.jpg", "path": "A1.29571a10a28e.preview.jpg",
+               "etag": "29571a10a28e", "bytes": 11, "width": 1, "height": 1}
+    manifest = {"version": MANIFEST_VERSION, "cards": {"A1.jpg": {"preview": variant}}}
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest))
+    assets = CardAssets(tmp_path, base_url="https://example.com/card-assets")
+    monkeypatch.setattr(bot_app, "get_card_assets", lambda: assets)
+    return variant
+
+
+def test_card_asset_is_immutable_with_etag(bot_app, client, card_assets):
+    response = client.get(f"/card-assets/{card_assets['file']}")
+    assert response.status_code == 200 and response.mimetype == "image/jpeg"
+    assert response.data == b"\xff\xd8preview\xff\xd9"
+    cache = response.cache_control
+    assert cache.public and cache.immutable and cache.max_age == bot_app.CARD_ASSET_MAX_AGE
+    assert response.headers["ETag"] == '"29571a10a28e"'
+
+
+def test_card_asset_if_none_match_returns_304(client, card_assets):
+    response = client.get(f"/card-assets/{card_assets['file']}", headers={"If-None-Match": '"29571a10a28e"'})
+    assert response.status_code == 304 and response.data == b""
+    stale = client.get(f"/card-assets/{card_assets['file']}", headers={"If-None-Match": '"000000000000"'})
+    assert stale.status_code == 200
+
+
+@pytest.mark.parametrize("name", [
+    "A1.000000000000.preview.jpg",    # 不存在的雜湊
+    "secret.txt",                     # 資料夾內、但不在 manifest
+    "manifest.json",
+    "..%2Fbot_app.py",
+    "%2E%2E%2F%2E%2E%2Fetc%2Fpasswd",
+])
+def test_unknown_or_traversal_names_are_404(client, card_assets, name):
+    assert client.get(f"/card-assets/{name}").status_code == 404
@@ -0,0 +1,104 @@
+# test_build_dream_links.py
+# 以本機 HTTP 伺服器模擬解夢網站（首頁 → 分類頁 → 解析頁），測試廣度優先爬蟲、去重與中斷續爬
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from build_dream_links import crawl_site, get_all_dream_links
+
+CATEGORIES = {"dongwu": ["蛇", "貓", "狗"], "ziran": ["火", "水", "雷"], "renwu": ["牙齒", "老師", "嬰兒"]}
+
+
+def build_site():
+    pages = {"/": "".join(f"<a href='/{c}/'>{c}</a>" for c in CATEGORIES) + "<a href='/dongwu/p0.html'>蛇</a>"}
+    for c, words in CATEGORIES.items():
+        links = [f"<a href='p{i}.html'>{w}</a>" for i, w in enumerate(words)]
+        pages[f"/{c}/"] = "".join(links) + "<a href='/'>首頁</a><a href='#top'>回頂端</a><a href='https://other.example/x.html'>外站</a>"
+        for i, w in enumerate(words):
+            pages[f"/{c}/p{i}.html"] = f"<div id='entrybody'>夢見{w}</div><a href='/{c}/'>返回</a>"
+    return pages
+
+
+class MockSite(BaseHTTPRequestHandler):
+    pages = build_site()
+    hits = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with MockSite.lock:
+            MockSite.hits[self.path] = MockSite.hits.get(self.path, 0) + 1
+        body = MockSite.pages.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def site():
+    MockSite.hits = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+def crawl(site, tmp_path, **kwargs):
+    kwargs.setdefault("rate", 0)
+    return crawl_site(site, state_path=str(tmp_path / "state.db"), output=str(tmp_path / "links.json"),
+                      log=lambda *_: None, **kwargs)
+
+
+def test_crawls_whole_site_once(site, tmp_path):
+    links = crawl(site, tmp_path, workers=4)
+    assert set(links) == {w for words in CATEGORIES.values() for w in words}
+    assert links["蛇"] == site + "dongwu/p0.html"
+    assert all(n == 1 for n in MockSite.hits.values())
+    assert len(MockSite.hits) == 1 + 3 + 9
+
+    saved = json.loads((tmp_path / "links.json").read_text(encoding="utf-8"))
+    assert saved == links
+
+
+def test_resumes_after_interruption(site, tmp_path):
+    first = crawl(site, tmp_path, workers=2, max_pages=3)
+    assert sum(MockSite.hits.values()) == 3
+    assert len(first) < 9
+
+    links = crawl(site, tmp_path, workers=2)
+    assert len(links) == 9
+    assert all(n == 1 for n in MockSite.hits.values())
+
+
+def test_existing_links_are_kept(site, tmp_path):
+    (tmp_path / "links.json").write_text(json.dumps({"蛇": "https://manual.example/she.html"}), encoding="utf-8")
+    crawl(site, tmp_path)
+    saved = json.loads((tmp_path / "links.json").read_text(encoding="utf-8"))
+    assert saved["蛇"] == "https://manual.example/she.html"
+    assert len(saved) == 9
+
+
+def test_rate_limit_spaces_requests(site, tmp_path):
+    started = time.monotonic()
+    crawl(site, tmp_path, workers=8, rate=20, max_depth=1)
+    # 首頁 + 3 個分類頁 = 4 次請求，每秒 20 次 → 至少 0.15 秒
+    assert time.monotonic() - started >= 0.15
+
+
+def test_home_page_only(site):
+    links = get_all_dream_links(site)
+    assert links == {"蛇": site + "dongwu/p0.html"}
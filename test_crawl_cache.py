@@ -0,0 +1,112 @@
+# test_crawl_cache.py
+# 以本機 HTTP 伺服器模擬 golla.tw 頁面，測試 crawl_cache 的快取、重新驗證、離線模式與預先抓取
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+
+from crawl_cache import CrawlCache, OFFLINE_MISS
+from dream_parser import extract_dream_text
+
+PAGES = {
+    "/dongwu/she.html": ("v1", "<html><body><div id='nav'>選單</div><div id='entrybody'><p>夢見蛇</p><p>代表轉變</p></div></body></html>"),
+    "/ziran/huo.html": ("v1", "<html><body><div id='entrybody'>夢見火象徵熱情</div></body></html>"),
+    "/broken.html": ("v1", "<html><body>沒有內容</body></html>"),
+}
+
+
+class StandIn(BaseHTTPRequestHandler):
+    hits = {}
+
+    def do_GET(self):
+        StandIn.hits[self.path] = StandIn.hits.get(self.path, 0) + 1
+        if self.path not in PAGES:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag, html = PAGES[self.path]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = html.encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def site():
+    StandIn.hits = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def make_cache(tmp_path, **kwargs):
+    return CrawlCache(extract=extract_dream_text, db_path=str(tmp_path / "crawl.db"), **kwargs)
+
+
+def test_fresh_entries_are_served_without_network(site, tmp_path):
+    cache = make_cache(tmp_path, ttl=3600)
+    url = site + "/dongwu/she.html"
+    assert cache.get(url) == "夢見蛇\n代表轉變"
+    assert cache.get(url) == "夢見蛇\n代表轉變"
+    assert StandIn.hits["/dongwu/she.html"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_expired_entries_revalidate_with_etag(site, tmp_path):
+    cache = make_cache(tmp_path, ttl=0)
+    url = site + "/ziran/huo.html"
+    cache.get(url)
+    assert cache.get(url) == "夢見火象徵熱情"
+    assert cache.stats()["revalidated"] == 1
+
+    PAGES["/ziran/huo.html"] = ("v2", "<div id='entrybody'>夢見火代表轉機</div>")
+    try:
+        assert cache.get(url) == "夢見火代表轉機"
+        assert cache.stats()["refreshed"] == 1
+    finally:
+        PAGES["/ziran/huo.html"] = ("v1", "<html><body><div id='entrybody'>夢見火象徵熱情</div></body></html>")
+
+
+def test_errors_are_not_cached_and_stale_content_is_kept(site, tmp_path):
+    cache = make_cache(tmp_path, ttl=0)
+    assert cache.get(site + "/broken.html").startswith("⚠️")
+    assert cache.get(site + "/missing.html").startswith("⚠️")
+    assert len(cache) == 0
+
+    url = site + "/dongwu/she.html"
+    cache.get(url)
+    cache.fetch = lambda url, headers: (503, "", {})
+    assert cache.get(url) == "夢見蛇\n代表轉變"
+    assert cache.stats()["stale_served"] == 1
+
+
+def test_offline_mode_serves_only_from_cache(site, tmp_path):
+    make_cache(tmp_path).get(site + "/dongwu/she.html")
+    offline = make_cache(tmp_path, ttl=0, offline=True)
+    assert offline.get(site + "/dongwu/she.html") == "夢見蛇\n代表轉變"
+    assert offline.get(site + "/ziran/huo.html") == OFFLINE_MISS
+    assert StandIn.hits.get("/ziran/huo.html") is None
+
+
+def test_prefetch_fills_cache(site, tmp_path):
+    cache = make_cache(tmp_path)
+    urls = [site + path for path in PAGES] * 2
+    result = cache.prefetch(urls, workers=4)
+    assert result["ok"] == 2
+    assert list(result["failed"]) == [site + "/broken.html"]
+    assert len(cache) == 2
+    assert all(StandIn.hits[path] == 1 for path in PAGES)
@@ -0,0 +1,157 @@
+# test_database.py
+# 以 SQLite 替身（DATABASE_URL=sqlite:///路徑）測試連線池與批次寫入緩衝區
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+import migrate
+from database import ConnectionPool, PoolTimeout, WriteBuffer
+
+
+@pytest.fixture()
+def db_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'dream_logs.db'}"
+
+
+@pytest.fixture()
+def pool(db_url, monkeypatch):
+    """把共用連線池換成 SQLite 替身；第一次使用時照常執行遷移"""
+    pool = ConnectionPool(connect=lambda: database._connect(db_url), minconn=1, maxconn=2, timeout=0.2)
+    monkeypatch.setattr(database, "_pool", pool)
+    monkeypatch.setitem(migrate._state, "done", False)
+    monkeypatch.setitem(migrate._state, "attempted", False)
+    yield pool
+    pool.closeall()
+
+
+def test_pool_reuses_idle_connections(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert pool.stats() == {"size": 1, "idle": 1, "maxconn": 2}
+
+
+def test_pool_waits_then_times_out(pool):
+    a, b = pool.acquire(), pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.2
+
+    threading.Timer(0.05, pool.release, args=(a,)).start()
+    assert pool.acquire() is a    # 等到歸還的連線
+    pool.release(a)
+    pool.release(b)
+
+
+def test_release_rolls_back_open_transaction(pool):
+    database.get_pool()   # 建立資料表
+    with pool.connection() as conn:
+        conn.cursor().execute(database.INSERT_LOG_SQL, ("U1", "蛇", "恐懼", None))
+        # 未 commit 就歸還
+    with pool.connection() as conn:
+        assert not conn._conn.in_transaction
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM dream_logs")
+        assert cursor.fetchone()[0] == 0
+
+
+def test_broken_connection_is_discarded(pool):
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.close()
+            raise RuntimeError("boom")
+    assert pool.stats()["size"] == 0
+    with pool.connection() as conn:
+        assert not conn.closed
+
+
+def test_failed_migration_is_attempted_once(pool, monkeypatch):
+    calls = []
+    real_init_db = migrate.init_db
+
+    def flaky_init_db():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("permission denied for schema public")
+        real_init_db()
+
+    monkeypatch.setattr(migrate, "init_db", flaky_init_db)
+    monkeypatch.setitem(migrate._state, "error", None)
+    assert database.get_pool() is pool       # 遷移失敗只記錄，不丟給呼叫端
+    assert migrate._state["error"] == "permission denied for schema public"
+    database.get_pool()
+    assert len(calls) == 1                   # 之後的呼叫不再重試
+
+    migrate.run_migrations()                 # python migrate.py 仍可重試
+    assert len(calls) == 2 and migrate._state["done"] and migrate._state["error"] is None
+    database.write_many([("U1", "蛇", "恐懼", None)])
+    assert len(database.get_logs_page(limit=10)[0]) == 1
+
+
+def test_write_many_and_read_back(pool):
+    database.write_many([("U1", "蛇", "恐懼", None), ("U2", "貓", "快樂", None)])
+    rows, next_after = database.get_logs_page(limit=10)
+    assert sorted(row[2] for row in rows) == ["蛇", "貓"] and next_after is None
+
+
+def test_pages_walk_past_null_timestamps(pool):
+    base = datetime(2025, 1, 1)
+    database.write_many([
+        ("U1", "蛇", "恐懼", base),
+        ("U2", "貓", "快樂", None),
+        ("U3", "狗", "憤怒", base + timedelta(hours=1)),
+        ("U4", "魚", "平靜", None),
+        ("U5", "鳥", "自由", base),
+    ])
+    seen, after = [], None
+    while True:
+        rows, after = database.get_logs_page(limit=2, after=after)
+        seen.extend(rows)
+        if after is None:
+            break
+    # 依時間倒序、同時間依 id 倒序，沒有時間的排在最後；跨頁不重複、不遺漏
+    assert [row[2] for row in seen] == ["狗", "鳥", "蛇", "魚", "貓"]
+    assert list(database.iter_logs(after=(None, 4))) == [seen[-1]]
+
+
+def test_write_buffer_flushes_by_size_interval_and_close():
+    batches, flushed = [], threading.Event()
+
+    def flush(batch):
+        batches.append(list(batch))
+        flushed.set()
+
+    buffer = WriteBuffer(flush, max_size=3, interval=0.2)
+    for row in range(3):
+        buffer.add(row)
+    assert flushed.wait(0.15)               # 滿 3 筆立即寫入，不等 interval
+    assert batches == [[0, 1, 2]]
+
+    flushed.clear()
+    buffer.add(3)
+    assert flushed.wait(1.0)                # 不滿 3 筆時等到 interval
+    assert batches[-1] == [3]
+
+    buffer.add(4)
+    buffer.close()                          # 結束前寫完剩下的資料
+    assert [row for batch in batches for row in batch] == [0, 1, 2, 3, 4]
+
+
+def test_write_buffer_survives_flush_errors():
+    calls = []
+
+    def flush(batch):
+        calls.append(list(batch))
+        if len(calls) == 1:
+            raise RuntimeError("db down")
+
+    buffer = WriteBuffer(flush, max_size=1, interval=0.05)
+    buffer.add("a")
+    buffer.add("b")
+    buffer.close()
+    assert calls == [["a"], ["b"]]
@@ -0,0 +1,85 @@
+# test_dream_batch.py
+# 批次解夢：切分關鍵字、組出提示、解析各種格式的批次回覆，以及解析不到時個別補查
+import pytest
+
+pytest.importorskip("dotenv")
+
+import dream_core
+import llm_client
+from dream_core import build_batch_prompt, get_dream_interpretations_batch, parse_batch_response, split_keywords
+from llm_client import FakeModel, LLMClient
+
+
+def test_split_keywords():
+    assert split_keywords("蛇、掉牙，飛翔;考試／下雨\n迷路") == ["蛇", "掉牙", "飛翔", "考試", "下雨", "迷路"]
+    assert split_keywords(" 蛇 、蛇,, 貓 ") == ["蛇", "貓"]
+
+
+def test_build_batch_prompt_numbers_keywords():
+    prompt = build_batch_prompt(["蛇", "掉牙"])
+    assert "1. 蛇\n2. 掉牙" in prompt and "關鍵字：xxx\n說明：xxx\n情緒：xxx" in prompt
+
+
+def test_parse_numbered_blocks_and_bold_headers():
+    text = (
+        "1. 關鍵字：蛇\n說明：蛇象徵轉變。\n情緒：恐懼\n\n"
+        "**2. 關鍵字：** 掉牙\n**說明：** 代表你在意形象。\n**情緒：** 焦慮\n\n"
+        "3. **關鍵字**：飛翔\n**說明**：渴望自由。\n**情緒**：**快樂**\n\n"
+        "- 4. 關鍵字：考試\n- 說明：準備好了。\n- 情緒：壓力"
+    )
+    assert parse_batch_response(text, ["蛇", "掉牙", "飛翔", "考試"]) == {
+        "蛇": ("蛇象徵轉變。", "恐懼"),
+        "掉牙": ("代表你在意形象。", "焦慮"),
+        "飛翔": ("渴望自由。", "快樂"),
+        "考試": ("準備好了。", "壓力"),
+    }
+
+
+def test_parse_multiline_description_and_unknown_emotion():
+    text = "關鍵字：下雨\n說明：雨水洗去疲憊，\n\n也帶來新的開始。\n情緒：憂鬱到不行"
+    assert parse_batch_response(text, ["下雨"]) == {"下雨": ("雨水洗去疲憊，\n也帶來新的開始。", None)}
+
+
+def test_parse_skips_unknown_duplicate_and_empty_blocks():
+    text = (
+        "關鍵字：蛇\n說明：第一段。\n情緒：恐懼\n\n"
+        "關鍵字：蛇\n說明：重複的第二段。\n情緒：快樂\n\n"
+        "關鍵字：外星人\n說明：不在這批。\n情緒：驚奇\n\n"
+        "關鍵字：掉牙\n說明：\n情緒：焦慮"
+    )
+    assert parse_batch_response(text, ["蛇", "掉牙"]) == {"蛇": ("第一段。", "恐懼")}
+
+
+@pytest.fixture()
+def fake_gemini(monkeypatch):
+    """以假模型取代 Gemini，並關閉預先生成、快取與 dream_links，只看批次請求本身"""
+    prompts = []
+
+    def install(batch_reply):
+        def respond(prompt):
+            prompts.append(prompt)
+            if "關鍵字：xxx" in prompt:
+                return batch_reply
+            return "個別查詢的解析。"
+        monkeypatch.setattr(llm_client, "_client", LLMClient(model=FakeModel(responder=respond), retries=0))
+        return prompts
+
+    monkeypatch.setattr(dream_core, "pick_precomputed", lambda keyword: None)
+    monkeypatch.setattr(dream_core, "interpretation_cache", None)
+    monkeypatch.setattr(dream_core, "semantic_cache", None)
+    monkeypatch.setattr(dream_core, "DREAM_LINKS_FIRST", False)
+    return install
+
+
+def test_missing_keyword_falls_back_to_single_call(fake_gemini):
+    prompts = fake_gemini("1. 關鍵字：蛇\n說明：蛇象徵轉變。\n情緒：恐懼")
+    results = get_dream_interpretations_batch(["蛇", "掉牙", "蛇"])
+    assert results == {"蛇": ("蛇象徵轉變。", "恐懼"), "掉牙": ("個別查詢的解析。", None)}
+    assert len(prompts) == 2                       # 一次批次 + 「掉牙」個別補查
+    assert prompts[0].count("1. 蛇") == 1 and "3." not in prompts[0]   # 重複的關鍵字只問一次
+
+
+def test_batch_failure_falls_back_to_single_calls(fake_gemini):
+    fake_gemini("")                                # 空白回覆會丟出 LLMError
+    results = get_dream_interpretations_batch(["蛇", "掉牙"])
+    assert results == {"蛇": ("個別查詢的解析。", None), "掉牙": ("個別查詢的解析。", None)}
@@ -0,0 +1,66 @@
+# test_dream_snapshot.py
+# mmap 快照：查詢、增量紀錄、跨實例（行程）可見、compact 不遺失整併期間的寫入，以及 keyword_index 重建
+import pytest
+
+import dream_parser
+import dream_snapshot
+import keyword_index
+from dream_snapshot import DreamSnapshot, write_snapshot
+
+LINKS = {"蛇": "https://example.com/she", "老虎": "https://example.com/laohu", "掉牙": "https://example.com/diuya"}
+
+
+@pytest.fixture()
+def path(tmp_path):
+    path = str(tmp_path / "links.snap")
+    write_snapshot(LINKS, path)
+    return path
+
+
+def test_lookup_and_iteration(path):
+    snapshot = DreamSnapshot(path)
+    assert snapshot["老虎"] == LINKS["老虎"]
+    assert "貓" not in snapshot
+    assert dict(snapshot.items()) == LINKS
+
+
+def test_log_overlay_is_visible_to_other_instances(path):
+    writer, reader = DreamSnapshot(path, check_interval=0), DreamSnapshot(path, check_interval=0)
+    version = reader.version
+    writer.set("老鼠", "https://example.com/laoshu")
+    writer.delete("蛇")
+    assert reader["老鼠"] == "https://example.com/laoshu"
+    assert "蛇" not in reader
+    assert reader.version > version
+
+
+def test_compact_keeps_entries_appended_while_compacting(path, monkeypatch):
+    compactor, other = DreamSnapshot(path, check_interval=0), DreamSnapshot(path, check_interval=0)
+    compactor.set("貓", "https://example.com/mao")
+    real_write = dream_snapshot.write_snapshot
+
+    def write_while_other_appends(items, target):
+        other.set("狗", "https://example.com/gou")   # 另一個行程在整併途中寫入
+        return real_write(items, target)
+
+    monkeypatch.setattr(dream_snapshot, "write_snapshot", write_while_other_appends)
+    assert compactor.compact() == 4
+
+    fresh = DreamSnapshot(path)
+    assert fresh["貓"] == "https://example.com/mao"
+    assert fresh["狗"] == "https://example.com/gou"   # 仍在新的增量紀錄中
+    assert compactor["狗"] == other["狗"] == "https://example.com/gou"
+    assert other["貓"] == "https://example.com/mao"
+
+
+def test_keyword_index_rebuilds_when_snapshot_changes(path, monkeypatch):
+    snapshot = DreamSnapshot(path, check_interval=0)
+    monkeypatch.setattr(dream_parser, "dream_links", snapshot)
+    monkeypatch.setattr(keyword_index, "_index", None)
+    monkeypatch.setattr(keyword_index, "_index_version", None)
+    assert dream_parser.find_dream_link("老鼠") is None
+
+    DreamSnapshot(path).set("老鼠", "https://example.com/laoshu")   # 例如 add_dream_link.py
+    assert dream_parser.find_dream_link("老鼠") == "https://example.com/laoshu"
+    assert dream_parser.find_dream_link("夢到老鼠") == "https://example.com/laoshu"
+    assert keyword_index.get_keyword_index().stats()["lookups"] == 3
@@ -0,0 +1,61 @@
+# test_emotion_mapper.py
+# 固定幾段解夢文字的情緒判定結果（預設 automaton，以及選用的 jieba）
+import pytest
+
+pytest.importorskip("jieba")
+
+import emotion_mapper
+from emotion_mapper import map_emotion, map_emotion_automaton, map_emotion_jieba
+
+CASES = [
+    ("夢見蛇代表你內心的恐懼與害怕", "恐懼"),
+    ("夢到考試遲到，反映你最近壓力很大", "壓力"),
+    ("夢見自己在海邊飛翔，充滿快樂與開心", "快樂"),
+    ("夢見和戀人擁抱，代表你渴望被愛", "被愛"),
+    ("今天天氣不錯", "未知"),
+    ("⚠️ 尚未支援此夢境", "未知"),
+]
+
+
+@pytest.mark.parametrize("text, emotion", CASES)
+def test_matchers_agree_on_clear_cases(text, emotion):
+    assert map_emotion_jieba(text) == emotion
+    assert map_emotion_automaton(text) == emotion
+
+
+@pytest.mark.parametrize("text, emotion", [
+    ("他花費了很多錢去旅行", "未知"),                        # 「花費」不是「花」
+    ("夢見院子裡開花了", "快樂"),
+    ("你笑不出來的時候，心裡藏著焦慮與緊張", "焦慮"),        # 「笑不出來」是否定
+    ("夢裡一點都不開心，只覺得很失落", "悲傷"),
+    ("不要害怕，這個夢代表你正在成長", "未知"),
+])
+def test_default_matcher_handles_compounds_and_negation(text, emotion):
+    assert emotion_mapper.EMOTION_MATCHER == "automaton"
+    assert map_emotion(text) == emotion
+
+
+def test_ignore_words_do_not_shadow_other_keywords():
+    from emotion_lexicon import compile_lexicon
+
+    lexicon = compile_lexicon({"emotions": {"快樂": ["花"], "壓力": ["花費"]}, "ignore": ["花費", "眼花"]})
+    assert emotion_mapper.score_emotions("花費", lexicon)["壓力"][1] == 1   # 關鍵詞優先於 ignore
+    assert emotion_mapper.score_emotions("眼花", lexicon) == {}
+
+
+def test_every_card_emotion_has_keywords():
+    from card_deck import DECK
+    from emotion_lexicon import get_lexicon
+
+    lexicon = get_lexicon()
+    reachable = {lexicon.canonical(emotion) for emotion, words in lexicon.emotions.items() if words}
+    assert set(DECK.emotions) <= reachable
+
+
+@pytest.mark.parametrize("text, emotion", [
+    ("夢見自己獨自走在空蕩的街上，心裡感到孤單寂寞", "孤單"),
+    ("夢見回到老家，心裡覺得很幸福、很滿足", "幸福"),
+])
+def test_lonely_and_happy_cards_are_selected(text, emotion):
+    assert map_emotion_jieba(text) == emotion
+    assert map_emotion_automaton(text) == emotion
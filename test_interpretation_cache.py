@@ -0,0 +1,82 @@
+# test_interpretation_cache.py
+# 解夢結果快取：關鍵字正規化、記憶體 LRU + TTL，以及 SQLite 磁碟層的保留與清理上限
+import pytest
+
+from interpretation_cache import InterpretationCache, normalize_keyword
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("ＡＢＣ", "abc"),              # NFKC 全形折疊 + 小寫
+    ("１２３", "123"),
+    (" 夢 見\t蛇\n", "夢見蛇"),      # 移除所有空白（含全形空白）
+    ("掉　牙", "掉牙"),
+    ("梦见龙", "夢見龍"),            # 簡體折疊成繁體
+    ("鱼", "魚"),
+    (None, ""),
+])
+def test_normalize_keyword(raw, expected):
+    assert normalize_keyword(raw) == expected
+
+
+def test_normalized_variants_share_an_entry():
+    cache = InterpretationCache(maxsize=4)
+    cache.set("梦见 龙", "解析")
+    assert cache.get("夢見龍") == "解析"
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = InterpretationCache(maxsize=2)
+    cache.set("蛇", "a")
+    cache.set("貓", "b")
+    assert cache.get("蛇") == "a"    # 「貓」成為最久沒用到的一筆
+    cache.set("狗", "c")
+    assert cache.get("貓") is None
+    assert cache.get("蛇") == "a" and cache.get("狗") == "c"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = InterpretationCache(maxsize=4, ttl=10, clock=clock)
+    cache.set("蛇", "a")
+    clock.now += 9
+    assert cache.get("蛇") == "a"
+    clock.now += 2
+    assert cache.get("蛇") is None
+    stats = cache.stats()
+    assert stats["expired"] == 1 and stats["size"] == 0
+
+
+def test_disk_tier_survives_restart_and_expires(tmp_path):
+    clock, path = FakeClock(), str(tmp_path / "interp.db")
+    InterpretationCache(maxsize=4, ttl=10, db_path=path, clock=clock).set("蛇", "a")
+
+    cache = InterpretationCache(maxsize=4, ttl=10, db_path=path, clock=clock)
+    assert cache.get("蛇") == "a" and cache.stats()["disk_hits"] == 1
+
+    clock.now += 11
+    assert InterpretationCache(maxsize=4, ttl=10, db_path=path, clock=clock).get("蛇") is None
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    clock, path = FakeClock(), str(tmp_path / "interp.db")
+    cache = InterpretationCache(maxsize=2, ttl=100, db_path=path, disk_maxsize=10, clock=clock)
+    for i in range(25):
+        clock.now += 1
+        cache.set(f"夢{i}", str(i))
+    stats = cache.stats()
+    assert stats["disk_size"] <= 10 and stats["purged"] >= 15
+    assert cache.get("夢15") == "15"     # 最新的 10 筆留在磁碟層
+    assert cache.get("夢0") is None      # 最舊的已清除
+
+    clock.now += 200                     # 全部過期：重新開啟時清空
+    reopened = InterpretationCache(maxsize=2, ttl=100, db_path=path, disk_maxsize=10, clock=clock)
+    assert reopened.stats()["disk_size"] == 0
@@ -0,0 +1,58 @@
+# test_keyword_index.py
+# dream_links 關鍵字索引：整句、口語開頭、句中關鍵字、近似字，以及不該命中的短詞
+import pytest
+
+from keyword_index import KeywordIndex, get_keyword_index, strip_leading_phrases
+
+KEYWORDS = ["蛇", "火", "狗", "水", "殺", "老虎", "牙齒", "掉牙", "被蛇咬", "牙齒掉光", "考試作弊"]
+
+
+@pytest.fixture()
+def index():
+    return KeywordIndex(KEYWORDS)
+
+
+def test_exact_match_after_normalization(index):
+    assert index.lookup("蛇") == [("蛇", 1.0, "exact")]
+    assert index.lookup(" 牙齒 ") == [("牙齒", 1.0, "exact")]
+
+
+def test_leading_phrases_are_stripped(index):
+    assert strip_leading_phrases("昨晚夢見掉牙") == "掉牙"
+    assert strip_leading_phrases("夢") == "夢"
+    assert index.lookup("我夢到蛇")[0] == ("蛇", 1.0, "exact")
+    assert index.lookup("夢見被蛇咬")[0] == ("被蛇咬", 1.0, "exact")
+
+
+def test_substring_requires_most_of_the_query(index):
+    keyword, score, kind = index.lookup("被蛇咬傷")[0]
+    assert (keyword, kind) == ("被蛇咬", "substring") and 0.5 < score < 1.0
+    assert index.lookup("考試作弊了")[0][:1] == ("考試作弊",)
+
+
+def test_fuzzy_handles_reordered_words(index):
+    keyword, score, kind = index.lookup("掉光牙齒")[0]
+    assert (keyword, kind) == ("牙齒掉光", "fuzzy") and score < 0.9
+
+
+@pytest.mark.parametrize("query, keyword", [("一條大蛇", "蛇"), ("夢到一隻小狗", "狗"), ("好大的火", "火")])
+def test_single_char_key_behind_fillers(index, query, keyword):
+    assert index.lookup(query)[0][:1] == (keyword,)
+    assert index.lookup(query)[0][2] == "substring"
+
+
+@pytest.mark.parametrize("query", ["火鍋", "火車", "熱狗", "薪水", "口水", "殺價", "老虎機", "一條大蛇魚"])
+def test_short_keys_do_not_match_unrelated_words(index, query):
+    assert index.lookup(query) == []
+
+
+@pytest.mark.parametrize("query", ["火鍋", "火車", "熱狗", "薪水", "口水", "殺價", "老虎機"])
+def test_shared_index_rejects_unrelated_words(query):
+    assert get_keyword_index().lookup(query) == []
+
+
+def test_best_counts_hits_and_misses(index):
+    assert index.best("夢到蛇") == "蛇"
+    assert index.best("火鍋") is None
+    stats = index.stats()
+    assert stats["exact"] == 1 and stats["misses"] == 1 and stats["absorbed_ratio"] == 0.5
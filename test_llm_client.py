@@ -0,0 +1,103 @@
+# test_llm_client.py
+# 以本機假模型（FakeModel）測試 LLMClient 的期限、重試退避、併發上限與空白回應
+import asyncio
+import threading
+import time
+
+import pytest
+
+import llm_client
+from llm_client import FakeModel, LLMBusy, LLMClient, LLMError, LLMTimeout
+
+
+def failing_then(text, failures, error=TimeoutError):
+    """前 failures 次丟出 error，之後回傳 text"""
+    calls = []
+
+    def responder(prompt):
+        calls.append(prompt)
+        if len(calls) <= failures:
+            raise error("fake failure")
+        return text
+    return responder
+
+
+def make_client(model, **kwargs):
+    sleeps = []
+    options = dict(timeout=5.0, retries=2, backoff_base=0.5, backoff_max=4.0, sleep=sleeps.append)
+    options.update(kwargs)
+    return LLMClient(model=model, **options), sleeps
+
+
+def test_success_strips_text():
+    client, sleeps = make_client(FakeModel(responder=lambda prompt: "  解析內容  "))
+    assert client.generate("蛇") == "解析內容"
+    assert client.stats()["success"] == 1 and sleeps == []
+
+
+def test_retryable_errors_back_off_then_succeed():
+    model = FakeModel(responder=failing_then("解析", failures=2))
+    client, sleeps = make_client(model)
+    assert client.generate("蛇") == "解析"
+    assert model.calls == 3
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0   # full jitter，上限逐次加倍
+    assert client.stats()["retries"] == 2
+
+
+def test_retries_are_bounded():
+    model = FakeModel(responder=failing_then("解析", failures=10))
+    client, _ = make_client(model)
+    with pytest.raises(LLMError):
+        client.generate("蛇")
+    assert model.calls == 3    # 1 次 + 2 次重試
+    assert client.stats()["failures"] == 1
+
+
+def test_non_retryable_error_fails_immediately():
+    model = FakeModel(responder=failing_then("解析", failures=1, error=ValueError))
+    client, sleeps = make_client(model)
+    with pytest.raises(LLMError):
+        client.generate("蛇")
+    assert model.calls == 1 and sleeps == []
+
+
+def test_deadline_stops_retrying(monkeypatch):
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: high)   # 抖動取上限
+    model = FakeModel(responder=failing_then("解析", failures=10))
+    client, sleeps = make_client(model, timeout=0.2, backoff_base=1.0)
+    with pytest.raises(LLMTimeout):
+        client.generate("蛇")
+    assert model.calls == 1 and sleeps == []   # 退避會超過剩餘期限，不再重試
+    assert client.stats()["timeouts"] == 1
+
+
+def test_async_deadline_cancels_slow_request():
+    client, _ = make_client(FakeModel(latency=1.0), timeout=0.1, retries=0)
+    started = time.monotonic()
+    with pytest.raises(LLMError):
+        asyncio.run(client.agenerate("蛇"))
+    assert time.monotonic() - started < 0.5
+    assert client.stats()["timeouts"] == 1
+
+
+def test_semaphore_full_raises_busy():
+    client, _ = make_client(FakeModel(latency=0.3), max_concurrency=1, acquire_timeout=0.05)
+    holder = threading.Thread(target=client.generate, args=("蛇",))
+    holder.start()
+    time.sleep(0.05)
+    with pytest.raises(LLMBusy):
+        client.generate("貓")
+    holder.join()
+    stats = client.stats()
+    assert stats["busy"] == 1 and stats["success"] == 1 and stats["in_flight"] == 0
+
+
+@pytest.mark.parametrize("text", ["", "   ", None])
+def test_empty_response_is_an_error(text):
+    model = FakeModel(responder=lambda prompt: text)
+    client, sleeps = make_client(model)
+    with pytest.raises(LLMError, match="空白"):
+        client.generate("蛇")
+    assert model.calls == 1 and sleeps == []
+    assert client.stats()["failures"] == 1
@@ -0,0 +1,42 @@
+# test_metrics.py
+# 指標登錄表的 Prometheus 文字輸出、階段計時與請求追蹤
+import pytest
+
+from metrics import Histogram, MetricsRegistry, counter_samples, stage, trace_request
+
+
+def test_histogram_render_is_cumulative():
+    registry = MetricsRegistry()
+    hist = registry.histogram("demo_seconds", "示範", (0.1, 1.0), path="/a")
+    for value in (0.05, 0.5, 0.5, 3.0):
+        hist.observe(value)
+    lines = registry.render().splitlines()
+    assert "# TYPE demo_seconds histogram" in lines
+    assert 'demo_seconds_bucket{path="/a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{path="/a",le="1.0"} 3' in lines
+    assert 'demo_seconds_bucket{path="/a",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{path="/a"} 4' in lines
+
+
+def test_counters_collectors_and_label_escaping():
+    registry = MetricsRegistry()
+    registry.counter("demo_total", "示範").inc(2)
+    registry.attach("shared_seconds", Histogram())
+    registry.collector(lambda: counter_samples("events_total", "事件", {"hits": 3}, name='a"b'))
+    text = registry.render()
+    assert "demo_total 2" in text
+    assert "shared_seconds_count 0" in text
+    assert 'events_total{event="hits",name="a\\"b"} 3' in text
+
+
+def test_stage_records_errors_and_trace():
+    with trace_request("demo") as trace:
+        with stage("test_ok"):
+            pass
+        with pytest.raises(ValueError):
+            with stage("test_fail"):
+                raise ValueError("x")
+        with trace_request("nested") as inner:
+            assert inner is trace  # 已有進行中的追蹤時沿用外層
+    assert set(trace.stages) == {"test_ok", "test_fail"}
+    assert "test_fail;dur=" in trace.server_timing()
@@ -0,0 +1,75 @@
+# test_precompute.py
+# 預先生成：版本輪替、沒有快照時走一般流程（且不重複檢查檔案），以及 build / report
+import json
+import sqlite3
+
+import pytest
+
+import dream_core
+import llm_client
+import precompute
+from dream_snapshot import write_snapshot
+from llm_client import FakeModel, LLMClient
+from precompute import PrecomputedStore
+
+VARIANTS = [{"text": "蛇象徵轉變。", "emotion": "恐懼"}, {"text": "蛇代表新的開始。", "emotion": "平靜"}]
+
+
+@pytest.fixture()
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "precomputed.snap")
+    write_snapshot({"蛇": json.dumps(VARIANTS, ensure_ascii=False)}, path)
+    return path
+
+
+def test_variants_rotate_per_keyword(snapshot_path):
+    store = PrecomputedStore(snapshot_path)
+    picks = [store.pick(keyword) for keyword in ("蛇", " 蛇 ", "蛇")]
+    assert picks == [("蛇象徵轉變。", "恐懼"), ("蛇代表新的開始。", "平靜"), ("蛇象徵轉變。", "恐懼")]
+    assert store.pick("貓") is None
+    assert store.stats()["hits"] == 3 and store.stats()["misses"] == 1
+
+
+@pytest.fixture()
+def shared_store(monkeypatch):
+    monkeypatch.setattr(precompute, "_store", None)
+    monkeypatch.setattr(precompute, "_next_check", 0.0)
+    monkeypatch.setattr(precompute, "PRECOMPUTED_CHECK_INTERVAL", 3600)
+
+
+def test_missing_snapshot_falls_back_and_is_checked_once(tmp_path, monkeypatch, shared_store):
+    path = str(tmp_path / "missing.snap")
+    monkeypatch.setattr(precompute, "PRECOMPUTED_PATH", path)
+    checks = []
+    real_exists = precompute.os.path.exists
+    monkeypatch.setattr(precompute.os.path, "exists", lambda p: checks.append(p) or real_exists(p))
+    monkeypatch.setattr(dream_core, "get_dream_interpretation", lambda keyword: "一般流程的解析。")
+
+    for _ in range(3):
+        result = dream_core.process_dream("蛇", persist=False)
+        assert result["dream_text"] == "一般流程的解析。"
+    assert checks.count(path) == 1
+
+    write_snapshot({"蛇": json.dumps(VARIANTS, ensure_ascii=False)}, path)
+    monkeypatch.setattr(precompute, "_next_check", 0.0)     # 檢查間隔已過
+    assert dream_core.process_dream("蛇", persist=False)["dream_text"] == "蛇象徵轉變。"
+
+
+def test_build_and_report(tmp_path, monkeypatch):
+    history = str(tmp_path / "dream_history.db")
+    with sqlite3.connect(history) as conn:
+        conn.execute("CREATE TABLE dream_history (keyword TEXT)")
+        conn.executemany("INSERT INTO dream_history VALUES (?)", [("蛇",)] * 5 + [("掉牙",)] * 3 + [("貓",)])
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    replies = iter(["第一版。", "第一版。", "第二版。"] + [f"解析 {i}。" for i in range(10)])
+    monkeypatch.setattr(llm_client, "_client", LLMClient(model=FakeModel(responder=lambda prompt: next(replies)),
+                                                         max_concurrency=1))
+
+    output = str(tmp_path / "precomputed.snap")
+    store = precompute.build(top=2, variants=3, workers=1, output=output, history=history)
+    assert set(store) == {"蛇", "掉牙"}
+    assert [v["text"] for v in json.loads(store["蛇"])] == ["第一版。", "第二版。"]   # 相同內容只留一版
+
+    report = precompute.coverage_report(output, history)
+    assert report == {"precomputed_keywords": 2, "distinct_keywords": 3, "queries": 9,
+                      "covered_queries": 8, "coverage": round(8 / 9, 4)}
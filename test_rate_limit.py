@@ -0,0 +1,84 @@
+# test_rate_limit.py
+# 以可控的時鐘測試 token bucket 限流、閒置桶掃除與過載判斷
+from metrics import Histogram
+from rate_limit import LoadShedder, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_user_bucket_burst_then_refill():
+    clock = FakeClock()
+    limiter = RateLimiter(user_rate=1.0, user_burst=3, global_rate=0, clock=clock)
+    assert [limiter.acquire("u1") for _ in range(4)] == [None, None, None, "user"]
+    assert limiter.acquire("u2") is None  # 其他使用者不受影響
+
+    clock.now += 1.0
+    assert limiter.acquire("u1") is None
+    assert limiter.acquire("u1") == "user"
+    assert limiter.stats()["throttled_user"] == 2
+
+
+def test_global_bucket_limits_all_users():
+    clock = FakeClock()
+    limiter = RateLimiter(user_rate=1.0, user_burst=5, global_rate=1.0, global_burst=2, clock=clock)
+    assert limiter.acquire("a") is None
+    assert limiter.acquire("b") is None
+    assert limiter.acquire("c") == "global"
+    clock.now += 1.0
+    assert limiter.acquire("c") is None
+
+
+def test_group_members_have_own_buckets_and_optional_group_bucket():
+    clock = FakeClock()
+    limiter = RateLimiter(user_rate=1.0, user_burst=2, global_rate=0, clock=clock)
+    assert [limiter.acquire("u1", group="G") for _ in range(3)] == [None, None, "user"]
+    assert limiter.acquire("u2", group="G") is None  # 同群組的其他成員不受影響
+
+    limiter = RateLimiter(user_rate=1.0, user_burst=2, group_rate=1.0, group_burst=3, global_rate=0, clock=clock)
+    assert [limiter.acquire(user, group="G") for user in ("u1", "u2", "u3", "u4")] == [None, None, None, "group"]
+    assert limiter.acquire("u4", group="H") is None  # 被群組擋下時不扣使用者的次數
+    assert limiter.acquire("u4") is None
+    stats = limiter.stats()
+    assert stats["throttled_group"] == 1 and stats["tracked_groups"] == 2
+
+
+def test_full_buckets_are_swept_and_lru_is_bounded():
+    clock = FakeClock()
+    limiter = RateLimiter(user_rate=1.0, user_burst=2, global_rate=0, max_users=3, sweep_interval=10, clock=clock)
+    for user in ("a", "b", "c", "d"):
+        limiter.acquire(user)
+    assert len(limiter) == 3  # 「a」最久沒出現，被淘汰
+
+    clock.now += 11  # 全部補滿，下次呼叫時掃除
+    limiter.acquire("e")
+    assert len(limiter) == 1
+
+
+def test_shedder_queue_depth_and_recent_latency():
+    clock = FakeClock()
+    latency = Histogram()
+    depth = [0]
+    shedder = LoadShedder(max_depth=3, max_latency=2.0, depth=lambda: depth[0], latency=latency,
+                          check_interval=1.0, clock=clock)
+    assert shedder.overloaded() is None
+
+    with shedder.track():
+        depth[0] = 2
+        assert shedder.overloaded() == "queue_depth"
+    depth[0] = 0
+
+    for _ in range(4):
+        latency.observe(3.0)
+    clock.now += 1.0
+    assert shedder.overloaded() == "llm_latency"
+
+    latency.observe(0.5)
+    clock.now += 1.0
+    assert shedder.overloaded() is None  # 只看最近一段期間的平均
+    assert shedder.stats()["queue_depth"] == 1 and shedder.stats()["llm_latency"] == 1
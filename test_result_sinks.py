@@ -0,0 +1,42 @@
+# test_result_sinks.py
+# 輸出管線：多執行緒同時發布時，寫入、丟棄與錯誤的計數不會遺失
+import threading
+import time
+
+from result_sinks import ResultPipeline, ResultSink
+
+
+class SlowSink(ResultSink):
+    name = "slow"
+
+    def __init__(self, fail_every=0):
+        self.records = []
+        self.fail_every = fail_every
+        self.calls = 0
+
+    def write_batch(self, records):
+        self.calls += 1
+        time.sleep(0.001)
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise RuntimeError("disk full")
+        self.records.extend(records)
+
+
+def test_counters_add_up_under_concurrent_publish():
+    ok, flaky = SlowSink(), SlowSink(fail_every=3)
+    pipeline = ResultPipeline([ok, flaky], batch_size=5, interval=0.01, maxsize=20)
+    threads = [threading.Thread(target=lambda: [pipeline.publish({"n": i}) for i in range(500)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    pipeline.close()
+
+    stats = pipeline.stats()
+    accepted = 8 * 500 - stats["dropped"]
+    ok_stats, flaky_stats = (worker.stats() for worker in pipeline.workers)
+    assert ok_stats["written"] == len(ok.records)
+    assert ok_stats["written"] + ok_stats["dropped"] == accepted
+    assert flaky_stats["errors"] == flaky.calls // 3
+    assert flaky_stats["written"] == len(flaky.records)
+    assert ok_stats["dropped"] > 0 and ok_stats["pending"] == 0   # 佇列確實滿過
@@ -0,0 +1,72 @@
+# test_semantic_cache.py
+# 近似句快取：換句話說要命中，否定、語序相反或不同事物不可命中
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from semantic_cache import SemanticCache, compatible, signature
+
+
+@pytest.fixture()
+def cache():
+    return SemanticCache(maxsize=16, threshold=0.85)
+
+
+@pytest.mark.parametrize("stored, query", [
+    ("被蛇咬", "蛇咬我"),
+    ("被蛇咬", "夢到被蛇咬了"),
+    ("被狗追", "狗追我"),
+    ("在海裡游泳", "海裡游泳"),
+])
+def test_paraphrases_hit(cache, stored, query):
+    cache.set(stored, "解析")
+    value, score, keyword = cache.lookup(query)
+    assert (value, keyword) == ("解析", stored) and score >= 0.85
+
+
+@pytest.mark.parametrize("stored, query", [
+    ("想結婚", "不想結婚"),
+    ("考上", "沒考上"),
+    ("蛇咬狗", "狗咬蛇"),
+    ("貓追狗", "狗追貓"),
+    ("老虎", "老虎機"),
+    ("被蛇咬", "被狗追"),
+])
+def test_negated_reversed_or_unrelated_queries_miss(cache, stored, query):
+    cache.set(stored, "解析")
+    assert cache.lookup(query) is None
+
+
+def test_blocking_rules():
+    assert not compatible(signature("不想結婚"), signature("想結婚"))
+    assert not compatible(signature("狗咬蛇"), signature("蛇咬狗"))
+    assert compatible(signature("考試遲到"), signature("考試時遲到"))
+
+
+def test_blocked_hit_falls_through_to_next_candidate(cache):
+    cache.set("狗咬蛇", "相反")
+    cache.set("被蛇咬狗", "正確")
+    assert cache.get("蛇咬狗") == "正確"
+
+
+def test_lru_eviction_and_stats():
+    cache = SemanticCache(maxsize=2, threshold=0.85)
+    cache.set("被蛇咬", "a")
+    cache.set("被狗追", "b")
+    assert cache.get("蛇咬我") == "a"    # 「被狗追」成為最久沒用到的一筆
+    cache.set("掉牙齒", "c")
+    assert cache.get("狗追我") is None
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1 and stats["hits"] == 1
+
+
+def test_numpy_is_loaded_only_when_enabled():
+    code = ("import sys, semantic_cache; assert 'numpy' not in sys.modules; "
+            "assert semantic_cache.create_default_semantic_cache() is None; assert 'numpy' not in sys.modules; "
+            "semantic_cache.SemanticCache(maxsize=1); assert 'numpy' in sys.modules")
+    subprocess.run([sys.executable, "-c", code], check=True,
+                   env=dict(os.environ, SEMANTIC_CACHE_SIZE="0"), cwd=os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,97 @@
+# test_single_flight.py
+# 請求合併：共用結果與例外、跟隨者逾時，以及領頭協程被取消時由跟隨者接手
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import AsyncSingleFlight, SingleFlight, SingleFlightTimeout
+
+
+def test_threads_share_one_call():
+    flight, calls = SingleFlight(), []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.1)
+        return "解析"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("蛇", fn))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_async_followers_share_result_and_errors():
+    async def main():
+        flight, calls = AsyncSingleFlight(), []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "解析"
+
+        results = await asyncio.gather(*(flight.do("蛇", fn) for _ in range(3)))
+
+        async def boom():
+            await asyncio.sleep(0.05)
+            raise ValueError("gemini down")
+
+        errors = await asyncio.gather(*(flight.do("貓", boom) for _ in range(3)), return_exceptions=True)
+        return calls, results, errors, flight.stats()
+
+    calls, results, errors, stats = run(main())
+    assert len(calls) == 1 and results[0] == ("解析", False) and results[1:] == [("解析", True)] * 2
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert stats["in_flight"] == 0
+
+
+def test_async_follower_timeout_does_not_cancel_leader():
+    async def main():
+        flight = AsyncSingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.2)
+            return "解析"
+
+        leader = asyncio.create_task(flight.do("蛇", slow))
+        await asyncio.sleep(0)
+        with pytest.raises(SingleFlightTimeout):
+            await flight.do("蛇", slow, max_wait=0.05)
+        return await leader
+
+    assert run(main()) == ("解析", False)
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    async def main():
+        flight, calls = AsyncSingleFlight(), []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return f"解析{len(calls)}"
+
+        leader = asyncio.create_task(flight.do("蛇", fn))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do("蛇", fn)) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return calls, results, flight.stats()
+
+    calls, results, stats = run(main())
+    assert len(calls) == 2    # 原本的領頭 + 接手的跟隨者各呼叫一次
+    assert sorted(results) == [("解析2", False), ("解析2", True), ("解析2", True)]
+    assert stats["retried"] == 3 and stats["in_flight"] == 0
@@ -0,0 +1,42 @@
+# test_startup_profile.py
+# 解析 python -X importtime 的輸出：依直接子模組分組，並列出自身耗時最多的模組
+import pytest
+
+from startup_profile import breakdown, parse_importtime
+
+# 擷取自 python -X importtime -c "import bot_app"（節錄）
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:        36 |         36 |   usercustomize
+import time:      1415 |      30852 | site
+import time:     60211 |      60211 |       linebot.v3.messaging.api.messaging_api
+import time:      2104 |      62315 |     linebot.v3.messaging.api
+import time:      1533 |      63848 |   linebot.v3.messaging
+import time:       301 |        301 |       werkzeug.urls
+import time:      9120 |       9421 |     werkzeug
+import time:      4410 |      13831 |   flask
+import time:       702 |        702 |     emotion_mapper
+import time:      1210 |       1912 |   dream_core
+import time:       650 |      80241 | bot_app
+"""
+
+
+def test_rows_keep_depth_and_times():
+    rows = parse_importtime(SAMPLE)
+    assert rows[0] == ("usercustomize", 1, 36, 36)
+    assert rows[2] == ("linebot.v3.messaging.api.messaging_api", 3, 60211, 60211)
+    assert rows[-1] == ("bot_app", 0, 650, 80241)
+
+
+def test_breakdown_groups_by_direct_children():
+    total, children, subtree = breakdown(parse_importtime(SAMPLE), "bot_app")
+    assert total == 80241
+    assert [name for name, _, _ in children] == ["linebot.v3.messaging", "flask", "dream_core"]
+    assert subtree[0] == ("linebot.v3.messaging.api.messaging_api", 60211, 60211)
+    assert "site" not in [name for name, _, _ in subtree]
+    assert len(subtree) == 9    # bot_app 本身 + 8 個下層模組
+
+
+def test_unknown_module():
+    with pytest.raises(ValueError):
+        breakdown(parse_importtime(SAMPLE), "async_app")
@@ -0,0 +1,79 @@
+# two_phase.py
+# 兩段式回覆：解夢結果無法在門檻內完成時，先用 reply token 回一則「解夢中」的確認訊息
+# （避免使用者空等、reply token 過期），完整結果完成後再以 push 送出。
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import Histogram
+
+# ✅ 兩段式回覆設定
+#   TWO_PHASE_MODE   ：off（預設，等結果完成才回覆）/ auto（等 TWO_PHASE_WAIT 秒，來不及才分兩段）
+#                      / always（本機查不到就立即分兩段）
+#   TWO_PHASE_WAIT   ：auto 模式下最多等幾秒再改成兩段式
+#   TWO_PHASE_WORKERS：背景解夢的執行緒數
+TWO_PHASE_MODES = ("off", "auto", "always")
+TWO_PHASE_MODE = os.getenv("TWO_PHASE_MODE", "off").lower()
+TWO_PHASE_WAIT = float(os.getenv("TWO_PHASE_WAIT", "1.5"))
+TWO_PHASE_WORKERS = int(os.getenv("TWO_PHASE_WORKERS", "8"))
+
+if TWO_PHASE_MODE not in TWO_PHASE_MODES:
+    raise ValueError(f"未知的 TWO_PHASE_MODE：{TWO_PHASE_MODE}")
+
+
+def two_phase_wait():
+    """改成兩段式前等待結果的秒數"""
+    return 0.0 if TWO_PHASE_MODE == "always" else TWO_PHASE_WAIT
+
+
+class ReplyTimings:
+    """
+    回覆延遲統計（由收到事件起算）：
+    - first_message：使用者看到第一則訊息（直接回覆結果，或兩段式的確認訊息）
+    - full_result  ：使用者收到完整解夢結果
+    counters 依回覆方式分類：local（本機直接命中）、single_phase（門檻內完成）、two_phase（先確認再推播）
+    """
+
+    def __init__(self):
+        self.first_message = Histogram()
+        self.full_result = Histogram()
+        self._lock = threading.Lock()
+        self.counters = {"local": 0, "single_phase": 0, "two_phase": 0, "pushed": 0, "push_errors": 0}
+
+    def incr(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def first(self, started):
+        self.first_message.observe(time.perf_counter() - started)
+
+    def full(self, started):
+        self.full_result.observe(time.perf_counter() - started)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "mode": TWO_PHASE_MODE,
+            "wait": two_phase_wait(),
+            **counters,
+            "time_to_first_message": self.first_message.snapshot(),
+            "time_to_full_result": self.full_result.snapshot(),
+        }
+
+
+reply_timings = ReplyTimings()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_two_phase_executor():
+    """背景解夢用的共用執行緒池（第一次使用時建立）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, TWO_PHASE_WORKERS), thread_name_prefix="two-phase")
+    return _executor
@@ -24,13 +24,18 @@ def save_result(keyword, dream_text, emotion, card):
     """
     將抽卡結果寫入 cardoutput.csv 檔案
     """
+    save_results([[
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        keyword,
+        emotion,
+        card["title"],
+        card["message"],
+        dream_text
+    ]])
+
+def save_results(rows):
+    """
+    一次寫入多筆 [timestamp, keyword, emotion, title, message, dream_text]
+    """
     with open(OUTPUT_FILE, mode="a", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            keyword,
-            emotion,
-            card["title"],
-            card["message"],
-            dream_text
-        ])
+        csv.writer(f).writerows(rows)
@@ -0,0 +1,73 @@
+# warmup.py
+import os
+import threading
+import time
+import traceback
+
+from migrate import DB_MIGRATE_ON_STARTUP
+
+# ✅ 啟動後背景預熱設定
+#   DB_MIGRATE_ON_STARTUP：見 migrate.py；開啟時預熱會先建立連線池（順便完成遷移），不必等第一個請求
+#   PREWARM              ：1＝啟動後在背景預先載入 jieba 字典、Gemini SDK 等（預設），0＝第一次使用時才載入
+PREWARM = os.getenv("PREWARM", "1") == "1"
+
+# 各預熱步驟耗時（秒）
+WARMUP_TIMINGS = {}
+
+_started = False
+_lock = threading.Lock()
+
+
+def _timed(name, fn):
+    started = time.perf_counter()
+    try:
+        fn()
+        WARMUP_TIMINGS[name] = round(time.perf_counter() - started, 4)
+    except Exception as e:
+        WARMUP_TIMINGS[name] = f"failed: {e}"
+        traceback.print_exc()
+        print(f"[WARMUP] {name} 失敗：{e}")
+
+
+def _migrate():
+    from database import DATABASE_URL, get_pool
+    if DATABASE_URL:
+        get_pool()   # 第一次使用連線池時執行遷移
+
+
+def _jieba():
+    from emotion_mapper import EMOTION_MATCHER, jieba
+    if EMOTION_MATCHER == "jieba":
+        jieba().initialize()
+
+
+def _gemini():
+    from llm_client import get_llm_client
+    get_llm_client().model
+
+
+def _crawler():
+    from dream_parser import bs4
+    from crawl_cache import requests
+    bs4()
+    requests()
+
+
+def run_warmup(migrate=DB_MIGRATE_ON_STARTUP, prewarm=PREWARM):
+    if migrate:
+        _timed("migrate", _migrate)
+    if prewarm:
+        _timed("jieba", _jieba)
+        _timed("gemini_sdk", _gemini)
+        _timed("crawler", _crawler)
+    print(f"[WARMUP] 完成：{WARMUP_TIMINGS}")
+
+
+def start_background_warmup():
+    """在背景執行緒跑遷移與預熱，只會啟動一次"""
+    global _started
+    with _lock:
+        if _started or not (DB_MIGRATE_ON_STARTUP or PREWARM):
+            return
+        _started = True
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()